@@ -0,0 +1,195 @@
+# フレームループのメモリ確保を調べるチェック
+#
+#   python benchmarks/bench_alloc.py
+#   python benchmarks/bench_alloc.py --frames 10000 --max-growth-kib 16 --max-frame-kib 8 --max-active-frame-kib 16
+#
+# main.py のループと同じ順番（物理演算・描画・プロファイラ・品質ガバナー）で、次の3つの場面を
+# tracemalloc の下で frames フレームずつ回す。
+#   settled   積み上がって落ち着いたゲーム（ボールはみな眠っている）
+#   awake     同じように積んだゲームを、ボールを眠らせずに（毎フレーム物理演算と接触の解決が走る）
+#   dropping  1秒ごとにボールを落とし続ける（マージで Ball が入れ替わる）。ボールが増えると
+#             ゲームの状態そのものが大きくなるので、10秒ごとに最初の状態へスナップショットで戻し、
+#             最後にも戻してから測る（最初と最後でゲームの状態が同じになる）
+# どの場面も
+#   growth        最初と最後のメモリの差。どの場面も最初と最後でボールの顔ぶれは同じなので、増えていれば
+#                 どこかにたまり続けている。max-growth-kib（既定 16 KiB）まで許すのは、dict や
+#                 list の伸び縮みと、dropping で新しいスコアの文字が文字のキャッシュ（上限 512 個）に
+#                 入っていく分（10,000 フレームで 6 KiB ほど）。1フレームに小さなオブジェクトを
+#                 1つ残すだけでも 10,000 フレームで 500 KiB を超えるので、それは必ず引っかかる
+#   frame peak    1フレームの中で一時的に確保したメモリの最大（tracemalloc の peak）の平均と最大
+#   gc            そのあいだに走ったガベージコレクションの回数（世代ごと）
+# を表示し、growth が max-growth-kib を、frame peak の平均か最大が上限（settled は max-frame-kib、
+# awake と dropping は max-active-frame-kib。接触の解決はステップごとに接触のリストを作るので、
+# 落ち着いたときより多い）を超えるか、第2世代の GC が走ったら FAILED を表示して終了コード 1 を返す。
+# SDL のダミードライバで動くので画面は不要。
+import argparse
+import gc
+import math
+import os
+import random
+import sys
+import tracemalloc
+from array import array
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+import pygame  # noqa: E402
+
+from game import Game, GameConfig  # noqa: E402
+from headless import random_policy  # noqa: E402
+from physics import HEIGHT, WIDTH  # noqa: E402
+import snapshot  # noqa: E402
+from profiler import FrameProfiler  # noqa: E402
+from quality import QualityGovernor  # noqa: E402
+from renderer import Renderer  # noqa: E402
+from timestep import FixedTimestep  # noqa: E402
+
+FRAME_DT = 1 / 60
+# dropping で最初の状態に戻す間隔（フレーム）
+RESTORE_EVERY = 600
+
+
+# 上の線を越えないように低い位置から落として、落ち着くまで進めたゲーム
+def build_game(seed, drops, allow_sleep=True):
+    game = Game(seed, GameConfig(drop_y=300, allow_sleep=allow_sleep))
+    rng = random.Random(seed)
+    for _ in range(drops):
+        game.drop(random_policy(game, rng))
+        game.step(60)
+    game.step(600)
+    return game, rng
+
+
+class GcCounter:
+    def __init__(self):
+        self.counts = [0, 0, 0]
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self.counts[info["generation"]] += 1
+
+
+# main.py の1フレーム分（イベントの処理と clock.tick はない）。
+# restore_every を渡すと、そのフレーム数ごとと最後に、始めたときの状態に戻す（戻すのはフレームの外で測る）
+def run_frames(game, rng, renderer, frames, drop_every=None, restore_every=None):
+    physics_clock = FixedTimestep(
+        step=game.config.step, max_steps=game.config.max_steps_per_frame
+    )
+    profiler = FrameProfiler(capacity=600)
+    game.profiler = profiler
+    renderer.profiler = profiler
+    governor = QualityGovernor(budget_ms=1000 / 60, levels=renderer.quality_levels)
+
+    # 測っている間に結果の入れ物が伸びないように、先に確保しておく
+    peaks = array("q", bytes(8 * frames))
+    blob = snapshot.save(game) if restore_every is not None else None
+    counter = GcCounter()
+    gc.callbacks.append(counter)
+    start, _ = tracemalloc.get_traced_memory()
+    try:
+        for frame in range(frames):
+            if blob is not None and frame and frame % restore_every == 0:
+                snapshot.restore(game, blob)
+                physics_clock.reset()
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            profiler.begin_frame()
+            if drop_every is not None and frame % drop_every == 0:
+                game.drop(random_policy(game, rng))
+            if not game.game_over:
+                game.step(physics_clock.advance(FRAME_DT))
+            if governor.should_render():
+                renderer.draw(game, physics_clock.alpha)
+            profiler.end_frame(len(game.balls), game.pairs_tested, game.merges)
+            governor.add(1.0)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks[frame] = peak - before
+        if blob is not None:
+            snapshot.restore(game, blob)
+    finally:
+        gc.callbacks.remove(counter)
+    end, _ = tracemalloc.get_traced_memory()
+    return end - start, peaks, counter.counts
+
+
+def report(label, game, growth, peaks, counts):
+    print(
+        f"{label:8s} {len(peaks)} frames, {len(game.balls)} balls"
+        f"  growth {growth / 1024:7.1f} KiB"
+        f"  frame peak avg {sum(peaks) / len(peaks) / 1024:6.2f} KiB"
+        f" max {max(peaks) / 1024:7.1f} KiB"
+        f"  gc {counts[0]}/{counts[1]}/{counts[2]}"
+    )
+
+
+# 上限を超えたものを返す（なければ空のリスト）
+def check(growth, peaks, counts, max_growth_kib, max_frame_kib):
+    failures = []
+    if growth / 1024 > max_growth_kib:
+        failures.append(f"growth {growth / 1024:.1f} KiB > {max_growth_kib} KiB")
+    average_kib = sum(peaks) / len(peaks) / 1024
+    if average_kib > max_frame_kib:
+        failures.append(f"frame peak avg {average_kib:.2f} KiB > {max_frame_kib} KiB")
+    if max(peaks) / 1024 > max_frame_kib:
+        failures.append(f"frame peak max {max(peaks) / 1024:.1f} KiB > {max_frame_kib} KiB")
+    if counts[2] > 0:
+        failures.append(f"{counts[2]} gen-2 collections")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="フレームループのメモリ確保を調べる")
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--drops", type=int, default=30, help="最初に落とすボールの数")
+    parser.add_argument("--max-growth-kib", type=float, default=16)
+    parser.add_argument("--max-frame-kib", type=float, default=8)
+    parser.add_argument("--max-active-frame-kib", type=float, default=16)
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    renderer = Renderer(screen)
+    # 回転したスプライトは先にすべて作っておく（キャッシュには上限があるので、このあとは増えない）
+    atlas = renderer.atlas
+    if atlas is not None:
+        for size_label, steps in atlas.steps.items():
+            for step in range(steps):
+                atlas.get(size_label, step * 2 * math.pi / steps)
+
+    # (名前, ゲーム, 何フレームごとに落とすか, 何フレームごとに戻すか, 1フレームの上限)
+    scenarios = [
+        ("settled", build_game(1, args.drops), None, None, args.max_frame_kib),
+        (
+            "awake",
+            build_game(1, args.drops, allow_sleep=False),
+            None,
+            None,
+            args.max_active_frame_kib,
+        ),
+        ("dropping", build_game(2, 5), 60, RESTORE_EVERY, args.max_active_frame_kib),
+    ]
+    failed = False
+    tracemalloc.start()
+    for label, (game, rng), drop_every, restore_every, max_frame_kib in scenarios:
+        # キャッシュ（文字・スプライト）を温めてから測る。戻す場面は、スコアの文字などが
+        # 出そろうように何周か回す
+        warmup = 120 if restore_every is None else restore_every * 3
+        run_frames(game, rng, renderer, warmup, drop_every, restore_every)
+        growth, peaks, counts = run_frames(
+            game, rng, renderer, args.frames, drop_every, restore_every
+        )
+        report(label, game, growth, peaks, counts)
+        for failure in check(growth, peaks, counts, args.max_growth_kib, max_frame_kib):
+            print(f"  {failure}")
+            failed = True
+    tracemalloc.stop()
+
+    if failed:
+        print("FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# アリーナの線分とピン（動かない当たり判定）を BVH で探すベンチマーク
+#
+#   python benchmarks/bench_arena.py
+#   python benchmarks/bench_arena.py --balls 3000 --steps 60 --pegs 4000
+#
+# 大きなアリーナにボールを格子状に並べて落とし、1ステップの時間・そのうち線分とピンから
+# 押し出すのにかかった時間（PythonBackend.collide_static）・1ステップで外接矩形を比べた回数
+# （BVH のノードと当たり判定。接触ソルバーが探す分も含む）を
+#   bvh     StaticBVH で近くのものだけを探す（ゲームと同じ）
+#   all     全部の当たり判定を毎回調べる
+# で比べる。アリーナは levels/pegboard.json と、ピンを pegs 個敷き詰めた大きなアリーナの2つ。
+# 最後に、どちらでも同じ結果（ボールの位置）になったかを表示する。
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.join(os.path.dirname(__file__), "..", "web-pygame")
+sys.path.insert(0, HERE)
+
+from game import Game, GameConfig  # noqa: E402
+from replay import state_checksum  # noqa: E402
+
+
+# 毎回すべての当たり判定を調べる（StaticBVH と同じ query を持つ）
+class AllColliders:
+    def __init__(self, items):
+        self.items = list(items)
+        self.bounds = [item.bounds() for item in self.items]
+        self.tests = 0
+
+    def query(self, x0, y0, x1, y1, out):
+        out.clear()
+        self.tests += len(self.items)
+        for item, (bx0, by0, bx1, by1) in zip(self.items, self.bounds):
+            if bx1 < x0 or bx0 > x1 or by1 < y0 or by0 > y1:
+                continue
+            out.append(item)
+        return out
+
+
+# ピンを count 個、ずらした格子に敷き詰めたアリーナ
+def peg_field(count, spacing=60):
+    cols = int(math.sqrt(count * 2))
+    rows = math.ceil(count / cols)
+    width = cols * spacing + 400
+    pegs = []
+    for i in range(count):
+        row, col = divmod(i, cols)
+        x = 200 + col * spacing + (spacing // 2 if row % 2 else 0)
+        pegs.append([x, 600 + row * spacing, 6])
+    height = 600 + rows * spacing + 800
+    return {
+        "name": f"{count} pegs",
+        "width": width,
+        "height": height,
+        "walls": {"left": 100, "right": width - 100, "floor": height - 100},
+        "game_over_line": 50,
+        "pegs": pegs,
+    }
+
+
+# 上の方に格子状にボールを並べる。となり同士でサイズラベルを変えて、マージさせない
+def build(level, count, radius=10):
+    game = Game(1, GameConfig(level=level))
+    arena = game.arena
+    spacing = radius * 2 + 4
+    cols = int((arena.right - arena.left - radius * 2) // spacing)
+    for i in range(count):
+        row, col = divmod(i, cols)
+        x = arena.left + radius + 2 + col * spacing
+        y = arena.game_over_line + 200 + row * spacing
+        ball = game.create_ball(x, y, False, radius)
+        ball.size_label = 1 + (row % 2) * 2 + col % 2
+    return game
+
+
+# 大きなアリーナでは上の線を越えることがあるので、Game.step を通さずに進める
+def run(level, count, steps, index):
+    game = build(level, count)
+    arena = game.arena
+    bvh = arena.bvh
+    if index == "all":
+        # BVH が返すのと同じ順番で調べるので、結果も同じになるはず
+        arena.bvh = AllColliders(bvh.items)
+        game.backend.solver.bvh = arena.bvh
+    # collide_static にかかった時間を足していく
+    collide_static = game.backend.collide_static
+    static = [0.0]
+
+    def timed_collide_static():
+        t0 = time.perf_counter()
+        collide_static()
+        static[0] += time.perf_counter() - t0
+
+    game.backend.collide_static = timed_collide_static
+    tests = arena.bvh.tests
+    try:
+        t0 = time.perf_counter()
+        for _ in range(steps):
+            game.step_physics(game.config.step)
+            game.steps += 1
+        elapsed = time.perf_counter() - t0
+        tests = arena.bvh.tests - tests
+    finally:
+        arena.bvh = bvh
+        game.backend.solver.bvh = bvh
+    return (
+        elapsed / steps * 1000,
+        static[0] / steps * 1000,
+        tests / steps,
+        state_checksum(game),
+        len(game.balls),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="動かない当たり判定の探し方を比べる")
+    parser.add_argument("--balls", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=60)
+    parser.add_argument("--pegs", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        field = os.path.join(tmp, "field.json")
+        with open(field, "w") as f:
+            json.dump(peg_field(args.pegs), f)
+        levels = [os.path.join(HERE, "levels", "pegboard.json"), field]
+        for level in levels:
+            arena = Game(None, GameConfig(level=level)).arena
+            print(f"{arena!r}, {args.balls} balls, {args.steps} steps")
+            checksums = set()
+            for index in ("bvh", "all"):
+                ms, static_ms, tests, checksum, balls = run(level, args.balls, args.steps, index)
+                checksums.add(checksum)
+                print(
+                    f"  {index:4s} {ms:8.2f} ms/step  static {static_ms:7.2f} ms/step"
+                    f"  {tests:10.0f} bounds tests/step  ({balls} balls left)"
+                )
+            print(f"  same result: {len(checksums) == 1}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# ボールの絵を読み込んでスプライトアトラスを作るまでの時間を、読み込み方ごとに比べるベンチマーク
+#
+#   python benchmarks/bench_assets.py
+#
+#   naive    元の画像を毎回 pygame.image.load して smoothscale する（以前の main1.py のやり方）
+#   cold     AssetManager でディスクのキャッシュが空のとき（縮小してキャッシュに書く）
+#   warm     AssetManager でディスクのキャッシュがあるとき
+#   bundle   AssetManager で assets.bundle から読むとき（ブラウザ版）
+# 最後に、変換していない画像と convert_alpha した画像の blit の速さも比べる。
+# SDL のダミードライバで動くので画面は不要。
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+HERE = os.path.join(os.path.dirname(__file__), "..", "web-pygame")
+sys.path.insert(0, HERE)
+
+import pygame  # noqa: E402
+
+from assets import IMAGE_DIR, AssetManager, ball_box, fit, index_dir, pack  # noqa: E402
+from sprite_atlas import BallSpriteAtlas  # noqa: E402
+
+
+def load_naive():
+    images = index_dir(IMAGE_DIR)
+    return [fit(pygame.image.load(images[f"ball_{n}"]), ball_box(n)) for n in range(1, 11)]
+
+
+def build_atlas(assets):
+    return BallSpriteAtlas(rotation_steps=64, assets=assets).build()
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((900, 600))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "cache")
+        bundle_path = os.path.join(tmp, "assets.bundle")
+        pack(bundle_path)
+
+        rows = [
+            ("naive", timed(load_naive)[0]),
+            ("cold", timed(lambda: build_atlas(AssetManager(cache_dir=cache_dir)))[0]),
+            ("warm", timed(lambda: build_atlas(AssetManager(cache_dir=cache_dir)))[0]),
+            (
+                "bundle",
+                timed(
+                    lambda: build_atlas(AssetManager(cache_dir=None, bundle_path=bundle_path))
+                )[0],
+            ),
+        ]
+        print(f"bundle size {os.path.getsize(bundle_path) / 1024:.0f} KiB")
+    for name, ms in rows:
+        print(f"{name:8s} {ms:8.1f} ms")
+
+    # 変換していない画像と、ディスプレイの形式に変換した画像の blit
+    raw = load_naive()[9]
+    converted = raw.convert_alpha()
+    for name, surface in (("raw", raw), ("converted", converted)):
+        ms, _ = timed(lambda: [screen.blit(surface, (100, 100)) for _ in range(2000)])
+        print(f"blit {name:10s} {ms / 2000 * 1000:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
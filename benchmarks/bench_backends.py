@@ -0,0 +1,92 @@
+# 物理演算のバックエンド（python / numpy / pymunk）を比較するベンチマーク
+#
+#   python benchmarks/bench_backends.py
+#   python benchmarks/bench_backends.py --backend python --backend pymunk --sizes 100 3000
+#
+# 隣り合うボールのサイズを変えて格子状に並べ、床に積もらせる（Game を通さずバックエンドだけを動かす）。
+# 落ちて積み重なっていく最初の1秒（active）と、さらに5秒たって落ち着いたあとの1秒（settled）の
+# 1ステップあたりの時間を測る。numpy はボールを眠らせないので settled でも速くならない。
+# 使えないバックエンド（pymunk が入っていないなど）は飛ばす。
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+from game import GameConfig  # noqa: E402
+from physics import FLOOR_Y, WALL_LEFT, WALL_RIGHT  # noqa: E402
+from physics_backend import BACKENDS, create_backend  # noqa: E402
+
+RADIUS = 10
+# 並べるときのボールの間隔（少しすき間をあけて、落ちながら積もらせる）
+SPACING = RADIUS * 2 + 2
+
+
+def fill(backend, count):
+    cols = int((WALL_RIGHT - WALL_LEFT) // SPACING)
+    for i in range(count):
+        row, col = divmod(i, cols)
+        x = WALL_LEFT + RADIUS + 1 + col * SPACING
+        y = FLOOR_Y - RADIUS - row * SPACING
+        ball = backend.add_ball(x, y, RADIUS, 1)
+        ball.size_label = 1 + (row % 2) * 2 + col % 2
+
+
+# Game.step_physics と同じ順に呼ぶ。崩れてきたボールがマージすると個数が変わって
+# 比べにくくなるので、マージはしない
+def step(backend, dt):
+    backend.save_previous()
+    backend.integrate(dt)
+    backend.collide(dt)
+    backend.update_sleep()
+
+
+def time_steps(backend, dt, steps):
+    samples = []
+    for _ in range(steps):
+        t0 = time.perf_counter()
+        step(backend, dt)
+        samples.append(time.perf_counter() - t0)
+    return statistics.fmean(samples) * 1000
+
+
+def run(name, count, steps, settle):
+    config = GameConfig(backend=name)
+    backend = create_backend(config)
+    dt = config.step
+    fill(backend, count)
+    active = time_steps(backend, dt, steps)
+    for _ in range(settle):
+        step(backend, dt)
+    settled = time_steps(backend, dt, steps)
+    sleeping = sum(1 for ball in backend.balls if ball.sleeping)
+    return active, settled, sleeping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="物理演算のバックエンドを比べる")
+    parser.add_argument("--backend", action="append", choices=BACKENDS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 3000])
+    parser.add_argument("--steps", type=int, default=120, help="測るステップ数")
+    parser.add_argument("--settle", type=int, default=600, help="落ち着くまで待つステップ数")
+    args = parser.parse_args(argv)
+
+    backends = []
+    for name in args.backend or BACKENDS:
+        # 使えないバックエンドは python になるので、名前で確かめる
+        if create_backend(GameConfig(backend=name)).name != name:
+            print(f"{name}: not available, skipped")
+            continue
+        backends.append(name)
+
+    print(f"{'backend':>8} {'balls':>6} {'active ms':>10} {'settled ms':>11} {'sleeping':>9}")
+    for count in args.sizes:
+        for name in backends:
+            active, settled, sleeping = run(name, count, args.steps, args.settle)
+            print(f"{name:>8} {count:6d} {active:10.3f} {settled:11.3f} {sleeping:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# draw_ball（円2つ + ラベル）とスプライトアトラスの blit を比較するベンチマーク
+#
+#   python benchmarks/bench_ball_draw.py [--images]
+#
+# SDL のダミードライバで動くので画面は不要。
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+HERE = os.path.join(os.path.dirname(__file__), "..", "web-pygame")
+sys.path.insert(0, HERE)
+
+import pygame  # noqa: E402
+
+from assets import AssetManager  # noqa: E402
+from physics import Ball  # noqa: E402
+from renderer import draw_ball  # noqa: E402
+from sprite_atlas import BallSpriteAtlas  # noqa: E402
+
+
+def make_balls(n, seed=0):
+    rng = random.Random(seed)
+    balls = []
+    for _ in range(n):
+        size_label = rng.randint(1, 10)
+        ball = Ball(rng.uniform(200, 700), rng.uniform(100, 550), size_label * 10, size_label)
+        ball.angle = ball.prev_angle = rng.uniform(0, 2 * math.pi)
+        balls.append(ball)
+    return balls
+
+
+def time_frames(draw, screen, frames):
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        screen.fill((0, 0, 0))
+        draw()
+    return (time.perf_counter() - t0) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", action="store_true", help="ball_N.png の絵も焼き込む")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((900, 600))
+
+    t0 = time.perf_counter()
+    atlas = BallSpriteAtlas(
+        rotation_steps=64, assets=AssetManager() if args.images else None
+    ).build()
+    print(f"atlas build: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    print(f"{'balls':>6} {'draw_ball ms':>13} {'atlas ms':>9} {'speedup':>8}")
+    for n in (50, 200, 500, 1000):
+        balls = make_balls(n)
+
+        def draw_circles():
+            for ball in balls:
+                draw_ball(screen, ball)
+
+        def draw_atlas():
+            for ball in balls:
+                atlas.draw(screen, ball)
+
+        # 回転キャッシュを温めてから測る
+        draw_atlas()
+        t_circles = time_frames(draw_circles, screen, args.frames)
+        t_atlas = time_frames(draw_atlas, screen, args.frames)
+        print(
+            f"{n:6d} {t_circles * 1000:13.2f} {t_atlas * 1000:9.2f}"
+            f" {t_circles / t_atlas:7.1f}x"
+        )
+
+    report = atlas.memory_report()
+    print(
+        "atlas memory: {sprites} sprites {sprite_bytes} B,"
+        " {rotated} rotated {rotated_bytes} B, total {total_bytes} B".format(**report)
+    )
+
+
+if __name__ == "__main__":
+    main()
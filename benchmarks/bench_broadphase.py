@@ -0,0 +1,89 @@
+# 総当たりの衝突判定と空間ハッシュのブロードフェーズを比較するベンチマーク
+#
+#   python benchmarks/bench_broadphase.py
+#
+# ボールの密度を一定に保ったまま個数を 50 から 5,000 まで増やし、
+# 1 ステップ（ハッシュの再構築 + 候補ペアの円判定）あたりの時間を測る。
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+from spatial_hash import SpatialHash  # noqa: E402
+
+
+class Body:
+    __slots__ = ("x", "y", "radius")
+
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+
+
+def make_bodies(n, seed=0):
+    # サイズ1・2の小さなボールを、1個あたりの面積が一定になるように並べる
+    rng = random.Random(seed)
+    side = math.sqrt(n * 40 * 40)
+    return [
+        Body(rng.uniform(0, side), rng.uniform(0, side), rng.choice((10, 20)))
+        for _ in range(n)
+    ]
+
+
+def overlaps(a, b):
+    dx = a.x - b.x
+    dy = a.y - b.y
+    r = a.radius + b.radius
+    return dx * dx + dy * dy < r * r
+
+
+def all_pairs(bodies):
+    hits = 0
+    n = len(bodies)
+    for i in range(n):
+        for j in range(i + 1, n):
+            if overlaps(bodies[i], bodies[j]):
+                hits += 1
+    return hits
+
+
+def hashed(grid, bodies):
+    grid.rebuild(bodies)
+    hits = 0
+    for a, b in grid.candidate_pairs():
+        if overlaps(a, b):
+            hits += 1
+    return hits
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    grid = SpatialHash(cell_size=40)
+    print(f"{'balls':>6} {'all-pairs ms':>13} {'hash ms':>9} {'us/ball':>8}")
+    for n in (50, 100, 200, 500, 1000, 2000, 5000):
+        bodies = make_bodies(n)
+        t_hash, hits_hash = best_of(lambda: hashed(grid, bodies), 5)
+        if n <= 2000:
+            t_all, hits_all = best_of(lambda: all_pairs(bodies), 1)
+            assert hits_all == hits_hash, (hits_all, hits_hash)
+            all_ms = f"{t_all * 1000:13.2f}"
+        else:
+            all_ms = f"{'-':>13}"
+        print(f"{n:6d} {all_ms} {t_hash * 1000:9.2f} {t_hash / n * 1e6:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
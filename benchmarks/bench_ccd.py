@@ -0,0 +1,122 @@
+# 連続衝突判定（CCD）のベンチマーク
+#
+#   python benchmarks/bench_ccd.py
+#   python benchmarks/bench_ccd.py --steps 120 60 30 --games 4
+#
+# 物理演算のステップの幅ごとに、CCD あり・なしで次を比べる。
+#   bullet   床の上の半径20のボールに、真上から半径10のボールを速く落とす（落とし始める高さを20通り）。
+#            動かした直後の一番深いめり込み（px）と、下まですり抜けた回数
+#   games    ランダムに落とすゲームを回し、動かした直後の一番深いめり込みの最大と平均、
+#            1秒分（ゲーム内）のステップにかかる時間
+# めり込みは Game.integrate のあと（接触を解決する前）に全部のペアを調べて測る。
+# マージするペア（同じサイズ）と、直前のステップのマージで生まれたボールは、もともと重なっているので数えない。
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+from game import Game, GameConfig  # noqa: E402
+from headless import random_policy  # noqa: E402
+from physics import FLOOR_Y, WALL_LEFT, WALL_RIGHT  # noqa: E402
+
+
+def deepest_overlap(balls, newest_id):
+    deepest = 0.0
+    balls = [ball for ball in balls if ball.id < newest_id]
+    for i, ball1 in enumerate(balls):
+        for ball2 in balls[i + 1 :]:
+            if ball1.size_label == ball2.size_label:
+                continue
+            depth = ball1.radius + ball2.radius - math.hypot(ball1.x - ball2.x, ball1.y - ball2.y)
+            if depth > deepest:
+                deepest = depth
+    return deepest
+
+
+# integrate のたびにめり込みを測る
+def watch(game):
+    depths = []
+    integrate = game.integrate
+    # 前のステップの始めに次に振られるはずだった id（これ以降のボールはマージで生まれた）
+    newest = [0]
+
+    def measured(dt):
+        integrate(dt)
+        depths.append(deepest_overlap(game.balls, newest[0]))
+        newest[0] = game.backend.balls.next_id
+
+    game.integrate = measured
+    return depths
+
+
+# 落とし始める高さを少しずつ変えて、めり込みの最大とすり抜けた回数を返す
+def bullet(step, ccd, speed, tries=20):
+    deepest = 0.0
+    tunneled = 0
+    for i in range(tries):
+        game = Game(1, GameConfig(step=step, drop_y=300, continuous_collision=ccd))
+        center = (WALL_LEFT + WALL_RIGHT) / 2
+        target = game.create_ball(center, FLOOR_Y - 20, False, 20)
+        ball = game.create_ball(center, 150 + i * 4, False, 10)
+        ball.vy = speed
+        depths = watch(game)
+        game.step(int(1 / step))
+        deepest = max(deepest, max(depths))
+        # 下のボールより下にいたらすり抜けている
+        if ball.y > target.y:
+            tunneled += 1
+    return deepest, tunneled
+
+
+def games(step, ccd, count):
+    depths = []
+    elapsed = 0.0
+    seconds = 0
+    for seed in range(count):
+        game = Game(seed, GameConfig(step=step, drop_y=300, continuous_collision=ccd))
+        rng = random.Random(seed)
+        watched = watch(game)
+        per_second = int(1 / step)
+        while not game.game_over and game.elapsed < 60:
+            game.drop(random_policy(game, rng))
+            t0 = time.perf_counter()
+            game.step(per_second // 2)
+            elapsed += time.perf_counter() - t0
+            seconds += 0.5
+        depths.extend(watched)
+    return max(depths), sum(depths) / len(depths), elapsed / seconds * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="連続衝突判定のありなしを比べる")
+    parser.add_argument("--steps", type=int, nargs="+", default=[120, 60, 30], help="1秒のステップ数")
+    parser.add_argument("--speed", type=float, default=2500, help="bullet で落とす速さ（px/s）")
+    parser.add_argument("--games", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"bullet: radius 10 at {args.speed:.0f} px/s onto radius 20, 20 start heights")
+    for rate in args.steps:
+        for ccd in (False, True):
+            depth, tunneled = bullet(1 / rate, ccd, args.speed)
+            print(
+                f"  1/{rate:<4d} ccd {'on ' if ccd else 'off'}  deepest {depth:6.1f} px"
+                f"  tunneled {tunneled}/20"
+            )
+
+    print(f"games: {args.games} random games, up to 60 s each")
+    for rate in args.steps:
+        for ccd in (False, True):
+            deepest, mean, ms = games(1 / rate, ccd, args.games)
+            print(
+                f"  1/{rate:<4d} ccd {'on ' if ccd else 'off'}  deepest {deepest:6.1f} px"
+                f"  mean {mean:5.2f} px  {ms:6.2f} ms per game second"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# ヒントエンジン（hint.py）で候補を調べる速さのベンチマーク
+#
+#   python benchmarks/bench_hint.py
+#   python benchmarks/bench_hint.py --candidates 32 --budget-ms 50 --workers 1 2 4
+#
+# ランダムに落として進めたゲームをいくつか用意し、ワーカー数ごとに
+#   full      時間の予算なしで全部の候補を調べたときの時間（ワーカーの起動は含めない）
+#   budget    予算ありで調べたときの時間と、調べ終わった候補の数
+# を測る。どのワーカー数でも予算なしなら一番良い x が同じになるかも確かめる。
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+from game import Game, GameConfig  # noqa: E402
+from headless import random_policy  # noqa: E402
+from hint import HintEvaluator  # noqa: E402
+
+
+# 上の線を越えないように低い位置から落として、drops 個落としたところのゲームを作る
+def build_positions(count, drops, drop_interval=60):
+    games = []
+    for seed in range(count):
+        game = Game(seed, GameConfig(drop_y=300))
+        rng = random.Random(seed)
+        for _ in range(drops):
+            game.drop(random_policy(game, rng))
+            game.step(drop_interval)
+        games.append(game)
+    return games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ヒントエンジンの速さを測る")
+    parser.add_argument("--positions", type=int, default=4, help="調べるゲームの数")
+    parser.add_argument("--drops", type=int, default=20, help="ゲームを作るときに落とす数")
+    parser.add_argument("--candidates", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=60)
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    args = parser.parse_args(argv)
+
+    games = build_positions(args.positions, args.drops)
+    balls = statistics.fmean(len(game.balls) for game in games)
+    print(
+        f"{len(games)} positions, {balls:.0f} balls on average,"
+        f" {args.candidates} candidates x {args.steps} steps, {os.cpu_count()} cpus"
+    )
+
+    best = {}
+    for workers in args.workers:
+        evaluator = HintEvaluator(workers=workers, steps=args.steps)
+        # ワーカーを起動しておく
+        evaluator.rank(games[0], count=2)
+        full = []
+        picks = []
+        for game in games:
+            t0 = time.perf_counter()
+            picks.append(evaluator.best(game, count=args.candidates))
+            full.append((time.perf_counter() - t0) * 1000)
+        budget = []
+        evaluated = []
+        for game in games:
+            evaluator.rank(game, count=args.candidates, budget_ms=args.budget_ms)
+            budget.append(evaluator.last_ms)
+            evaluated.append(evaluator.evaluated)
+        evaluator.close()
+        best[workers] = picks
+        print(
+            f"workers {workers:2d}: full {statistics.fmean(full):7.1f} ms"
+            f"  budget {args.budget_ms:.0f} ms -> {statistics.fmean(budget):6.1f} ms,"
+            f" {statistics.fmean(evaluated):4.1f}/{args.candidates} candidates"
+        )
+
+    same = len({tuple(picks) for picks in best.values()}) == 1
+    print(f"same best x for every worker count: {'yes' if same else 'NO'}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
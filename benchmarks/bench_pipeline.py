@@ -0,0 +1,120 @@
+# 物理演算を別スレッドで進めて描画と重ねるパイプライン（main.py の use_sim_thread）のベンチマーク
+#
+#   python benchmarks/bench_pipeline.py
+#   python benchmarks/bench_pipeline.py --frames 600 --drops 40 --steps-per-frame 2
+#
+# 落ち着いたゲームで、60fps の1フレームで進めるステップ数（steps-per-frame）ずつ frames フレーム回し、
+#   physics     物理演算だけ（game.step）
+#   draw        描画だけ（renderer.draw）
+#   sequential  main.py の既定と同じく、1つのスレッドで物理演算のあとに描く
+#   pipelined   SimulationThread で物理演算を進めながら、1フレーム前の状態を描く
+# の1フレームあたりの時間（ms）を比べる。重なりが完全なら pipelined は physics と draw の大きい方に近づく。
+# 物理演算は Python のコードなので GIL を持ったまま走る。描画が GIL を離しているあいだしか重ならず、
+# CPU が1つしかなければ速くならない。最後に、sequential と pipelined でゲームが同じ状態になったかを表示する。
+# SDL のダミードライバで動くので画面は不要。
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+import pygame  # noqa: E402
+
+from game import Game, GameConfig  # noqa: E402
+from headless import random_policy  # noqa: E402
+from physics import HEIGHT, WIDTH  # noqa: E402
+from renderer import Renderer  # noqa: E402
+from replay import state_checksum  # noqa: E402
+from sim_thread import SimulationThread  # noqa: E402
+
+DROP_EVERY = 30
+
+
+# 上の線を越えないように低い位置から落として、落ち着くまで進めたゲーム
+def build_game(seed, drops):
+    game = Game(seed, GameConfig(drop_y=300))
+    rng = random.Random(seed)
+    for _ in range(drops):
+        game.drop(random_policy(game, rng))
+        game.step(60)
+    game.step(600)
+    return game, rng
+
+
+def run_physics(game, rng, renderer, frames, steps):
+    for frame in range(frames):
+        if frame % DROP_EVERY == 0:
+            game.drop(random_policy(game, rng), y=300)
+        game.step(steps)
+
+
+def run_draw(game, rng, renderer, frames, steps):
+    for _ in range(frames):
+        renderer.draw(game)
+
+
+def run_sequential(game, rng, renderer, frames, steps):
+    for frame in range(frames):
+        if frame % DROP_EVERY == 0:
+            game.drop(random_policy(game, rng), y=300)
+        game.step(steps)
+        renderer.draw(game)
+
+
+def run_pipelined(game, rng, renderer, frames, steps):
+    sim = SimulationThread(game, lambda x, y: game.drop(x, y=y))
+    try:
+        for frame in range(frames):
+            if frame % DROP_EVERY == 0:
+                # ゲームを触らないあいだ（wait のあと）に位置を決めてキューに入れる
+                sim.drop(random_policy(game, rng), 300)
+            sim.start(steps, 1.0)
+            renderer.draw(sim.front)
+            sim.wait()
+    finally:
+        sim.close()
+
+
+MODES = {
+    "physics": run_physics,
+    "draw": run_draw,
+    "sequential": run_sequential,
+    "pipelined": run_pipelined,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="物理演算と描画を別スレッドで重ねたときの時間を比べる")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--drops", type=int, default=40, help="最初に落とすボールの数")
+    parser.add_argument("--steps-per-frame", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    renderer = Renderer(screen)
+
+    print(
+        f"{args.drops} drops, {args.frames} frames, {args.steps_per_frame} steps/frame,"
+        f" {os.cpu_count()} CPUs"
+    )
+    checksums = {}
+    for name, run in MODES.items():
+        game, rng = build_game(1, args.drops)
+        # キャッシュ（文字・スプライト）を温めてから測る
+        renderer.draw(game)
+        t0 = time.perf_counter()
+        run(game, rng, renderer, args.frames, args.steps_per_frame)
+        ms = (time.perf_counter() - t0) / args.frames * 1000
+        checksums[name] = state_checksum(game)
+        print(f"  {name:10s} {ms:7.2f} ms/frame  ({len(game.balls)} balls)")
+    print(f"  same result: {checksums['sequential'] == checksums['pipelined']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
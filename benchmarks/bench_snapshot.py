@@ -0,0 +1,109 @@
+# スナップショットの大きさと、保存・復元にかかる時間のベンチマーク
+#
+#   python benchmarks/bench_snapshot.py
+#   python benchmarks/bench_snapshot.py --balls 1000 --repeat 50
+#
+# 床から積んだボールを落ち着かせたものと、その上からボールを落としている最中のものについて、
+#   size      スナップショットのバイト数
+#   save      snapshot.save にかかる時間
+#   restore   同じゲームに戻す時間（Ball を使い回す。一手戻すとき）
+#   fresh     新しい Game に戻す時間（Ball を作り直す。クラッシュから再開するとき）
+# を測る。あわせて、復元してから進めた結果が復元しなかった場合と一致するかも確かめる。
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.join(os.path.dirname(__file__), "..", "web-pygame")
+sys.path.insert(0, HERE)
+
+import snapshot  # noqa: E402
+from game import Game, GameConfig  # noqa: E402
+from physics import FLOOR_Y, WALL_LEFT, WALL_RIGHT  # noqa: E402
+from replay import state_checksum  # noqa: E402
+
+
+# 床から上へ、格子状にボールを積む（bench_suite の stack_grid と同じ並べ方）
+def build(count, settle_steps, radius=10):
+    game = Game(1, GameConfig(drop_y=300))
+    cols = int((WALL_RIGHT - WALL_LEFT) // (radius * 2))
+    for i in range(count):
+        row, col = divmod(i, cols)
+        x = WALL_LEFT + radius + col * radius * 2
+        y = FLOOR_Y - radius - row * radius * 2
+        ball = game.create_ball(x, y, False, radius)
+        ball.size_label = 1 + (row % 2) * 2 + col % 2
+    advance(game, settle_steps)
+    return game
+
+
+# 1,000 個も積むと上の線を越えてゲームオーバーになるので、Game.step を通さずに進める
+def advance(game, steps):
+    for _ in range(steps):
+        game.step_physics(game.config.step)
+        game.steps += 1
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+# 復元したゲームを進めた結果が、元のゲームをそのまま進めた結果と同じになるか
+def check_exact(game, steps):
+    data = snapshot.save(game)
+    restored = Game(None, game.config)
+    snapshot.restore(restored, data)
+    if snapshot.save(restored) != data:
+        return False
+    rng = random.Random(5)
+    drops = [rng.uniform(WALL_LEFT + 40, WALL_RIGHT - 40) for _ in range(5)]
+    results = []
+    for target in (game, restored):
+        for x in drops:
+            target.drop(x)
+            advance(target, steps)
+        results.append((state_checksum(target), target.score, target.steps))
+    return results[0] == results[1]
+
+
+def report(label, game, repeat):
+    data = snapshot.save(game)
+    sleeping = sum(ball.sleeping for ball in game.balls)
+    fresh = Game(None, game.config)
+    print(
+        f"{label:8s} {len(game.balls):5d} balls ({sleeping} sleeping)"
+        f"  size {len(data) / 1024:6.1f} KiB"
+        f"  save {timed(lambda: snapshot.save(game), repeat):6.2f} ms"
+        f"  restore {timed(lambda: snapshot.restore(game, data), repeat):6.2f} ms"
+        f"  fresh {timed(lambda: snapshot.restore(fresh, data), repeat):6.2f} ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="スナップショットの大きさと速さを測る")
+    parser.add_argument("--balls", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--settle-steps", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    game = build(args.balls, args.settle_steps)
+    report("resting", game, args.repeat)
+    # 上から落としてたくさん起こす
+    for x in range(WALL_LEFT + 40, WALL_RIGHT - 40, 30):
+        game.drop(x)
+    advance(game, 20)
+    report("active", game, args.repeat)
+
+    exact = check_exact(game, 60)
+    print(f"restore then step matches: {'yes' if exact else 'NO'}")
+    return 0 if exact else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# 効果音の読み込みと、連鎖マージのときの鳴らし方のベンチマーク
+#
+#   python benchmarks/bench_sounds.py
+#   python benchmarks/bench_sounds.py --cascade 1 10 50 200 --frames 30
+#
+# 読み込み: MP3 をデコードするとき（キャッシュなし）と、デコード済みの PCM をキャッシュから読むときの時間。
+# 連鎖: 1フレームに cascade 回のマージが frames フレーム続いたとき、
+#   naive   マージのたびに Sound.play を呼ぶ（以前の main1.py のやり方）
+#   bank    SoundBank で同じフレームの音をまとめる
+# それぞれの play の回数・呼び出しにかかった時間・同時に鳴っていたチャンネル数の最大を表示する。
+# SDL のダミードライバで動くので音は出ない。
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+import pygame  # noqa: E402
+
+from assets import AssetManager  # noqa: E402
+from sound_bank import SOUNDS, SoundBank  # noqa: E402
+
+FRAME_MS = 1000 / 60
+
+
+def load_all(assets):
+    t0 = time.perf_counter()
+    for file_name, _, _ in SOUNDS.values():
+        assets.sound(file_name)
+    return (time.perf_counter() - t0) * 1000
+
+
+def busy_channels():
+    return sum(
+        pygame.mixer.Channel(i).get_busy() for i in range(pygame.mixer.get_num_channels())
+    )
+
+
+def stop_all():
+    pygame.mixer.stop()
+
+
+def run_naive(assets, cascade, frames):
+    sound = assets.sound(SOUNDS["merge"][0])
+    plays = 0
+    busy = 0
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        for _ in range(cascade):
+            sound.play()
+            plays += 1
+        busy = max(busy, busy_channels())
+    return plays, (time.perf_counter() - t0) * 1000, busy
+
+
+def run_bank(assets, cascade, frames):
+    bank = SoundBank(assets)
+    busy = 0
+    t0 = time.perf_counter()
+    for frame in range(frames):
+        bank.request("merge", cascade)
+        bank.flush(now=frame * FRAME_MS)
+        busy = max(busy, busy_channels())
+    elapsed = (time.perf_counter() - t0) * 1000
+    pygame.mixer.set_reserved(0)
+    return bank.played, elapsed, busy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="効果音の読み込みと鳴らし方を比べる")
+    parser.add_argument("--cascade", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    pygame.mixer.init()
+    if not pygame.mixer.get_init():
+        print("mixer is not available")
+        return 1
+    print(f"mixer {pygame.mixer.get_init()}, {pygame.mixer.get_num_channels()} channels")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        decode_ms = load_all(AssetManager(cache_dir=tmp))
+        cached = AssetManager(cache_dir=tmp)
+        cached_ms = load_all(cached)
+    print(f"load  decode {decode_ms:6.2f} ms  pcm cache {cached_ms:6.2f} ms")
+
+    for cascade in args.cascade:
+        for name, run in (("naive", run_naive), ("bank", run_bank)):
+            stop_all()
+            plays, ms, busy = run(cached, cascade, args.frames)
+            print(
+                f"cascade {cascade:4d} {name:6s} {plays:6d} plays"
+                f"  {ms / args.frames * 1000:8.1f} us/frame  max busy channels {busy}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# 起動時間のベンチマーク
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --import-budget-ms 300 --frame-budget-ms 500
+#
+# 新しいプロセスで次の2つを測り、それぞれ何回かのうち一番速かった値を採る。
+#   import      python -X importtime -c "import main" で main を import する時間と、時間のかかったモジュール
+#   first frame main.main(max_frames=1) で最初のフレームを描くまでの時間（main.py の import から）と、
+#               インタプリタの起動を含めたプロセス全体の時間
+# どちらかが予算を超えていれば終了コード 1 を返す。SDL のダミードライバで動くので画面は不要。
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "web-pygame")
+ENV = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+
+# 自動保存は切っておく（web-pygame/autosave.jgs を残すと、次に測るときや次のゲームがそこから再開してしまう）
+FIRST_FRAME = (
+    "import asyncio, main; main.autosave_path = None; asyncio.run(main.main(max_frames=1))"
+)
+
+
+# -X importtime の出力を (自分の μs, 合計の μs, モジュール名) のリストにする
+def parse_importtime(stderr):
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            rows.append((int(match[1]), int(match[2]), len(match[3]), match[4]))
+    return rows
+
+
+def measure_import():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=HERE,
+        env=ENV,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = parse_importtime(result.stderr)
+    end = next(i for i, row in enumerate(rows) if row[3] == "main")
+    # main の子は main の行の直前に並ぶ。その中でインデントが1段のものが直接の import
+    start = end
+    while start > 0 and rows[start - 1][2] > 1:
+        start -= 1
+    direct = [(cumulative, name) for _, cumulative, depth, name in rows[start:end] if depth == 3]
+    return rows[end][1] / 1000, sorted(direct, reverse=True)
+
+
+def measure_first_frame():
+    t0 = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_FRAME],
+        cwd=HERE,
+        env=ENV,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    process_ms = (time.perf_counter() - t0) * 1000
+    match = re.search(r"first frame (\d+) ms", result.stdout)
+    return float(match[1]), process_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="起動時間を測る")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=300)
+    parser.add_argument("--frame-budget-ms", type=float, default=400)
+    parser.add_argument("--top", type=int, default=8, help="表示するモジュールの数")
+    args = parser.parse_args(argv)
+
+    imports = [measure_import() for _ in range(args.repeat)]
+    import_ms, direct = min(imports)
+    frames = [measure_first_frame() for _ in range(args.repeat)]
+    frame_ms, process_ms = min(frames)
+
+    print(f"import main     {import_ms:7.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    for cumulative, name in direct[: args.top]:
+        print(f"  {name:24s} {cumulative / 1000:7.1f} ms")
+    print(f"first frame     {frame_ms:7.1f} ms (budget {args.frame_budget_ms:.0f} ms)")
+    print(f"process total   {process_ms:7.1f} ms (python の起動と終了を含む)")
+
+    over = import_ms > args.import_budget_ms or frame_ms > args.frame_budget_ms
+    if over:
+        print("OVER BUDGET")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# ゲームループの各フェーズを決まったシナリオで測るベンチマークスイート
+#
+#   python benchmarks/bench_suite.py run --out results.json
+#   python benchmarks/bench_suite.py compare baseline.json results.json --threshold 0.25
+#
+# フェーズは Ball.update（integrate）、衝突判定と接触の解決（collide）、Game.merge（merge）、
+# 眠らせる判定（sleep）、ボールの描画（draw）の5つ。シナリオはすべてシード付きで毎回同じ配置から始まる。
+# SDL のダミードライバで動くので、画面のない CI のマシンでも実行できる。
+# compare はどれかのフェーズが threshold を超えて遅くなっていれば終了コード 1 を返す。
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+import pygame  # noqa: E402
+
+from game import Game, GameConfig  # noqa: E402
+from physics import FLOOR_Y, GAME_OVER_LINE, HEIGHT, WALL_LEFT, WALL_RIGHT  # noqa: E402
+from physics_backend import BACKENDS  # noqa: E402
+from renderer import Renderer  # noqa: E402
+
+PHASES = ("update", "collide", "merge", "sleep", "draw")
+
+
+# resting_N は床から上へ格子状にボールを積む。サイズ2と3（半径20と30）を市松模様に並べるので、
+# 上下左右のとなりはサイズが違い（半径の和の 50 でちょうど触れる）、同じサイズのボールは斜めに 50√2
+# 離れていてマージしない。高く積むと崩れるので RESTING_ROWS 段までにして、ボールが多いときは
+# 箱の幅を広げる（100 個なら元の箱と同じ幅。広い箱は Renderer が画面に収まるように縮小して描く）
+RESTING_ROWS = 10
+RESTING_PITCH = 50
+
+
+def resting_arena(count):
+    cols = -(-count // RESTING_ROWS)
+    inner = cols * RESTING_PITCH + 10
+    return {
+        "name": f"resting {count}",
+        "width": WALL_LEFT * 2 + inner,
+        "height": HEIGHT,
+        "walls": {"left": WALL_LEFT, "right": WALL_LEFT + inner, "floor": FLOOR_Y},
+    }
+
+
+def stack_grid(game, count):
+    arena = game.arena
+    for i in range(count):
+        col, row = divmod(i, RESTING_ROWS)
+        size_label = 2 + (row + col) % 2
+        x = arena.left + 30 + col * RESTING_PITCH
+        y = arena.floor - 30 - row * RESTING_PITCH
+        game.create_ball(x, y, False, size_label * 10)
+
+
+def scenario_empty(game, rng):
+    pass
+
+
+def scenario_resting(count):
+    def build(game, rng):
+        stack_grid(game, count)
+
+    return build
+
+
+# 同じサイズのボールを2つずつ重ねて置き、連鎖的にマージさせる
+def scenario_merge_cascade(game, rng):
+    x = WALL_LEFT + 30
+    y = FLOOR_Y - 30
+    while y > GAME_OVER_LINE + 60:
+        size_label = rng.randint(1, 3)
+        radius = size_label * 10
+        game.create_ball(x, y, False, radius)
+        game.create_ball(x + radius * 1.5, y, False, radius)
+        x += radius * 4
+        if x > WALL_RIGHT - 60:
+            x = WALL_LEFT + 30
+            y -= 60
+
+
+# ゲームオーバーの線（y=97）のすぐ下までいろいろなサイズのボールを詰める
+def scenario_full_container(game, rng):
+    y = FLOOR_Y
+    while True:
+        radius = rng.randint(1, 4) * 10
+        if y - radius * 2 < GAME_OVER_LINE + 5:
+            break
+        x = WALL_LEFT
+        row_height = 0
+        while True:
+            radius = rng.randint(1, 4) * 10
+            if x + radius * 2 > WALL_RIGHT:
+                break
+            game.create_ball(x + radius, y - radius, False, radius)
+            x += radius * 2 + 1
+            row_height = max(row_height, radius * 2)
+        y -= row_height + 1
+
+
+# 名前 -> (ボールを置く関数, 測る前に進めるステップ数, アリーナ（None なら元の箱）)
+SCENARIOS = {
+    "empty": (scenario_empty, 0, None),
+    "resting_100": (scenario_resting(100), 60, resting_arena(100)),
+    "resting_500": (scenario_resting(500), 60, resting_arena(500)),
+    "resting_2000": (scenario_resting(2000), 60, resting_arena(2000)),
+    "merge_cascade": (scenario_merge_cascade, 0, None),
+    "full_container": (scenario_full_container, 0, None),
+    # 詰めたボールが落ち着いて眠ったあと（6秒後）の定常状態
+    "full_container_settled": (scenario_full_container, 720, None),
+}
+
+# アリーナの名前 -> Renderer（スプライトを焼くのに時間がかかるので使い回す）
+_renderers = {}
+
+
+def renderer_for(screen, arena):
+    renderer = _renderers.get(arena.name)
+    if renderer is None:
+        renderer = _renderers[arena.name] = Renderer(screen, arena=arena)
+    return renderer
+
+
+# アリーナは level_dir にレベルファイルとして書いて GameConfig.level で渡す
+def run_scenario(name, screen, steps, seed, backend, level_dir):
+    build, warmup, arena = SCENARIOS[name]
+    level = ""
+    if arena is not None:
+        level = os.path.join(level_dir, f"{name}.json")
+        with open(level, "w") as f:
+            json.dump(arena, f)
+    config = GameConfig(backend=backend, level=level)
+    game = Game(seed, config)
+    renderer = renderer_for(screen, game.arena)
+    build(game, random.Random(seed))
+    for _ in range(warmup):
+        game.step_physics(config.step)
+
+    samples = {phase: [] for phase in PHASES}
+    balls_at_start = len(game.balls)
+    merges_at_start = game.merges
+    perf = time.perf_counter
+    dt = config.step
+    screen = renderer.screen
+    for _ in range(steps):
+        game.save_previous()
+
+        t0 = perf()
+        game.integrate(dt)
+        t1 = perf()
+        pairs = game.collide()
+        t2 = perf()
+        game.merge(pairs)
+        t3 = perf()
+        game.update_sleep()
+        t4 = perf()
+        screen.blit(renderer.static_layer, (0, 0))
+        renderer.draw_balls(game.balls, 1.0)
+        t5 = perf()
+
+        samples["update"].append(t1 - t0)
+        samples["collide"].append(t2 - t1)
+        samples["merge"].append(t3 - t2)
+        samples["sleep"].append(t4 - t3)
+        samples["draw"].append(t5 - t4)
+
+    phases = {}
+    for phase, values in samples.items():
+        values.sort()
+        phases[phase] = {
+            "median_ms": statistics.median(values) * 1000,
+            "mean_ms": statistics.fmean(values) * 1000,
+            "p95_ms": values[int(len(values) * 0.95) - 1] * 1000,
+        }
+    return {
+        "balls": balls_at_start,
+        "balls_end": len(game.balls),
+        "merges": game.merges - merges_at_start,
+        "steps": steps,
+        "phases": phases,
+    }
+
+
+def command_run(args):
+    pygame.init()
+    screen = pygame.display.set_mode((900, 600))
+
+    names = args.scenario or list(SCENARIOS)
+    results = {}
+    with tempfile.TemporaryDirectory() as level_dir:
+        for name in names:
+            # 何回か回して、フェーズごとに一番速かった回の値を採る
+            best = None
+            for _ in range(args.repeat):
+                result = run_scenario(
+                    name, screen, args.steps, args.seed, args.backend, level_dir
+                )
+                if best is None:
+                    best = result
+                    continue
+                for phase in PHASES:
+                    if result["phases"][phase]["median_ms"] < best["phases"][phase]["median_ms"]:
+                        best["phases"][phase] = result["phases"][phase]
+            results[name] = best
+            phases = " ".join(
+                f"{phase}={best['phases'][phase]['median_ms']:.3f}" for phase in PHASES
+            )
+            print(f"{name:22s} balls={best['balls']:5d} {phases} (ms/step)")
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "steps": args.steps,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "backend": args.backend,
+        },
+        "scenarios": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+    return 0
+
+
+def command_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)["scenarios"]
+    with open(args.current) as f:
+        current = json.load(f)["scenarios"]
+
+    failed = False
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        for phase in PHASES:
+            # 古い結果にないフェーズは比べない
+            if phase not in baseline[name]["phases"]:
+                continue
+            old = baseline[name]["phases"][phase]["median_ms"]
+            new = result["phases"][phase]["median_ms"]
+            # ごく短いフェーズは誤差で大きく揺れるので、絶対値の差も見る
+            regressed = new > old * (1 + args.threshold) and new - old > args.min_ms
+            ratio = new / old if old > 0 else float("inf")
+            mark = "REGRESSED" if regressed else "ok"
+            print(f"{name:22s} {phase:8s} {old:9.3f} -> {new:9.3f} ms ({ratio:5.2f}x) {mark}")
+            failed = failed or regressed
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ゲームループのベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="シナリオを実行して結果を JSON に書く")
+    run.add_argument("--out", help="結果を書き出す JSON ファイル")
+    run.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    run.add_argument("--steps", type=int, default=120)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--backend", choices=BACKENDS, default=GameConfig.backend)
+    run.set_defaults(func=command_run)
+
+    compare = sub.add_parser("compare", help="2つの結果を比べて、遅くなっていれば失敗する")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.25, help="許容する悪化率")
+    compare.add_argument("--min-ms", type=float, default=0.05, help="無視する差（ms）")
+    compare.set_defaults(func=command_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
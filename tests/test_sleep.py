@@ -0,0 +1,44 @@
+# 眠っているボールが支えを失ったまま宙に浮かないことを確かめる
+#
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-pygame"))
+
+from game import Game, GameConfig  # noqa: E402
+
+
+# 眠っているボールのうち、床にも下のボールにも乗っていないもの
+def floating(game, margin=2):
+    balls = list(game.balls)
+    found = []
+    for ball in balls:
+        if not ball.sleeping or ball.y + ball.radius >= game.arena.floor - margin:
+            continue
+        supported = False
+        for other in balls:
+            if other is ball or other.y <= ball.y:
+                continue
+            reach = ball.radius + other.radius + margin
+            if (other.x - ball.x) ** 2 + (other.y - ball.y) ** 2 < reach * reach:
+                supported = True
+                break
+        if not supported:
+            found.append(ball)
+    return found
+
+
+# サイズ 1・3・2 を積んで眠らせ、一番下のボールをマージで消す
+def test_stack_falls_after_bottom_ball_merges():
+    game = Game(0, GameConfig(backend="python"))
+    for size_label, y in ((1, 540), (3, 500), (2, 450)):
+        game.create_ball(450, y, False, size_label * 10)
+    game.step(400)
+    assert all(ball.sleeping for ball in game.balls)
+
+    game.create_ball(462, 540, False, 10)
+    game.step(2400)
+    assert game.merges >= 1
+    assert floating(game) == []
+    assert all(ball.sleeping for ball in game.balls)
@@ -0,0 +1,219 @@
+# アリーナ（ボールを入れるコンテナ）の形
+#
+#   arena = Arena()                          # 元の 900x600 の箱
+#   arena = load_arena("levels/funnel.json") # レベルファイルから読む
+#
+# アリーナは次のものを持つ。
+#   - ワールドの大きさ（ウィンドウの大きさとは別。描画するときは camera.py で拡大・縮小する）
+#   - 左右の壁と床（どのアリーナにもある箱。Ball.update が押し戻す）
+#   - ゲームオーバーの線と、ボールを落とせる高さ（この y より上をクリックしたときだけ落とす）
+#   - 箱の中に置く動かない当たり判定
+#       Segment  太さのある線分（斜めの床・じょうご・仕切り）
+#       Peg      動かない円（ピン）
+# 当たり判定は StaticBVH に入れておき、ボールごとに近くのものだけを調べる。
+#
+# レベルファイル（JSON）。walls 以外は省略できる（省略すると元の箱と同じ値）
+#   {
+#     "name": "funnel",
+#     "width": 900, "height": 600,
+#     "walls": {"left": 195, "right": 705, "floor": 550},
+#     "game_over_line": 97,
+#     "drop_zone": 120,
+#     "segments": [[x1, y1, x2, y2], [x1, y1, x2, y2, 太さの半分], ...],
+#     "pegs": [[x, y, 半径], ...]
+#   }
+import json
+import math
+
+from physics import (
+    FLOOR_Y,
+    FRICTION,
+    GAME_OVER_LINE,
+    HEIGHT,
+    REST_VY,
+    RESTITUTION,
+    WALL_LEFT,
+    WALL_RIGHT,
+    WIDTH,
+)
+from static_bvh import StaticBVH
+
+# 画面の上部120px内でクリックしたときだけボールを落とせる
+DROP_ZONE = 120
+# 線分の太さの半分（レベルファイルで省略したとき）
+SEGMENT_RADIUS = 5
+# これより近ければ触れているとして跳ね返す（連続衝突判定はぴったり触れる位置で止めるので）
+TOUCH_MARGIN = 0.5
+
+
+# 太さのある線分（両端が丸いカプセル）
+class Segment:
+    __slots__ = ("x1", "y1", "x2", "y2", "radius", "dx", "dy", "inv_length_sq", "key")
+
+    def __init__(self, x1, y1, x2, y2, radius=SEGMENT_RADIUS):
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.radius = radius
+        self.dx = x2 - x1
+        self.dy = y2 - y1
+        length_sq = self.dx * self.dx + self.dy * self.dy
+        self.inv_length_sq = 1.0 / length_sq if length_sq else 0.0
+        # 接触ソルバーの力積を覚えるときの番号（Arena が振る）
+        self.key = 0
+
+    def bounds(self):
+        r = self.radius
+        return (
+            min(self.x1, self.x2) - r,
+            min(self.y1, self.y2) - r,
+            max(self.x1, self.x2) + r,
+            max(self.y1, self.y2) + r,
+        )
+
+    # 線分の上で (x, y) に一番近い点
+    def closest(self, x, y):
+        t = ((x - self.x1) * self.dx + (y - self.y1) * self.dy) * self.inv_length_sq
+        if t <= 0:
+            return self.x1, self.y1
+        if t >= 1:
+            return self.x2, self.y2
+        return self.x1 + self.dx * t, self.y1 + self.dy * t
+
+
+# 動かない円
+class Peg:
+    __slots__ = ("x", "y", "radius", "key")
+
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.key = 0
+
+    def bounds(self):
+        r = self.radius
+        return self.x - r, self.y - r, self.x + r, self.y + r
+
+    def closest(self, x, y):
+        return self.x, self.y
+
+
+class Arena:
+    def __init__(
+        self,
+        name="box",
+        width=WIDTH,
+        height=HEIGHT,
+        left=WALL_LEFT,
+        right=WALL_RIGHT,
+        floor=FLOOR_Y,
+        game_over_line=GAME_OVER_LINE,
+        drop_zone=DROP_ZONE,
+        segments=(),
+        pegs=(),
+    ):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.left = left
+        self.right = right
+        self.floor = floor
+        self.game_over_line = game_over_line
+        self.drop_zone = drop_zone
+        self.segments = list(segments)
+        self.pegs = list(pegs)
+        # 壁と床（内向きの法線 (nx, ny) と、n・p がこの値以上なら外に出ていないという値）
+        self.planes = (
+            (0.0, -1.0, -floor),
+            (1.0, 0.0, left),
+            (-1.0, 0.0, -right),
+        )
+        # 力積の番号は、壁と床（-1 から）に続けて負の数を振る
+        self.colliders = self.segments + self.pegs
+        for i, collider in enumerate(self.colliders):
+            collider.key = -1 - len(self.planes) - i
+        self.bvh = StaticBVH(self.colliders) if self.colliders else None
+
+    def __repr__(self):
+        return (
+            f"Arena({self.name!r}, {self.width}x{self.height},"
+            f" {len(self.segments)} segments, {len(self.pegs)} pegs)"
+        )
+
+
+DEFAULT_ARENA = Arena()
+
+
+def arena_from_dict(values):
+    walls = values.get("walls", {})
+    arena = Arena(
+        name=values.get("name", "level"),
+        width=values.get("width", WIDTH),
+        height=values.get("height", HEIGHT),
+        left=walls.get("left", WALL_LEFT),
+        right=walls.get("right", WALL_RIGHT),
+        floor=walls.get("floor", FLOOR_Y),
+        game_over_line=values.get("game_over_line", GAME_OVER_LINE),
+        drop_zone=values.get("drop_zone", DROP_ZONE),
+        segments=[Segment(*segment) for segment in values.get("segments", [])],
+        pegs=[Peg(*peg) for peg in values.get("pegs", [])],
+    )
+    if not arena.left < arena.right <= arena.width:
+        raise ValueError(f"bad walls in arena {arena.name!r}: {walls}")
+    if not arena.game_over_line < arena.floor <= arena.height:
+        raise ValueError(f"bad floor in arena {arena.name!r}: {walls}")
+    return arena
+
+
+def load_arena(path):
+    with open(path, encoding="utf-8") as f:
+        return arena_from_dict(json.load(f))
+
+
+_loaded = {}
+
+
+# GameConfig.level のアリーナ（空なら元の箱）。同じファイルは1回だけ読む
+def arena_for(level):
+    if not level:
+        return DEFAULT_ARENA
+    arena = _loaded.get(level)
+    if arena is None:
+        arena = _loaded[level] = load_arena(level)
+    return arena
+
+
+# ball が collider にめり込んでいたら押し出し、触れたまま近づいていたら跳ね返す
+# （床と同じ反発係数と摩擦）。押し出したら True
+def collide_static(ball, collider):
+    px, py = collider.closest(ball.x, ball.y)
+    dx = ball.x - px
+    dy = ball.y - py
+    reach = ball.radius + collider.radius
+    limit = reach + TOUCH_MARGIN
+    distance_sq = dx * dx + dy * dy
+    if distance_sq >= limit * limit or distance_sq == 0:
+        return False
+    distance = math.sqrt(distance_sq)
+    nx = dx / distance
+    ny = dy / distance
+    pushed = distance < reach
+    if pushed:
+        ball.x = px + nx * reach
+        ball.y = py + ny * reach
+
+    vn = ball.vx * nx + ball.vy * ny
+    if vn < 0:
+        # 接線 (-ny, nx) の向きの速さは摩擦で減らし、法線の向きは反発係数で跳ね返す
+        vt = ball.vy * nx - ball.vx * ny
+        vn = -vn * RESTITUTION
+        if vn < REST_VY:
+            vn = 0
+        vt *= FRICTION
+        ball.vx = nx * vn - ny * vt
+        ball.vy = ny * vn + nx * vt
+        # 転がる向きに回す
+        ball.angular_velocity = vt / ball.radius
+    return pushed
@@ -0,0 +1,333 @@
+# 画像・フォント・効果音の読み込み
+#
+# images/ の元の画像は数百〜数千 px 四方あり、起動のたびに読み込んで縮小すると
+# それだけで時間がかかる。AssetManager は
+#   - 画像を一度だけ読み込み、ディスプレイのピクセル形式に変換（convert / convert_alpha）して覚えておく
+#   - 縮小した画像を .asset-cache/ に PNG で保存し、次からはそれを読む
+#     （元の画像の更新時刻と大きさが変わったら作り直す）
+#   - 効果音は初めて鳴らすときに読み込む。MP3 をデコードした PCM を .asset-cache/ に保存し、
+#     次からはデコードせずにそのまま読む（ミキサーの形式ごとに別のファイルにする）
+# ブラウザ版（pygbag）では、縮小済みの画像と効果音とフォントを1つのバンドルにまとめておき、
+# ファイルを1回読むだけで済ませる。
+#
+#   python assets.py pack                 # assets.bundle を作る
+#   python assets.py info assets.bundle   # バンドルの中身を表示する
+#
+# バンドルの中身（リトルエンディアン）
+#   "JGAB"、バージョン (B)、マニフェストの JSON の長さ (I)、マニフェストの JSON、データ
+#   マニフェストは {名前: {"kind", "offset", "size", ...}}（offset はデータの先頭から）
+import argparse
+import io
+import json
+import os
+import struct
+import sys
+import time
+
+import pygame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(HERE, "images")
+SOUND_DIR = os.path.join(HERE, "sounds")
+FONT_PATH = os.path.join(HERE, "BitCheese10(sRB).TTF")
+CACHE_DIR = os.path.join(HERE, ".asset-cache")
+BUNDLE_PATH = os.path.join(HERE, "assets.bundle")
+
+MAGIC = b"JGAB"
+VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+
+
+class AssetError(Exception):
+    pass
+
+
+# ボール（サイズラベル 1〜10）の絵を収める大きさ（直径）
+def ball_box(size_label):
+    return size_label * 20
+
+
+# 縮小した画像の名前。"ball_3" を 60px 四方に収めたものは "ball_3@60"
+def variant_name(name, box):
+    return f"{name}@{box}"
+
+
+# 拡張子を除いた小文字の名前 -> パス（ball_6.PNG のように大文字の拡張子もある）
+def index_dir(directory):
+    files = {}
+    if os.path.isdir(directory):
+        for entry in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(entry)
+            if ext:
+                files.setdefault(stem.lower(), os.path.join(directory, entry))
+    return files
+
+
+# 縦横比を保ったまま box px 四方に収まるように縮小する
+def fit(surface, box):
+    scale = box / max(surface.get_width(), surface.get_height())
+    size = (
+        max(1, int(surface.get_width() * scale)),
+        max(1, int(surface.get_height() * scale)),
+    )
+    return pygame.transform.smoothscale(surface, size)
+
+
+# ディスプレイがあればそのピクセル形式に変換する（アルファがあれば残す）
+def to_display_format(surface):
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+def encode_png(surface):
+    data = io.BytesIO()
+    pygame.image.save(surface, data, "image.png")
+    return data.getvalue()
+
+
+class Bundle:
+    def __init__(self, manifest, data):
+        self.manifest = manifest
+        self.data = data
+        # 縮小した画像が入っている元の画像の名前
+        self.images = {
+            name.split("@")[0] for name, entry in manifest.items() if entry["kind"] == "image"
+        }
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            magic, version, manifest_size = _HEADER.unpack_from(raw, 0)
+            if magic != MAGIC:
+                raise AssetError("not an asset bundle")
+            if version != VERSION:
+                raise AssetError(f"unsupported bundle version {version}")
+            start = _HEADER.size
+            manifest = json.loads(raw[start : start + manifest_size])
+        except (struct.error, ValueError) as e:
+            raise AssetError(f"broken bundle: {e}") from e
+        return cls(manifest, memoryview(raw)[start + manifest_size :])
+
+    def __contains__(self, name):
+        return name in self.manifest
+
+    def read(self, name):
+        entry = self.manifest[name]
+        return self.data[entry["offset"] : entry["offset"] + entry["size"]].tobytes()
+
+
+class AssetManager:
+    def __init__(self, cache_dir=CACHE_DIR, bundle_path=None):
+        self.cache_dir = cache_dir
+        self.bundle = Bundle.load(bundle_path) if bundle_path else None
+        self.images = index_dir(IMAGE_DIR)
+        self.sound_files = index_dir(SOUND_DIR)
+        self.surfaces = {}
+        self.sounds = {}
+        self.fonts = {}
+        # (名前, どこから読んだか, ms) を読み込んだ順に記録する
+        self.timings = []
+
+    def _timed(self, name, source, t0):
+        self.timings.append((name, source, (time.perf_counter() - t0) * 1000))
+
+    def has_image(self, name):
+        if name.lower() in self.images:
+            return True
+        return self.bundle is not None and name in self.bundle.images
+
+    # 元の大きさの画像
+    def image(self, name):
+        surface = self.surfaces.get(name)
+        if surface is None:
+            t0 = time.perf_counter()
+            path = self.images.get(name.lower())
+            if path is None:
+                raise AssetError(f"no image named {name!r}")
+            surface = to_display_format(pygame.image.load(path))
+            self.surfaces[name] = surface
+            self._timed(name, "source", t0)
+        return surface
+
+    # box px 四方に収まるように縮小した画像（バンドル、ディスクのキャッシュ、元の画像の順に探す）
+    def fitted(self, name, box):
+        key = variant_name(name, box)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            return surface
+        t0 = time.perf_counter()
+        if self.bundle is not None and key in self.bundle:
+            surface = pygame.image.load(io.BytesIO(self.bundle.read(key)), "image.png")
+            source = "bundle"
+        else:
+            surface, source = self._fitted_from_disk(name, box, key)
+        surface = to_display_format(surface)
+        self.surfaces[key] = surface
+        self._timed(key, source, t0)
+        return surface
+
+    def _fitted_from_disk(self, name, box, key):
+        path = self.images.get(name.lower())
+        if path is None:
+            raise AssetError(f"no image named {name!r}")
+        stat = os.stat(path)
+        # 元の画像が変わったらファイル名が変わるので、古いキャッシュは使われない
+        cached = None
+        if self.cache_dir:
+            cached = os.path.join(
+                self.cache_dir, f"{key}-{stat.st_size:x}-{stat.st_mtime_ns:x}.png"
+            )
+            if os.path.exists(cached):
+                return pygame.image.load(cached), "cache"
+
+        surface = fit(pygame.image.load(path), box)
+        if cached is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # 書きかけのファイルを読まないように、別名で書いてから置き換える
+                tmp = cached + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(encode_png(surface))
+                os.replace(tmp, cached)
+            except OSError:
+                pass  # 書き込めない環境（ブラウザなど）ではキャッシュしない
+        return surface, "source"
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            if self.bundle is not None and "font" in self.bundle:
+                font = pygame.font.Font(io.BytesIO(self.bundle.read("font")), size)
+            else:
+                font = pygame.font.Font(FONT_PATH, size)
+            self.fonts[size] = font
+        return font
+
+    # 効果音は初めて使うときに読み込む。ミキサーが使えないときは None
+    def sound(self, name):
+        if name in self.sounds:
+            return self.sounds[name]
+        sound = None
+        mixer = pygame.mixer.get_init()
+        if mixer:
+            t0 = time.perf_counter()
+            key = name.lower()
+            if self.bundle is not None and key in self.bundle:
+                sound = pygame.mixer.Sound(file=io.BytesIO(self.bundle.read(key)))
+                source = "bundle"
+            else:
+                sound, source = self._sound_from_disk(name, key, mixer)
+            self._timed(name, source, t0)
+        self.sounds[name] = sound
+        return sound
+
+    def _sound_from_disk(self, name, key, mixer):
+        path = self.sound_files.get(key)
+        if path is None:
+            raise AssetError(f"no sound named {name!r}")
+        stat = os.stat(path)
+        cached = None
+        if self.cache_dir:
+            # PCM の中身はミキサーの (周波数, 形式, チャンネル数) で変わる
+            frequency, size, channels = mixer
+            cached = os.path.join(
+                self.cache_dir,
+                f"{key}-{stat.st_size:x}-{stat.st_mtime_ns:x}-{frequency}-{size}-{channels}.pcm",
+            )
+            if os.path.exists(cached):
+                with open(cached, "rb") as f:
+                    return pygame.mixer.Sound(buffer=f.read()), "cache"
+
+        sound = pygame.mixer.Sound(path)
+        if cached is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = cached + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(sound.get_raw())
+                os.replace(tmp, cached)
+            except OSError:
+                pass
+        return sound, "source"
+
+    # 読み込みにかかった時間の合計（ms）を読み込み元ごとに返す
+    def report(self):
+        totals = {}
+        for _, source, ms in self.timings:
+            totals[source] = totals.get(source, 0.0) + ms
+        return {"assets": len(self.timings), "ms": totals}
+
+
+# 縮小済みのボールの絵・効果音・フォントを1つのファイルにまとめる
+def pack(path, boxes=None):
+    images = index_dir(IMAGE_DIR)
+    if boxes is None:
+        boxes = {f"ball_{n}": ball_box(n) for n in range(1, 11)}
+    entries = []
+    for name, box in sorted(boxes.items()):
+        source = images.get(name.lower())
+        if source is None:
+            continue
+        surface = fit(pygame.image.load(source), box)
+        entries.append(
+            (variant_name(name, box), "image", encode_png(surface), surface.get_size())
+        )
+    for name, source in sorted(index_dir(SOUND_DIR).items()):
+        with open(source, "rb") as f:
+            entries.append((name, "sound", f.read(), None))
+    if os.path.exists(FONT_PATH):
+        with open(FONT_PATH, "rb") as f:
+            entries.append(("font", "font", f.read(), None))
+
+    manifest = {}
+    blobs = []
+    offset = 0
+    for name, kind, data, size in entries:
+        entry = {"kind": kind, "offset": offset, "size": len(data)}
+        if size is not None:
+            entry["width"], entry["height"] = size
+        manifest[name] = entry
+        blobs.append(data)
+        offset += len(data)
+    header = json.dumps(manifest, sort_keys=True).encode()
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for data in blobs:
+            f.write(data)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="アセットのバンドルを作る")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_parser = sub.add_parser("pack", help="縮小済みの画像と効果音をバンドルにまとめる")
+    pack_parser.add_argument("--out", default=BUNDLE_PATH)
+    info_parser = sub.add_parser("info", help="バンドルの中身を表示する")
+    info_parser.add_argument("path", nargs="?", default=BUNDLE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        manifest = pack(args.out)
+        total = sum(entry["size"] for entry in manifest.values())
+        print(f"wrote {args.out}: {len(manifest)} assets, {total / 1024:.0f} KiB")
+        return 0
+
+    try:
+        bundle = Bundle.load(args.path)
+    except (OSError, AssetError) as e:
+        print(f"{args.path}: {e}")
+        return 1
+    for name, entry in sorted(bundle.manifest.items()):
+        size = f" {entry['width']}x{entry['height']}" if "width" in entry else ""
+        print(f"{name:24s} {entry['kind']:6s} {entry['size'] / 1024:8.1f} KiB{size}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
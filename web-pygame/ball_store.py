@@ -0,0 +1,72 @@
+# ボールの入れ物（list の代わり）
+#
+# 追加したボールには通し番号の id を振り、入っている間は alive を True にする。
+# ball.slot に自分の位置を持たせているので、削除は末尾のボールとの入れ替えで O(1)、
+# `ball in store` も alive を見るだけで O(1) になる（list だとどちらも線形探索）。
+# 削除すると並び順は変わるが、id は変わらないので id で並べれば順序は決まる。
+
+
+class BallStore:
+    def __init__(self):
+        self.items = []
+        # id -> ball
+        self.by_id = {}
+        self.next_id = 0
+
+    def append(self, ball):
+        ball.id = self.next_id
+        self.next_id += 1
+        ball.slot = len(self.items)
+        ball.alive = True
+        self.items.append(ball)
+        self.by_id[ball.id] = ball
+        return ball
+
+    def remove(self, ball):
+        if ball not in self:
+            raise ValueError("ball is not in this store")
+        items = self.items
+        i = ball.slot
+        last = items.pop()
+        if last is not ball:
+            # 末尾のボールを空いた場所に移す
+            items[i] = last
+            last.slot = i
+        del self.by_id[ball.id]
+        ball.alive = False
+        ball.slot = -1
+
+    def clear(self):
+        for ball in self.items:
+            ball.alive = False
+            ball.slot = -1
+        self.items = []
+        self.by_id = {}
+
+    # 中身を balls（この順番）に入れ替える。ball.id はそのまま使う（スナップショットの復元用）
+    def replace(self, balls, next_id):
+        for ball in self.items:
+            ball.alive = False
+            ball.slot = -1
+        self.items = list(balls)
+        self.by_id = {}
+        for i, ball in enumerate(self.items):
+            ball.slot = i
+            ball.alive = True
+            self.by_id[ball.id] = ball
+        self.next_id = next_id
+
+    def get(self, ball_id):
+        return self.by_id.get(ball_id)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __contains__(self, ball):
+        return getattr(ball, "alive", False) and self.by_id.get(ball.id) is ball
@@ -0,0 +1,315 @@
+# NumPy の配列でボールをまとめて扱う物理演算（構造体の配列ではなく配列の構造体）
+#
+# Ball.update と、ボール同士の重なりの押し出し・速度の交換（質量は同じとする）を
+# 全ボール分まとめてベクトル演算で行う。ContactSolver の反復はしない。
+# 描画側には BallView を渡すので、これまで通り ball.x や ball.color が使える。
+# ボールの削除は末尾の要素との入れ替えで O(1)。
+import numpy as np
+
+from physics import (
+    BALL_COLORS,
+    FLOOR_Y,
+    FRICTION,
+    GRAVITY,
+    REST_VX,
+    REST_VY,
+    RESTITUTION,
+    WALL_LEFT,
+    WALL_RIGHT,
+)
+
+
+# 配列の中の1個のボールを Ball と同じ属性で見せるためのクラス
+class BallView:
+    __slots__ = ("world", "index", "id")
+
+    def __init__(self, world, index, ball_id=-1):
+        self.world = world
+        self.index = index
+        self.id = ball_id
+
+    def _field(name):
+        def get(self):
+            return getattr(self.world, name)[self.index].item()
+
+        def set(self, value):
+            getattr(self.world, name)[self.index] = value
+
+        return property(get, set)
+
+    x = _field("x")
+    y = _field("y")
+    vx = _field("vx")
+    vy = _field("vy")
+    radius = _field("radius")
+    size_label = _field("size_label")
+    angle = _field("angle")
+    angular_velocity = _field("angular_velocity")
+    prev_x = _field("prev_x")
+    prev_y = _field("prev_y")
+    prev_angle = _field("prev_angle")
+    del _field
+
+    # BallWorld ではボールを眠らせない
+    sleeping = False
+
+    @property
+    def alive(self):
+        return self.world is not None
+
+    @property
+    def color(self):
+        return BALL_COLORS[(self.size_label - 1) % len(BALL_COLORS)]
+
+
+class BallWorld:
+    FLOAT_FIELDS = (
+        "x",
+        "y",
+        "vx",
+        "vy",
+        "angle",
+        "angular_velocity",
+        "prev_x",
+        "prev_y",
+        "prev_angle",
+    )
+    INT_FIELDS = ("radius", "size_label")
+
+    # left・right・floor はアリーナの壁と床
+    def __init__(self, capacity=256, left=WALL_LEFT, right=WALL_RIGHT, floor=FLOOR_Y):
+        self.left = left
+        self.right = right
+        self.floor = floor
+        self.count = 0
+        self.capacity = capacity
+        for name in self.FLOAT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        for name in self.INT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.int64))
+        self.views = []
+        # ボールの通し番号（削除や入れ替えがあっても変わらない）
+        self.next_id = 0
+        # 円の判定をしたペアの累計
+        self.pairs_tested = 0
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in self.FLOAT_FIELDS + self.INT_FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def add(self, x, y, radius, size_label):
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = 0
+        self.vy[i] = 0
+        self.angle[i] = 0
+        self.angular_velocity[i] = 0
+        self.prev_x[i] = x
+        self.prev_y[i] = y
+        self.prev_angle[i] = 0
+        self.radius[i] = radius
+        self.size_label[i] = size_label
+        self.count += 1
+        view = BallView(self, i, self.next_id)
+        self.next_id += 1
+        self.views.append(view)
+        return view
+
+    # list と同じように Ball を追加できるようにしておく
+    def append(self, ball):
+        view = self.add(ball.x, ball.y, ball.radius, ball.size_label)
+        view.vx = ball.vx
+        view.vy = ball.vy
+        view.angle = view.prev_angle = ball.angle
+        view.angular_velocity = ball.angular_velocity
+        return view
+
+    def remove(self, view):
+        if view not in self:
+            raise ValueError("ball is not in this world")
+        i = view.index
+        last = self.count - 1
+        if i != last:
+            # 末尾のボールを空いた場所に移す
+            for name in self.FLOAT_FIELDS + self.INT_FIELDS:
+                arr = getattr(self, name)
+                arr[i] = arr[last]
+            moved = self.views[last]
+            moved.index = i
+            self.views[i] = moved
+        self.views.pop()
+        self.count = last
+        view.world = None
+        view.index = -1
+
+    def clear(self):
+        for view in self.views:
+            view.world = None
+            view.index = -1
+        self.views = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def __getitem__(self, i):
+        return self.views[i]
+
+    def __contains__(self, view):
+        return getattr(view, "world", None) is self
+
+    # 描画の補間用に今の状態を覚えておく
+    def save_previous(self):
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.prev_angle[:n] = self.angle[:n]
+
+    # Ball.update を全ボールまとめて行う
+    def integrate(self, dt):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        r = self.radius[:n]
+        av = self.angular_velocity[:n]
+
+        vy += GRAVITY * dt
+        x += vx * dt
+        y += vy * dt
+        self.angle[:n] += av * dt
+
+        # 壁との衝突判定
+        left = x - r <= self.left
+        right = ~left & (x + r >= self.right)
+        walls = left | right
+        x[left] = self.left + r[left]
+        x[right] = self.right - r[right]
+        vx[walls] *= -RESTITUTION
+        av[walls] = -vx[walls] / r[walls]
+
+        # 床との衝突判定
+        floor = y + r >= self.floor
+        y[floor] = self.floor - r[floor]
+        vy[floor] *= -RESTITUTION
+        vx[floor] *= FRICTION  # 摩擦
+        vy[floor & (np.abs(vy) < REST_VY)] = 0
+        stop = floor & (np.abs(vx) < REST_VX)
+        vx[stop] = 0
+        av[stop] = 0
+
+    # x 方向のスイープ・アンド・プルーンで接触しているペアを求める
+    def contact_pairs(self):
+        n = self.count
+        empty = np.zeros(0, dtype=np.intp)
+        if n < 2:
+            return empty, empty
+        x = self.x[:n]
+        y = self.y[:n]
+        r = self.radius[:n]
+
+        order = np.argsort(x - r, kind="stable")
+        lo = (x - r)[order]
+        hi = (x + r)[order]
+
+        firsts = []
+        seconds = []
+        cand = np.arange(n - 1)
+        k = 1
+        while cand.size:
+            cand = cand[cand + k < n]
+            other = cand + k
+            # lo は昇順なので、一度 x 方向で離れたら以降の k でも重ならない
+            hit = lo[other] <= hi[cand]
+            cand = cand[hit]
+            other = other[hit]
+            self.pairs_tested += cand.size
+            a = order[cand]
+            b = order[other]
+            dx = x[a] - x[b]
+            dy = y[a] - y[b]
+            rr = r[a] + r[b]
+            touch = dx * dx + dy * dy < rr * rr
+            firsts.append(a[touch])
+            seconds.append(b[touch])
+            k += 1
+
+        if not firsts:
+            return empty, empty
+        a = np.concatenate(firsts)
+        b = np.concatenate(seconds)
+        # 追加順（添字の小さい方が ball1）にそろえる
+        swap = a > b
+        a[swap], b[swap] = b[swap], a[swap]
+        key = np.lexsort((b, a))
+        return a[key], b[key]
+
+    # 接触ペアの重なりを押し出し、近づいているペアの速度を交換する（全ペアまとめて1回）
+    def resolve(self, a, b):
+        dx = self.x[a] - self.x[b]
+        dy = self.y[a] - self.y[b]
+        distance = np.sqrt(dx * dx + dy * dy)
+        ok = distance > 0
+        a, b = a[ok], b[ok]
+        dx, dy, distance = dx[ok], dy[ok], distance[ok]
+
+        nx = dx / distance
+        ny = dy / distance
+
+        # 全ペアを同時に解くので、接触の多いボールほど1ペアあたりの補正を小さくする
+        contacts = np.bincount(a, minlength=self.count) + np.bincount(
+            b, minlength=self.count
+        )
+        wa = 1.0 / contacts[a]
+        wb = 1.0 / contacts[b]
+
+        # 重なりを解決
+        half = (self.radius[a] + self.radius[b] - distance) * 0.5
+        np.add.at(self.x, a, nx * half * wa)
+        np.add.at(self.y, a, ny * half * wa)
+        np.subtract.at(self.x, b, nx * half * wb)
+        np.subtract.at(self.y, b, ny * half * wb)
+
+        # 近づいているペアだけ速度を交換する（質量は同じと仮定）
+        dvn = (self.vx[a] - self.vx[b]) * nx + (self.vy[a] - self.vy[b]) * ny
+        closing = dvn <= 0
+        impulse = dvn[closing]
+        a, b = a[closing], b[closing]
+        nx, ny = nx[closing], ny[closing]
+        wa, wb = wa[closing], wb[closing]
+        np.subtract.at(self.vx, a, impulse * nx * wa)
+        np.subtract.at(self.vy, a, impulse * ny * wa)
+        np.add.at(self.vx, b, impulse * nx * wb)
+        np.add.at(self.vy, b, impulse * ny * wb)
+
+    # 接触しているペアを解決して、マージするペアを (ball1, ball2) のリストで返す
+    def collide(self):
+        a, b = self.contact_pairs()
+        same = self.size_label[a] == self.size_label[b]
+        self.resolve(a[~same], b[~same])
+        views = self.views
+        return [(views[i], views[j]) for i, j in zip(a[same].tolist(), b[same].tolist())]
+
+    # 1ステップ進めて、マージするペアを返す
+    def step(self, dt):
+        self.integrate(dt)
+        return self.collide()
+
+    # 円 (x, y, radius) が既存のボールと重なっているか
+    def overlaps(self, x, y, radius):
+        n = self.count
+        dx = self.x[:n] - x
+        dy = self.y[:n] - y
+        rr = self.radius[:n] + radius
+        return bool(np.any(dx * dx + dy * dy < rr * rr))
@@ -0,0 +1,189 @@
+# たくさんのシードでゲームを回して、スコアなどの統計を取る
+#
+#   python batch.py --games 20000 --workers 8 --out results.jsonl --summary summary.json
+#   python batch.py --games 400 --scaling      # ワーカー数を 1, 2, 4, ... と変えて速度を比べる
+#
+# ゲームはシードごとに独立しているので、concurrent.futures のプロセスプールに
+# シードのまとまり（chunk）ずつ配る。終わったまとまりから順に1ゲーム1行の JSON を
+# 書き出すので、途中で止めてもそこまでの結果は残る。
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game import Game, GameConfig
+from headless import POLICIES, run_game
+from physics_backend import BACKENDS
+
+
+# ワーカーの中で、シードのまとまりを順に回す
+def run_chunk(seeds, policy_name, max_steps, drop_interval, config):
+    policy = POLICIES[policy_name]
+    results = []
+    for seed in seeds:
+        result = run_game(
+            seed,
+            policy=policy,
+            max_steps=max_steps,
+            drop_interval=drop_interval,
+            config=config,
+        )
+        results.append(result)
+    return results
+
+
+def chunked(seeds, size):
+    for i in range(0, len(seeds), size):
+        yield seeds[i : i + size]
+
+
+# 結果を1つずつ受け取って集計する
+class Summary:
+    def __init__(self):
+        self.scores = []
+        self.steps = []
+        self.merges = []
+        self.max_sizes = Counter()
+        self.game_overs = 0
+
+    def add(self, result):
+        self.scores.append(result["score"])
+        self.steps.append(result["steps"])
+        self.merges.append(result["merges"])
+        self.max_sizes[result["max_size"]] += 1
+        if result["game_over"]:
+            self.game_overs += 1
+
+    def to_dict(self):
+        n = len(self.scores)
+        if n == 0:
+            return {"games": 0}
+        scores = sorted(self.scores)
+        return {
+            "games": n,
+            "score": {
+                "mean": statistics.fmean(scores),
+                "median": statistics.median(scores),
+                "p95": scores[min(n - 1, int(n * 0.95))],
+                "max": scores[-1],
+                "stdev": statistics.pstdev(scores),
+            },
+            "steps_mean": statistics.fmean(self.steps),
+            "merges_mean": statistics.fmean(self.merges),
+            "game_over_rate": self.game_overs / n,
+            # 到達した一番大きいサイズ -> ゲーム数
+            "max_size": {str(size): count for size, count in sorted(self.max_sizes.items())},
+        }
+
+
+# seeds を workers 個のプロセスで回し、終わったゲームの結果を順に yield する
+def run_batch(seeds, workers, policy_name, max_steps, drop_interval, config, chunk_size):
+    args = (policy_name, max_steps, drop_interval, config)
+    if workers <= 1:
+        # プロセスを作らずにそのまま回す
+        for chunk in chunked(seeds, chunk_size):
+            yield from run_chunk(chunk, *args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, chunk, *args) for chunk in chunked(seeds, chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def measure_scaling(seeds, max_workers, policy_name, max_steps, drop_interval, config, chunk_size):
+    workers = 1
+    base = None
+    while True:
+        t0 = time.perf_counter()
+        for _ in run_batch(
+            seeds, workers, policy_name, max_steps, drop_interval, config, chunk_size
+        ):
+            pass
+        elapsed = time.perf_counter() - t0
+        if base is None:
+            base = elapsed
+        speedup = base / elapsed
+        print(
+            f"workers {workers:3d}: {elapsed:7.2f} s"
+            f" ({len(seeds) / elapsed * 60:8.0f} games/min)"
+            f" speedup {speedup:5.2f}x efficiency {speedup / workers:4.0%}"
+        )
+        if workers >= max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="たくさんのシードでゲームを回して統計を取る")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="最初のゲームのシード")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=0, help="1回に配るゲーム数（0 で自動）")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-steps", type=int, default=120 * 60 * 10)
+    parser.add_argument("--drop-interval", type=int, default=60)
+    parser.add_argument(
+        "--drop-y",
+        type=float,
+        default=GameConfig.drop_y,
+        help="落とす高さ（省略すると一番大きいボールでもゲームオーバーの線にかからない高さ）",
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default=GameConfig.backend)
+    parser.add_argument("--level", default=GameConfig.level, help="アリーナのレベルファイル")
+    parser.add_argument("--out", help="1ゲームごとの結果を書く JSON Lines ファイル")
+    parser.add_argument("--summary", help="集計を書く JSON ファイル")
+    parser.add_argument("--scaling", action="store_true", help="ワーカー数を変えて速度を比べる")
+    args = parser.parse_args(argv)
+
+    config = GameConfig(backend=args.backend, drop_y=args.drop_y, level=args.level)
+    seeds = list(range(args.seed, args.seed + args.games))
+    # ワーカーごとに数回ずつ配れば、ゲームの長さがばらついても偏りにくい
+    chunk_size = args.chunk_size or max(1, min(50, len(seeds) // (args.workers * 4)))
+    run_args = (args.policy, args.max_steps, args.drop_interval, config, chunk_size)
+
+    if args.scaling:
+        measure_scaling(seeds, args.workers, *run_args)
+        return 0
+
+    summary = Summary()
+    out = open(args.out, "w") if args.out else None
+    t0 = time.perf_counter()
+    try:
+        for result in run_batch(seeds, args.workers, *run_args):
+            summary.add(result)
+            if out is not None:
+                out.write(json.dumps(result) + "\n")
+            done = len(summary.scores)
+            if done % 100 == 0 or done == len(seeds):
+                elapsed = time.perf_counter() - t0
+                print(f"\r{done}/{len(seeds)} games, {elapsed:.1f} s", end="", file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    print(file=sys.stderr)
+
+    report = summary.to_dict()
+    report["meta"] = {
+        "policy": args.policy,
+        "workers": args.workers,
+        "seed": args.seed,
+        "max_steps": args.max_steps,
+        "drop_interval": args.drop_interval,
+        "drop_y": Game(config=config).drop_y,
+        "backend": args.backend,
+        "seconds": elapsed,
+    }
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
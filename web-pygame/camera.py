@@ -0,0 +1,41 @@
+# ワールドの座標と画面の座標の変換
+#
+#   camera = Camera.fit(arena, screen.get_size())
+#   sx, sy = camera.to_screen(ball.x, ball.y)
+#   x, y = camera.to_world(*event.pos)
+#
+# アリーナ（ワールド）の大きさはウィンドウと関係なく決められるので、ワールド全体が
+# 画面に収まる倍率で縮小（か拡大）し、余った方向は真ん中に寄せる。
+# 元の箱（900x600）を同じ大きさのウィンドウに描くときは倍率 1・ずれ 0 になり（identity）、
+# Renderer はこれまで通りワールドの座標のまま描く。
+
+
+class Camera:
+    def __init__(self, scale=1.0, offset_x=0.0, offset_y=0.0):
+        self.scale = scale
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.identity = scale == 1 and offset_x == 0 and offset_y == 0
+
+    @classmethod
+    def fit(cls, arena, screen_size):
+        width, height = screen_size
+        scale = min(width / arena.width, height / arena.height)
+        return cls(
+            scale,
+            (width - arena.width * scale) / 2,
+            (height - arena.height * scale) / 2,
+        )
+
+    def to_screen(self, x, y):
+        return x * self.scale + self.offset_x, y * self.scale + self.offset_y
+
+    def to_world(self, x, y):
+        return (x - self.offset_x) / self.scale, (y - self.offset_y) / self.scale
+
+    # ワールドでの長さ（半径や太さ）を画面のピクセルにする（1px より細くしない）
+    def length(self, value):
+        return max(1, round(value * self.scale))
+
+    def __repr__(self):
+        return f"Camera(scale={self.scale:.3f}, offset=({self.offset_x:.1f}, {self.offset_y:.1f}))"
@@ -0,0 +1,88 @@
+# 速いボールの連続衝突判定（CCD）
+#
+# 衝突判定は Ball.update で動かしたあとの位置でしか行わないので、1ステップで半径より
+# 大きく動くボールは、ほかのボールに深くめり込んだり、すり抜けたりする。
+# そこで、1ステップの移動量が半径 × FAST_RATIO を超えるボールだけ、ステップの始めの位置から
+# 動かした先までの線分を円でなぞり（スウェプト円）、ほかのボール・壁・床に最初に触れる時刻
+# （0〜1 の割合）を求める。壁や床より先にボールかアリーナの当たり判定（線分・ピン）に触れるなら、
+# ボールをその時刻の位置まで戻す。
+# 壁と床は Ball.update が押し戻して跳ね返すので、ここでは「どちらが先か」を比べるのに使うだけ。
+# ほかのボールはステップの終わりの位置で止まっているものとして扱う。
+import math
+
+from arena import Segment
+from contact_solver import PLANES
+
+# 1ステップの移動量が半径のこの割合を超えたら調べる
+FAST_RATIO = 0.5
+
+
+# (x0, y0) から (dx, dy) だけ動く点が、(cx, cy) を中心とする半径 reach の円に入る最初の時刻。
+# 触れないとき、最初から中にいるとき、離れていくときは None
+def sweep_circle(x0, y0, dx, dy, cx, cy, reach):
+    fx = x0 - cx
+    fy = y0 - cy
+    c = fx * fx + fy * fy - reach * reach
+    if c <= 0:
+        return None
+    b = fx * dx + fy * dy
+    if b >= 0:
+        return None
+    a = dx * dx + dy * dy
+    disc = b * b - a * c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / a
+    return t if t < 1.0 else None
+
+
+# 半径 radius の円が (x0, y0) から (dx, dy) だけ動くとき、壁か床に最初に触れる時刻（触れなければ 1.0）
+def sweep_planes(x0, y0, dx, dy, radius, planes=PLANES):
+    first = 1.0
+    for nx, ny, offset in planes:
+        gap = x0 * nx + y0 * ny - offset - radius
+        closing = dx * nx + dy * ny
+        if closing >= 0 or gap + closing >= 0:
+            continue
+        t = gap / -closing if gap > 0 else 0.0
+        if t < first:
+            first = t
+    return first
+
+
+# (x0, y0) から (dx, dy) だけ動く点が、線分から reach 以内（両端が丸いカプセル）に入る最初の時刻
+def sweep_segment(x0, y0, dx, dy, segment, reach):
+    first = None
+    length_sq = segment.dx * segment.dx + segment.dy * segment.dy
+    if length_sq:
+        # 線分の両側の平らな面
+        length = math.sqrt(length_sq)
+        nx = -segment.dy / length
+        ny = segment.dx / length
+        side = (x0 - segment.x1) * nx + (y0 - segment.y1) * ny
+        closing = dx * nx + dy * ny
+        t = None
+        if side > reach and closing < 0:
+            t = (side - reach) / -closing
+        elif side < -reach and closing > 0:
+            t = (-reach - side) / closing
+        if t is not None and t < 1.0:
+            along = (
+                (x0 + dx * t - segment.x1) * segment.dx + (y0 + dy * t - segment.y1) * segment.dy
+            ) * segment.inv_length_sq
+            if 0 <= along <= 1:
+                first = t
+    # 両端の丸み
+    for cx, cy in ((segment.x1, segment.y1), (segment.x2, segment.y2)):
+        t = sweep_circle(x0, y0, dx, dy, cx, cy, reach)
+        if t is not None and (first is None or t < first):
+            first = t
+    return first
+
+
+# 半径 radius の円がアリーナの当たり判定（Segment か Peg）に最初に触れる時刻。触れなければ None
+def sweep_static(x0, y0, dx, dy, radius, collider):
+    reach = radius + collider.radius
+    if isinstance(collider, Segment):
+        return sweep_segment(x0, y0, dx, dy, collider, reach)
+    return sweep_circle(x0, y0, dx, dy, collider.x, collider.y, reach)
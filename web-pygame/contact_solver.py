@@ -0,0 +1,247 @@
+# 逐次インパルス法によるボール同士の接触の解決
+#
+# 1ステップで見つかった接触をまとめて受け取り、速度の反復（法線方向の力積を
+# 0 以上に保ったまま積み上げる）と位置の反復（残った重なりを押し戻す）を行う。
+# 前のステップの力積を (id, id) ごとに覚えておき、最初に与えておく（ウォームスタート）ので、
+# 積み重なったボールは数回の反復で落ち着く。どちらの反復も変化が tolerance を
+# 下回ったところで打ち切る。
+#
+# 質量は半径に比例させ（面積にすると大きなボールが小さなボールを弾き飛ばしすぎる）、眠っているボールは質量が無限大（動かない）として扱う。
+# 壁と床も動かない平面として接触に加えるので、下のボールが床にめり込まない。
+# アリーナに線分やピン（arena.py）があれば、触れている点の接平面を同じように加える。
+import math
+
+from physics import FLOOR_Y, GRAVITY, RESTITUTION, WALL_LEFT, WALL_RIGHT
+
+# これより遅くぶつかったときは跳ね返らせない（積み重なったボールが揺れないように）
+BOUNCE_SPEED = 60
+# 位置の補正で残してよい重なり（px）
+SLOP = 0.5
+# これより近いペアは、まだ重なっていなくても接触として扱う（px）
+CONTACT_MARGIN = 1.0
+# 1回の位置の反復で直す重なりの割合
+BAUMGARTE = 0.8
+
+
+# 壁と床（内向きの法線 (nx, ny) と、n・p がこの値以上なら外に出ていないという値）
+PLANES = (
+    (0.0, -1.0, -FLOOR_Y),
+    (1.0, 0.0, WALL_LEFT),
+    (-1.0, 0.0, -WALL_RIGHT),
+)
+
+
+# 平面の相手として使う、動かないボールの代わり
+class _Fixed:
+    vx = 0.0
+    vy = 0.0
+
+
+FIXED = _Fixed()
+
+
+# サイズ1（半径10）のボールの質量を1とした質量の逆数
+def inverse_mass(ball):
+    if ball.sleeping:
+        return 0.0
+    return 10.0 / ball.radius
+
+
+class ContactSolver:
+    def __init__(
+        self,
+        velocity_iterations=8,
+        position_iterations=3,
+        tolerance=1.0,
+        warm_start=True,
+        arena=None,
+    ):
+        # (nx, ny, offset, 力積の番号)。arena を省略すると元の箱の壁と床
+        planes = PLANES if arena is None else arena.planes
+        self.planes = tuple((nx, ny, offset, -1 - p) for p, (nx, ny, offset) in enumerate(planes))
+        # アリーナの線分とピン（なければ None）
+        self.bvh = None if arena is None else arena.bvh
+        self.found = []
+        self.velocity_iterations = velocity_iterations
+        self.position_iterations = position_iterations
+        # 速度の反復は1回の変化（px/s）、位置の反復は残りの重なり（px）がこれ以下なら打ち切る
+        self.tolerance = tolerance
+        self.warm_start = warm_start
+        # (小さい id, 大きい id) -> 前のステップで積み上げた力積
+        self.impulses = {}
+        # 直前の solve で実際に回した反復の回数
+        self.velocity_iterations_used = 0
+        self.position_iterations_used = 0
+
+    def clear(self):
+        self.impulses = {}
+
+    # 壁と床に、ball の近くの線分とピンの接平面を足したもの
+    def surfaces(self, ball):
+        x = ball.x
+        y = ball.y
+        reach = ball.radius + CONTACT_MARGIN
+        surfaces = list(self.planes)
+        for collider in self.bvh.query(x - reach, y - reach, x + reach, y + reach, self.found):
+            px, py = collider.closest(x, y)
+            dx = x - px
+            dy = y - py
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance == 0:
+                continue
+            nx = dx / distance
+            ny = dy / distance
+            surfaces.append((nx, ny, nx * px + ny * py + collider.radius, collider.key))
+        return surfaces
+
+    # pairs は重なっているか、CONTACT_MARGIN より近い (ball1, ball2) のリスト
+    def solve(self, pairs, dt):
+        cached = self.impulses if self.warm_start else {}
+        inv_dt = 1.0 / dt
+        contacts = []
+        touching = {}
+        for ball1, ball2 in pairs:
+            dx = ball1.x - ball2.x
+            dy = ball1.y - ball2.y
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance == 0:
+                continue
+            inv1 = inverse_mass(ball1)
+            inv2 = inverse_mass(ball2)
+            if inv1 + inv2 == 0:
+                continue
+            # 法線は ball2 から ball1 の向き
+            nx = dx / distance
+            ny = dy / distance
+
+            if ball1.id < ball2.id:
+                key = (ball1.id, ball2.id)
+            else:
+                key = (ball2.id, ball1.id)
+            impulse = cached.get(key, 0.0)
+
+            # まだ離れているペアは、すき間が1ステップで埋まる速さまでは近づいてよい
+            gap = distance - ball1.radius - ball2.radius
+            target = -gap * inv_dt if gap > 0 else 0.0
+            # 前のステップで押し合っていなかったペアが速くぶつかったときだけ跳ね返らせる
+            # （押し合い続けているペアまで跳ね返らせると、積み重なったボールが揺れ続ける）
+            bounced = False
+            if impulse == 0.0 and gap <= 0:
+                vn = (ball1.vx - ball2.vx) * nx + (ball1.vy - ball2.vy) * ny
+                if vn < -BOUNCE_SPEED:
+                    target = -RESTITUTION * vn
+                    bounced = True
+
+            if impulse:
+                ball1.vx += nx * impulse * inv1
+                ball1.vy += ny * impulse * inv1
+                ball2.vx -= nx * impulse * inv2
+                ball2.vy -= ny * impulse * inv2
+            contacts.append(
+                [ball1, ball2, nx, ny, inv1, inv2, 1.0 / (inv1 + inv2), target, impulse, key, bounced]
+            )
+            if inv1:
+                touching[ball1.id] = ball1
+            if inv2:
+                touching[ball2.id] = ball2
+        pair_count = len(contacts)
+
+        # ほかのボールに触れているボールだけ、壁と床との接触も加える
+        # （跳ね返りと摩擦は Ball.update が済ませているので、ここでは押し込まれないようにするだけ）
+        planes = []
+        for ball in touching.values():
+            inv = inverse_mass(ball)
+            surfaces = self.planes if self.bvh is None else self.surfaces(ball)
+            for nx, ny, offset, number in surfaces:
+                gap = ball.x * nx + ball.y * ny - offset - ball.radius
+                if gap > CONTACT_MARGIN:
+                    continue
+                key = (ball.id, number)
+                impulse = cached.get(key, 0.0)
+                if impulse:
+                    ball.vx += nx * impulse * inv
+                    ball.vy += ny * impulse * inv
+                target = -gap * inv_dt if gap > 0 else 0.0
+                # 次のステップで重力が加える分も先に打ち消しておく
+                # （そうしないと床の上の列が毎ステップ沈んで、位置の補正が上まで伝わらない）
+                target -= GRAVITY * ny * dt
+                contacts.append(
+                    [ball, FIXED, nx, ny, inv, 0.0, 1.0 / inv, target, impulse, key, False]
+                )
+                planes.append((ball, nx, ny, offset))
+
+        tolerance = self.tolerance
+        used = 0
+        for _ in range(self.velocity_iterations):
+            used += 1
+            largest = 0.0
+            for contact in contacts:
+                ball1, ball2, nx, ny, inv1, inv2, mass, target, impulse, _, _ = contact
+                vn = (ball1.vx - ball2.vx) * nx + (ball1.vy - ball2.vy) * ny
+                # 力積の合計は 0 以上（引っ張らない）
+                total = impulse + mass * (target - vn)
+                if total < 0:
+                    total = 0.0
+                delta = total - impulse
+                if delta == 0:
+                    continue
+                contact[8] = total
+                ball1.vx += nx * delta * inv1
+                ball1.vy += ny * delta * inv1
+                ball2.vx -= nx * delta * inv2
+                ball2.vy -= ny * delta * inv2
+                change = abs(delta) * (inv1 + inv2)
+                if change > largest:
+                    largest = change
+            if largest < tolerance:
+                break
+        self.velocity_iterations_used = used
+
+        # 次のステップのために、今回接触していたペアの力積だけを残す
+        # （跳ね返した接触の力積は持ち越さない。持ち越すと次のステップでも跳ね返してしまう）
+        self.impulses = {
+            contact[9]: 0.0 if contact[10] else contact[8] for contact in contacts
+        }
+
+        # 位置の反復で使う (ball1, ball2, 半径の和, ball1 が動く割合, ball2 が動く割合)
+        overlaps = []
+        for k in range(pair_count):
+            ball1, ball2, _, _, inv1, inv2 = contacts[k][:6]
+            share = 1.0 / (inv1 + inv2)
+            overlaps.append(
+                (ball1, ball2, ball1.radius + ball2.radius, inv1 * share, inv2 * share)
+            )
+
+        used = 0
+        for _ in range(self.position_iterations):
+            used += 1
+            deepest = 0.0
+            for ball1, ball2, reach, share1, share2 in overlaps:
+                dx = ball1.x - ball2.x
+                dy = ball1.y - ball2.y
+                distance_sq = dx * dx + dy * dy
+                if distance_sq >= reach * reach:
+                    continue
+                distance = math.sqrt(distance_sq)
+                if distance == 0:
+                    continue
+                overlap = reach - distance
+                if overlap > deepest:
+                    deepest = overlap
+                if overlap <= SLOP:
+                    continue
+                # 質量の逆数の比で押し戻す（軽いボールほど大きく動く）
+                push = BAUMGARTE * (overlap - SLOP) / distance
+                ball1.x += dx * push * share1
+                ball1.y += dy * push * share1
+                ball2.x -= dx * push * share2
+                ball2.y -= dy * push * share2
+            # 壁と床（と線分・ピン）からはみ出した分はそのまま戻す
+            for ball, nx, ny, offset in planes:
+                overlap = ball.radius - (ball.x * nx + ball.y * ny - offset)
+                if overlap > 0:
+                    ball.x += nx * overlap
+                    ball.y += ny * overlap
+            if deepest < SLOP + tolerance:
+                break
+        self.position_iterations_used = used
@@ -0,0 +1,78 @@
+# 変化した部分だけを描き直す描画モード（ダーティ矩形）
+#
+# 前のフレームで描いたボールの位置とスプライトを覚えておき、動いたボールの
+# 古い矩形と新しい矩形だけを静的レイヤー（背景・壁・床）で消して描き直し、壁のレイヤーを重ねる。
+# 戻り値の矩形のリストを pygame.display.update に渡せば、画面全体の flip を避けられる。
+import pygame
+
+
+class DirtyRectRenderer:
+    def __init__(self, static_layer, atlas, header_rect, wall_layer=None):
+        self.static_layer = static_layer
+        # ボールの上に重ねる壁（壁のないところは透明）
+        self.wall_layer = wall_layer
+        self.atlas = atlas
+        self.header_rect = header_rect
+        # ball.id -> (sprite, rect)
+        self.drawn = {}
+
+    # 画面全体を描いた直後に、描いたボールの位置だけを覚える
+    def remember(self, balls, alpha):
+        placement = self.atlas.placement
+        drawn = {}
+        for ball in balls:
+            sprite, pos = placement(ball, alpha)
+            drawn[ball.id] = (sprite, pygame.Rect(pos, sprite.get_size()))
+        self.drawn = drawn
+
+    # ボールとヘッダーを描き直して、更新した矩形のリストを返す
+    def draw(self, screen, balls, alpha, header_changed, draw_header):
+        placement = self.atlas.placement
+        drawn = self.drawn
+        placed = {}
+        dirty = []
+        for ball in balls:
+            sprite, pos = placement(ball, alpha)
+            rect = pygame.Rect(pos, sprite.get_size())
+            key = ball.id
+            prev = drawn.pop(key, None)
+            if prev is None:
+                dirty.append(rect)
+            elif prev[0] is not sprite or prev[1] != rect:
+                dirty.append(prev[1])
+                dirty.append(rect)
+            placed[key] = (sprite, rect)
+
+        # 消えたボールの跡
+        for _, rect in drawn.values():
+            dirty.append(rect)
+        self.drawn = placed
+
+        header_dirty = header_changed or self.header_rect.collidelist(dirty) != -1
+        if header_dirty:
+            dirty.append(self.header_rect)
+        if not dirty:
+            return dirty
+
+        static_layer = self.static_layer
+        for rect in dirty:
+            screen.blit(static_layer, rect, rect)
+
+        # 消した範囲にかかるボールを描き直す
+        redrawn = []
+        for sprite, rect in placed.values():
+            if rect.collidelist(dirty) != -1:
+                screen.blit(sprite, rect)
+                redrawn.append(rect)
+
+        # 壁はボールの上に重ねる（描き直したボールは消した範囲の外にもはみ出すので、その分も）
+        wall_layer = self.wall_layer
+        if wall_layer is not None:
+            for rect in dirty:
+                screen.blit(wall_layer, rect, rect)
+            for rect in redrawn:
+                screen.blit(wall_layer, rect, rect)
+
+        if header_dirty:
+            draw_header()
+        return dirty
@@ -0,0 +1,211 @@
+# 画面を使わないゲーム本体
+#
+# ボールの追加・物理演算・マージ・スコア・ゲームオーバー判定だけを持ち、
+# pygame のディスプレイやフォントには触らない。描画は renderer.py が受け持つ。
+#
+#   game = Game(seed=1)
+#   game.drop(400)          # 次のボールを x=400 に落とす
+#   game.drop(300, 3)       # サイズ3のボールを落とす
+#   game.step(120)          # 120ステップ（1秒）進める
+import random
+from dataclasses import dataclass
+
+from arena import arena_for
+from merge_resolver import pick_merges
+from physics_backend import create_backend
+from profiler import COLLIDE, MERGE, UPDATE
+
+# 制限時間（秒）。表示は time_limit - 経過秒数だが、1000秒でゲームオーバーになる
+TIME_LIMIT = 10000000
+GAME_OVER_SECONDS = 1000
+
+# 次のボールのサイズはこの中から選ぶ（rng.choice に毎回 range を作って渡さない）
+NEXT_BALL_TYPES = range(1, 6)
+# 落とす高さを決めていないときは、一番大きい次のボールでも上端がゲームオーバーの線からこれだけ下になる高さにする
+DROP_CLEARANCE = 3
+
+
+# アリーナで y を省略して落とすときの高さ（元の箱では 150）
+def default_drop_y(arena):
+    return arena.game_over_line + max(NEXT_BALL_TYPES) * 10 + DROP_CLEARANCE
+
+
+@dataclass
+class GameConfig:
+    step: float = 1 / 120  # 物理演算の固定ステップ（秒）
+    substeps: int = 1
+    max_steps_per_frame: int = 8
+    cell_size: int = 40  # ブロードフェーズのセルの大きさ
+    backend: str = "python"  # 物理演算のバックエンド（"python"、"numpy"、"pymunk"）
+    drop_y: float = None  # y を省略して drop したときの高さ。None なら default_drop_y
+    allow_sleep: bool = True  # 止まったボールを眠らせる（"numpy" では使わない）
+    level: str = ""  # アリーナのレベルファイル（levels/*.json）。空なら元の箱
+    # 速いボールがほかのボールをすり抜けないように連続衝突判定をする（"python" だけ）
+    continuous_collision: bool = True
+    # 接触の解決（"numpy" は自前のヤコビ法で解くので使わない。"pymunk" は反復回数だけ使う）
+    velocity_iterations: int = 8
+    position_iterations: int = 3
+    solver_tolerance: float = 1.0
+    warm_start: bool = True
+
+
+class Game:
+    def __init__(self, seed=None, config=None):
+        self.config = config or GameConfig()
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # 壁・床・ゲームオーバーの線と、中に置く線分やピン
+        self.arena = arena_for(self.config.level)
+        self.drop_y = self.config.drop_y
+        if self.drop_y is None:
+            self.drop_y = default_drop_y(self.arena)
+        # ボールの動きと衝突はバックエンドに任せる
+        self.backend = create_backend(self.config, self.arena)
+        # FrameProfiler を入れるとフェーズごとの時間を記録する
+        self.profiler = None
+        self.reset()
+
+    # seed を渡すと乱数も作り直す（リプレイを取るときは新しいゲームごとにシードを決める）
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+            self.rng = random.Random(seed)
+        self.game_over = False
+        self.score = 0
+        self.next_ball_type = 1
+        self.steps = 0
+        self.merges = 0
+        self.max_size = 0
+        self.backend.clear()
+        self.balls = self.backend.balls
+
+    # ゲーム内の経過時間（秒）
+    @property
+    def elapsed(self):
+        return self.steps * self.config.step
+
+    # 衝突判定で調べたペアの数（pymunk では数えない）
+    @property
+    def pairs_tested(self):
+        return self.backend.pairs_tested
+
+    def create_ball(self, x, y, update_next, radius=None):
+        if radius is None:
+            radius = self.next_ball_type * 10
+        size_label = radius // 10
+        ball = self.backend.add_ball(x, y, radius, size_label)
+        if size_label > self.max_size:
+            self.max_size = size_label
+
+        if update_next:
+            self.next_ball_type = self.rng.choice(NEXT_BALL_TYPES)
+        return ball
+
+    def remove_ball(self, ball):
+        self.backend.remove_ball(ball)
+
+    def merge_balls(self, ball1, ball2):
+        self.merge([(ball1, ball2)])
+
+    # 既存のボールとの重複をチェックする
+    def is_overlapping_with_existing_balls(self, x, y, radius):
+        return self.backend.overlaps(x, y, radius)
+
+    # ボールを落とす。size_label を省略すると next_ball_type のボールを落として次を選び直す
+    def drop(self, x, size_label=None, y=None):
+        if self.game_over:
+            return None
+        if y is None:
+            y = self.drop_y
+        update_next = size_label is None
+        radius = (self.next_ball_type if update_next else size_label) * 10
+        if self.is_overlapping_with_existing_balls(x, y, radius):
+            return None
+        return self.create_ball(x, y, update_next, radius)
+
+    # 物理演算を n ステップ進めて、実際に進めたステップ数を返す
+    def step(self, n=1):
+        done = 0
+        while done < n and not self.game_over:
+            self.step_physics(self.config.step)
+            self.steps += 1
+            done += 1
+            if self.elapsed >= GAME_OVER_SECONDS:
+                self.game_over = True
+        return done
+
+    def save_previous(self):
+        self.backend.save_previous()
+
+    def integrate(self, dt):
+        self.backend.integrate(dt)
+
+    # ボール同士の衝突を解決して、マージする同じサイズのペアを返す
+    def collide(self, dt=None):
+        if dt is None:
+            dt = self.config.step / self.config.substeps
+        return self.backend.collide(dt)
+
+    # マージするペアをまとめて処理する。1つのボールが複数のペアに入っているときは
+    # pick_merges が重なりの深い方を選ぶ
+    def merge(self, balls_to_merge):
+        if not balls_to_merge:
+            return
+        # 先に全部のペアの結果を決めてから、削除と追加をまとめて行う
+        spawned = []
+        removed = []
+        for ball1, ball2 in pick_merges(balls_to_merge):
+            size_label = ball1.size_label
+            if size_label != ball2.size_label:
+                continue
+            # 一番大きいサイズのボールのサイズラベルは10（10同士は消えるだけ）
+            if size_label < 10:
+                mid_x = (ball1.x + ball2.x) / 2
+                mid_y = (ball1.y + ball2.y) / 2
+                spawned.append((mid_x, mid_y, ball1.radius + 10))
+            self.score += size_label
+            self.merges += 1
+            removed.append(ball1)
+            removed.append(ball2)
+
+        for ball in removed:
+            self.remove_ball(ball)
+        spawned = [self.create_ball(x, y, False, radius) for x, y, radius in spawned]
+        self.backend.merged(removed, spawned)
+
+    def update_sleep(self):
+        self.backend.update_sleep()
+
+    def check_game_over(self):
+        line = self.arena.game_over_line
+        for ball in self.balls:
+            # 眠っているボールは眠ったときに判定済み
+            if ball.sleeping:
+                continue
+            if ball.y - ball.radius < line:  # 上部の境界線
+                self.game_over = True
+                return True
+        return False
+
+    # 物理演算を固定の時間 dt だけ進める
+    def step_physics(self, dt):
+        self.save_previous()
+
+        substeps = self.config.substeps
+        sub_dt = dt / substeps
+        profiler = self.profiler
+        if profiler is not None and profiler.enabled:
+            for _ in range(substeps):
+                self.integrate(sub_dt)
+                profiler.mark(UPDATE)
+                balls_to_merge = self.collide(sub_dt)
+                profiler.mark(COLLIDE)
+                self.merge(balls_to_merge)
+                profiler.mark(MERGE)
+        else:
+            for _ in range(substeps):
+                self.integrate(sub_dt)
+                self.merge(self.collide(sub_dt))
+
+        self.update_sleep()
+        self.check_game_over()
@@ -0,0 +1,156 @@
+# 画面なしでゲームを高速に回すランナー
+#
+#   python headless.py --games 100 --seed 0
+#   python headless.py --games 10 --render   # SDL のダミードライバで描画も行う
+#   python headless.py --games 10 --record replays   # 1ゲームずつリプレイを保存する
+#   python headless.py --games 5 --policy hint        # ヒントエンジンのボットに遊ばせる
+#   python headless.py --games 5 --level levels/pegboard.json --drop-y 300   # 別のアリーナで回す
+#
+# clock.tick を使わず、CPU が許す限りの速さでステップを進める。
+# バランス調整や回帰テストのために大量のゲームを回すのに使う。
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from game import Game, GameConfig
+from physics_backend import BACKENDS
+from replay import ReplayRecorder
+
+
+# コンテナの中のランダムな x にボールを落とす
+def random_policy(game, rng):
+    radius = game.next_ball_type * 10
+    return rng.uniform(game.arena.left + radius, game.arena.right - radius)
+
+
+# 乱数を使わない決まった手順（ステップ数 × 黄金比の小数部分で、コンテナの幅をまんべんなく使う）
+def sweep_policy(game, rng):
+    radius = game.next_ball_type * 10
+    t = game.steps * 0.6180339887 % 1.0
+    left = game.arena.left
+    return left + radius + (game.arena.right - left - radius * 2) * t
+
+
+# ヒントエンジンが一番良いとした x に落とす（ソークテスト用のボット。このプロセスの中で調べる）
+_hint_evaluator = None
+
+
+def hint_policy(game, rng):
+    global _hint_evaluator
+    if _hint_evaluator is None:
+        from hint import HintEvaluator
+
+        _hint_evaluator = HintEvaluator(workers=0, steps=60)
+    x = _hint_evaluator.best(game, count=16)
+    return x if x is not None else random_policy(game, rng)
+
+
+POLICIES = {"random": random_policy, "sweep": sweep_policy, "hint": hint_policy}
+
+
+def run_game(
+    seed,
+    policy=random_policy,
+    max_steps=120 * 60 * 10,
+    drop_interval=60,
+    config=None,
+    renderer=None,
+    record=False,
+):
+    game = Game(seed, config)
+    rng = random.Random(seed)
+    # record のときは、落としたボールを記録して結果に "replay" を付ける
+    recorder = ReplayRecorder(game) if record else None
+    drop = recorder.drop if recorder is not None else game.drop
+    drops = 0
+    while not game.game_over and game.steps < max_steps:
+        if drop(policy(game, rng)) is not None:
+            drops += 1
+        game.step(drop_interval)
+        if renderer is not None:
+            renderer.draw(game)
+    result = {
+        "seed": seed,
+        "score": game.score,
+        "steps": game.steps,
+        "drops": drops,
+        "merges": game.merges,
+        "max_size": game.max_size,
+        "balls": len(game.balls),
+        "game_over": game.game_over,
+    }
+    if recorder is not None:
+        result["replay"] = recorder.finish()
+    return result
+
+
+def create_headless_renderer(arena):
+    # 描画するときだけ pygame を読み込む
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+
+    from physics import HEIGHT, WIDTH
+    from renderer import Renderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    return Renderer(screen, arena=arena)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="画面なしでゲームを回す")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="最初のゲームのシード")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-steps", type=int, default=120 * 60 * 10)
+    parser.add_argument("--drop-interval", type=int, default=60)
+    parser.add_argument(
+        "--drop-y",
+        type=float,
+        default=GameConfig.drop_y,
+        help="落とす高さ（省略すると一番大きいボールでもゲームオーバーの線にかからない高さ）",
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default=GameConfig.backend)
+    parser.add_argument("--level", default=GameConfig.level, help="アリーナのレベルファイル")
+    parser.add_argument("--render", action="store_true", help="ダミードライバで描画する")
+    parser.add_argument("--json", action="store_true", help="1ゲームごとの結果を JSON で出す")
+    parser.add_argument("--record", metavar="DIR", help="リプレイを DIR に保存する")
+    args = parser.parse_args(argv)
+
+    config = GameConfig(backend=args.backend, drop_y=args.drop_y, level=args.level)
+    renderer = create_headless_renderer(Game(config=config).arena) if args.render else None
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+
+    t0 = time.perf_counter()
+    total_steps = 0
+    for seed in range(args.seed, args.seed + args.games):
+        result = run_game(
+            seed,
+            policy=POLICIES[args.policy],
+            max_steps=args.max_steps,
+            drop_interval=args.drop_interval,
+            config=config,
+            renderer=renderer,
+            record=bool(args.record),
+        )
+        total_steps += result["steps"]
+        if args.record:
+            result.pop("replay").save(os.path.join(args.record, f"seed-{seed}.jgr"))
+        if args.json:
+            print(json.dumps(result))
+    elapsed = time.perf_counter() - t0
+
+    print(
+        f"{args.games} games, {total_steps} steps in {elapsed:.2f} s"
+        f" ({args.games / elapsed * 60:.0f} games/min,"
+        f" {total_steps / elapsed:.0f} steps/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
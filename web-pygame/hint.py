@@ -0,0 +1,230 @@
+# 次のボールをどこに落とすとよいかを調べるヒントエンジン（自動プレイのボットにも使う）
+#
+#   evaluator = HintEvaluator(workers=4, steps=120, budget_ms=50)
+#   ranking = evaluator.rank(game, count=32)   # 良い順の Candidate のリスト
+#   evaluator.close()
+#
+# 今のゲームをスナップショット（snapshot.py）で複製し、コンテナの幅に等間隔に並べた
+# count 個の x それぞれに next_ball_type のボールを落として steps ステップ（全部のボールが眠ればそこまで）
+# 進め、結果を採点する。
+# 落とし方とマージは Game.drop と Game.merge のまま（候補ごとに別の複製で進めるので互いに影響しない）。
+#
+# 採点は「増えたスコア × score_weight + マージの数 × merge_weight + 一番上のボールから
+# ゲームオーバーの線までの余裕（px）× clearance_weight」で、ゲームオーバーになった候補は一番下にする。
+#
+# workers が 2 以上ならワーカープロセスに候補を分けて並列に調べる（プロセスは使い回す）。
+# ワーカーは HintEvaluator を作ったときに起動し始め、起動を待った時間は budget_ms に数えない。
+# 0 か 1 ならこのプロセスの中で調べる（ブラウザ版はこちら）。
+# budget_ms を渡すと、その時間を過ぎたら残りの候補は調べずに、調べ終わった分だけで順位を付ける。
+# 候補は端から順ではなく、幅全体を粗く見てから間を埋める順に調べるので、途中で打ち切っても偏らない。
+# 今のところスナップショットと同じく "python" バックエンドだけに対応している。
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import snapshot
+from game import Game
+
+SCORE_WEIGHT = 10.0
+MERGE_WEIGHT = 5.0
+CLEARANCE_WEIGHT = 0.1
+# 山が落ち着いたかをこのステップ数ごとに確かめる
+SETTLE_CHECK = 10
+# ゲームオーバーになった候補の点
+GAME_OVER_VALUE = -1e9
+
+
+class Candidate:
+    def __init__(self, x, value, score_gain, merges, clearance, game_over, dropped):
+        self.x = x
+        self.value = value
+        self.score_gain = score_gain
+        self.merges = merges
+        self.clearance = clearance
+        self.game_over = game_over
+        # 他のボールと重なって落とせなかったときは False
+        self.dropped = dropped
+
+    def __repr__(self):
+        return (
+            f"Candidate(x={self.x:.1f}, value={self.value:.1f}, score_gain={self.score_gain},"
+            f" merges={self.merges}, clearance={self.clearance:.1f}, game_over={self.game_over})"
+        )
+
+
+# アリーナの幅に等間隔に並べた count 個の x（ボールが壁にめり込まない範囲）
+def candidate_positions(arena, radius, count):
+    left = arena.left + radius
+    right = arena.right - radius
+    if count <= 1:
+        return [(left + right) / 2]
+    return [left + (right - left) * i / (count - 1) for i in range(count)]
+
+
+# 両端と真ん中から始めて、間を半分ずつ埋めていく順番（0 .. count-1 の並べ替え）
+def coarse_to_fine(count):
+    order = [0, count - 1] if count > 1 else [0]
+    seen = set(order)
+    step = 1
+    while step < count:
+        step *= 2
+    while step >= 1:
+        for i in range(0, count, step):
+            if i not in seen:
+                seen.add(i)
+                order.append(i)
+        step //= 2
+    return order
+
+
+def evaluate_value(score_gain, merges, clearance, game_over, weights):
+    if game_over:
+        return GAME_OVER_VALUE
+    score_weight, merge_weight, clearance_weight = weights
+    return score_gain * score_weight + merges * merge_weight + clearance * clearance_weight
+
+
+# 一番上のボールの上端からゲームオーバーの線までの距離
+def clearance(game):
+    top = min((ball.y - ball.radius for ball in game.balls), default=None)
+    if top is None:
+        return 0.0
+    return top - game.arena.game_over_line
+
+
+# data を復元した game に x で落として steps ステップ進め、Candidate にする
+def simulate(game, data, x, y, steps, weights):
+    snapshot.restore(game, data)
+    score = game.score
+    merges = game.merges
+    dropped = game.drop(x, y=y) is not None
+    if dropped:
+        # 全部のボールが眠ったら（山が落ち着いたら）そこで止める
+        done = 0
+        while done < steps and not game.game_over:
+            done += game.step(min(SETTLE_CHECK, steps - done))
+            if all(ball.sleeping for ball in game.balls):
+                break
+    score_gain = game.score - score
+    merge_count = game.merges - merges
+    room = clearance(game)
+    value = evaluate_value(score_gain, merge_count, room, game.game_over, weights)
+    if not dropped:
+        # 落とせない位置は選ばない（ゲームオーバーよりはまし）
+        value = GAME_OVER_VALUE / 2
+    return Candidate(x, value, score_gain, merge_count, room, game.game_over, dropped)
+
+
+# ワーカーごとに復元先の Game を1つ持って使い回す（復元のときに Ball も使い回せる）
+_worker_games = {}
+
+
+def _worker_game(config):
+    key = repr(config)
+    game = _worker_games.get(key)
+    if game is None:
+        game = _worker_games[key] = Game(None, config)
+    return game
+
+
+# ワーカーの起動の確認（config を渡すと復元先の Game も作っておく）
+def warm_up_worker(config):
+    if config is not None:
+        _worker_game(config)
+
+
+# ワーカーの中で、xs を順に調べる。deadline（time.time() の値）を過ぎたらそこで止める
+def evaluate_chunk(config, data, xs, y, steps, weights, deadline):
+    game = _worker_game(config)
+    results = []
+    for x in xs:
+        if deadline is not None and time.time() >= deadline:
+            break
+        results.append(simulate(game, data, x, y, steps, weights))
+    return results
+
+
+class HintEvaluator:
+    def __init__(
+        self,
+        workers=0,
+        steps=120,
+        budget_ms=None,
+        score_weight=SCORE_WEIGHT,
+        merge_weight=MERGE_WEIGHT,
+        clearance_weight=CLEARANCE_WEIGHT,
+        config=None,
+    ):
+        self.workers = workers
+        self.steps = steps
+        self.budget_ms = budget_ms
+        self.weights = (score_weight, merge_weight, clearance_weight)
+        self.pool = None
+        # 起動を待っているワーカーの Future
+        self.warming = []
+        # 直前の rank で調べた候補の数と、かかった時間（ms）
+        self.evaluated = 0
+        self.last_ms = 0.0
+        if workers > 1:
+            self.warm_up(config)
+
+    # ワーカープロセスは最初に使うときに起動する
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool
+
+    # ワーカーを起動しておく（待たない）。config を渡すと、そのゲームの設定で復元先の Game も作っておく
+    def warm_up(self, config=None):
+        pool = self._get_pool()
+        self.warming = [pool.submit(warm_up_worker, config) for _ in range(self.workers)]
+
+    # 候補の x を調べて、良い順に並べた Candidate のリストを返す。
+    # y を省略すると Game.drop と同じく game.drop_y から落とす
+    def rank(self, game, count=32, y=None, budget_ms=None):
+        t0 = time.perf_counter()
+        # 起動が終わっていなければ待ってから予算を数え始める
+        if self.warming:
+            wait(self.warming)
+            self.warming = []
+        if budget_ms is None:
+            budget_ms = self.budget_ms
+        deadline = None if budget_ms is None else time.time() + budget_ms / 1000
+        if game.game_over:
+            return []
+
+        data = snapshot.save(game)
+        positions = candidate_positions(game.arena, game.next_ball_type * 10, count)
+        xs = [positions[i] for i in coarse_to_fine(count)]
+        args = (y, self.steps, self.weights, deadline)
+        if self.workers <= 1:
+            results = evaluate_chunk(game.config, data, xs, *args)
+        else:
+            # 粗い順の xs を workers 個おきに配るので、どのワーカーも幅全体を粗い順に調べる
+            pool = self._get_pool()
+            chunks = [xs[i :: self.workers] for i in range(self.workers)]
+            futures = [
+                pool.submit(evaluate_chunk, game.config, data, chunk, *args)
+                for chunk in chunks
+                if chunk
+            ]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+
+        # 点が同じなら真ん中に近い方を先にする
+        center = (game.arena.left + game.arena.right) / 2
+        results.sort(key=lambda c: (-c.value, abs(c.x - center)))
+        self.evaluated = len(results)
+        self.last_ms = (time.perf_counter() - t0) * 1000
+        return results
+
+    # 一番良い x（調べられた候補がなければ None）
+    def best(self, game, count=32, y=None, budget_ms=None):
+        ranking = self.rank(game, count, y, budget_ms)
+        return ranking[0].x if ranking else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+            self.warming = []
@@ -1,382 +1,323 @@
+import time
+
+# 起動から最初のフレームを出すまでの時間を測る（pygame の import も含める）
+started = time.perf_counter()
+
 import asyncio  # これが必須の奴
+import gc
+import os
 import pygame
 import random
-import math
 import sys
 
-# 初期化
-pygame.init()
-width, height = 900, 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Falling Balls Game")
-clock = pygame.time.Clock()
-
-
-# 物理演算用のクラス
-class Ball:
-    def __init__(self, x, y, radius, size_label):
-        self.x = x
-        self.y = y
-        self.vx = 0
-        self.vy = 0
-        self.radius = radius
-        self.size_label = size_label
-        self.color = self.get_color(size_label)
-        self.angle = 0
-        self.angular_velocity = 0
-
-    def get_color(self, size_label):
-        colors = [
-            (255, 100, 100),
-            (100, 255, 100),
-            (100, 100, 255),
-            (255, 255, 100),
-            (255, 100, 255),
-            (100, 255, 255),
-            (255, 200, 100),
-            (200, 100, 255),
-            (100, 200, 255),
-            (255, 150, 150),
-        ]
-        return colors[(size_label - 1) % len(colors)]
-
-    def update(self, dt):
-        # 重力を適用
-        self.vy += 1600 * dt  # 重力加速度
-
-        # 位置を更新
-        self.x += self.vx * dt
-        self.y += self.vy * dt
-
-        # 角度を更新
-        self.angle += self.angular_velocity * dt
-
-        # 壁との衝突判定
-        if self.x - self.radius <= 195:
-            self.x = 195 + self.radius
-            self.vx = -self.vx * 0.8
-            self.angular_velocity = -self.vx / self.radius
-        elif self.x + self.radius >= width - 195:
-            self.x = width - 195 - self.radius
-            self.vx = -self.vx * 0.8
-            self.angular_velocity = -self.vx / self.radius
-
-        # 床との衝突判定
-        if self.y + self.radius >= height - 50:
-            self.y = height - 50 - self.radius
-            self.vy = -self.vy * 0.8
-            self.vx *= 0.9  # 摩擦
-            if abs(self.vy) < 10:
-                self.vy = 0
-            if abs(self.vx) < 5:
-                self.vx = 0
-                self.angular_velocity = 0
-
-    def draw(self, screen):
-        # ボールを描画
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.radius)
-        pygame.draw.circle(
-            screen, (255, 255, 255), (int(self.x), int(self.y)), self.radius, 2
-        )
-
-        # サイズラベルを描画
-        font = pygame.font.SysFont("Arial", int(self.radius // 2))
-        text = font.render(str(self.size_label), True, (255, 255, 255))
-        text_rect = text.get_rect(center=(int(self.x), int(self.y)))
-        screen.blit(text, text_rect)
-
-
-def check_collision(ball1, ball2):
-    dx = ball1.x - ball2.x
-    dy = ball1.y - ball2.y
-    distance = math.sqrt(dx * dx + dy * dy)
-    return distance < (ball1.radius + ball2.radius)
-
-
-def resolve_collision(ball1, ball2):
-    dx = ball1.x - ball2.x
-    dy = ball1.y - ball2.y
-    distance = math.sqrt(dx * dx + dy * dy)
-
-    if distance == 0:
-        return
-
-    # 正規化されたベクトル
-    nx = dx / distance
-    ny = dy / distance
-
-    # 重なりを解決
-    overlap = ball1.radius + ball2.radius - distance
-    ball1.x += nx * overlap * 0.5
-    ball1.y += ny * overlap * 0.5
-    ball2.x -= nx * overlap * 0.5
-    ball2.y -= ny * overlap * 0.5
-
-    # 相対速度
-    dvx = ball1.vx - ball2.vx
-    dvy = ball1.vy - ball2.vy
-
-    # 相対速度の法線成分
-    dvn = dvx * nx + dvy * ny
-
-    # 衝突しない場合
-    if dvn > 0:
-        return
-
-    # 反発係数
-    e = 0.8
-
-    # 衝突後の速度
-    impulse = 2 * dvn / 2  # 質量を同じと仮定
-    ball1.vx -= impulse * nx
-    ball1.vy -= impulse * ny
-    ball2.vx += impulse * nx
-    ball2.vy += impulse * ny
-
-
-# 背景画像を作成（グラデーション）
-def create_background():
-    background = pygame.Surface((width, height))
-    for y in range(height):
-        color_ratio = y / height
-        r = int(135 + (176 - 135) * color_ratio)
-        g = int(206 + (224 - 206) * color_ratio)
-        b = int(235 + (230 - 235) * color_ratio)
-        pygame.draw.line(background, (r, g, b), (0, y), (width, y))
-    return background
-
-
-background_image = create_background()
-
+import snapshot
+
+from assets import BUNDLE_PATH, AssetManager
+from game import Game, GameConfig
+from physics import HEIGHT, WIDTH
+from profiler import EVENTS, UPDATE, FrameProfiler
+from quality import LEVELS, QualityGovernor
+from renderer import Renderer
+from replay import ReplayRecorder
+from sim_thread import SimulationThread
+from sound_bank import SoundBank
+from timestep import FixedTimestep
+
+# ボールは焼き込み済みのスプライトで描く（False にすると毎フレーム図形を描く）
+use_sprite_atlas = True
+# True にすると images/ball_N.png の絵をボールに重ねる（assets.bundle があればそこから読む）
+use_ball_images = False
+# True にすると動いた部分だけを描き直して display.update する（スプライトアトラスが必要）
+use_dirty_rects = False
+# True にすると起動時からフレームのプロファイルを表示する（F3 で切り替え、F4 で書き出し）
+show_profiler = False
+# True にするとゲームオーバーのたびにリプレイを保存する（F5 でいつでも保存できる）
+save_replays = False
+# True にすると処理が 60fps に間に合わないときに描画の品質を自動で下げる
+use_quality_governor = True
+# ボールを落としたときとマージしたときに効果音を鳴らす
+play_sounds = True
+# 一定のステップごとにゲームの状態をこのファイルに保存し、次に起動したときにそこから再開する（None で保存しない）
+autosave_path = "autosave.jgs"
+# H キーで次のボールを落とすとよい位置を表示する。調べるのにかける時間（ms）と候補の数
+hint_budget_ms = 50
+hint_candidates = 32
+# アリーナのレベルファイル（例 "levels/funnel.json"）。空なら元の箱。ワールドが大きければ縮小して描く
+level_path = ""
+# True にすると物理演算を別スレッドで進め、そのあいだに1フレーム前の状態を描く（デスクトップだけ。
+# ブラウザ版はいつも1つのスレッドで順に進める）
+use_sim_thread = False
+
+
+# pygame とウィンドウの初期化（import しただけではウィンドウを開かない）
+def init_display():
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Falling Balls Game")
+    return screen
+
+
+def create_assets():
+    bundle_path = BUNDLE_PATH if os.path.exists(BUNDLE_PATH) else None
+    return AssetManager(bundle_path=bundle_path)
+
+
+def new_seed():
+    return random.randrange(1 << 32)
+
+
+# 前回の続きがあれば復元する（壊れていたら無視して新しいゲームにする）
+def recover(game, path):
+    data = snapshot.load_file(path)
+    if data is None:
+        return False
+    try:
+        snapshot.restore(game, data)
+    except snapshot.SnapshotError as e:
+        print(f"autosave ignored: {e}")
+        return False
+    return not game.game_over
+
+
+# デスクトップでは残りのコアでヒントを調べる（ブラウザ版はプロセスを作れないのでこのプロセスで調べる）。
+# ワーカーは作ったときに起動し始める
+def create_hint_evaluator(config):
+    # concurrent.futures の import は起動時には要らないので、最初のフレームのあとまで遅らせる
+    from hint import HintEvaluator
+
+    workers = 0 if sys.platform == "emscripten" else min(4, (os.cpu_count() or 1) - 1)
+    return HintEvaluator(workers=workers, steps=60, budget_ms=hint_budget_ms, config=config)
+
+
+def save_replay(recorder):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    recorder.finish().save(f"replay-{stamp}.jgr")
+
+
+# max_frames を渡すとそのフレーム数を描いたところで終わり、最初のフレームまでの時間（ms）を返す
+async def main(max_frames=None):  # これが必須の奴
+    screen = init_display()
+    clock = pygame.time.Clock()
 
-# ゲーム状態の初期化
-def initialize_game():
-    global game_over, start_ticks, score, next_ball_type, balls
-
-    game_over = False
-    start_ticks = pygame.time.get_ticks()
-    score = 0
-    next_ball_type = 1
-    balls = []
-
-
-# 制限時間（秒）
-time_limit = 10000000
-
-
-def create_ball(x, y, update_next, radius=None):
-    global next_ball_type
-    if radius is None:
-        radius = next_ball_type * 10
-    size_label = radius // 10
-    ball = Ball(x, y, radius, size_label)
-    balls.append(ball)
-
-    if update_next:
-        next_ball_type = random.choice([i for i in range(1, 6)])
-
-
-def merge_balls(ball1, ball2):
-    global score
-
-    # 一番大きいサイズのボールのサイズラベルは10
-    if ball1.size_label == 10 and ball2.size_label == 10:
-        balls.remove(ball1)
-        balls.remove(ball2)
-        score += ball1.size_label
-        return
-
-    if ball1.size_label == ball2.size_label and ball1.size_label < 10:
-        new_radius = ball1.radius + 10
-        mid_x = (ball1.x + ball2.x) / 2
-        mid_y = (ball1.y + ball2.y) / 2
-        create_ball(mid_x, mid_y, False, new_radius)
-        balls.remove(ball1)
-        balls.remove(ball2)
-        score += ball1.size_label
-
-
-# 既存のボールとの重複をチェックする関数
-def is_overlapping_with_existing_balls(x, y, radius):
-    for ball in balls:
-        distance = math.sqrt((x - ball.x) ** 2 + (y - ball.y) ** 2)
-        if distance < radius + ball.radius:
-            return True
-    return False
-
-
-# 再挑戦ボタンの描画と判定
-def draw_retry_button():
-    button_width, button_height = 200, 60
-    button_x = width // 2 - button_width // 2
-    button_y = height // 2 + 100
-
-    # ボタンの背景
-    pygame.draw.rect(
-        screen, (80, 80, 80), (button_x, button_y, button_width, button_height)
-    )
-    pygame.draw.rect(
-        screen, (255, 255, 255), (button_x, button_y, button_width, button_height), 3
+    # ゲームを初期化
+    # リプレイで再現できるように、ゲームごとにシードを決めて落とした位置を記録する
+    game = Game(new_seed(), GameConfig(level=level_path))
+    recorder = ReplayRecorder(game)
+
+    # クラッシュしても直前の状態から再開できるように、ゲームの状態を定期的に保存する
+    # （ブラウザ版ではスレッドを使わない）
+    autosaver = None
+    if autosave_path is not None:
+        autosaver = snapshot.Autosaver(
+            autosave_path, use_thread=sys.platform != "emscripten"
+        )
+        if recover(game, autosave_path):
+            # 途中から始めたゲームはリプレイで再現できないので記録しない
+            recorder = None
+            print(f"resumed from {autosave_path} (step {game.steps}, score {game.score})")
+    # 一手戻す（U か Ctrl+Z）ための、最後にボールを落とす直前の状態
+    undo_blob = None
+    # ヒントエンジンは最初のフレームを出したあとに作る（最初に H を押したときにワーカーの起動を
+    # 待たないように）。ヒントは game.drop_y ではなく、クリックで落とせる
+    # 一番低い位置（drop_zone のすぐ上。上の線に一番かかりにくい）から落として調べる
+    hints = None
+    hint_y = game.arena.drop_zone - 1
+    assets = create_assets()
+    # 効果音は最初のフレームを出したあとに読み込む
+    sounds = SoundBank(assets) if play_sounds else None
+    last_merges = game.merges
+    renderer = Renderer(
+        screen,
+        use_sprite_atlas=use_sprite_atlas,
+        assets=assets if use_ball_images else None,
+        use_dirty_rects=use_dirty_rects,
+        arena=game.arena,
     )
 
-    # ボタンのテキスト
-    font = pygame.font.SysFont("Arial", 36)
-    retry_text = font.render("RETRY", True, (255, 255, 255))
-    text_rect = retry_text.get_rect(
-        center=(button_x + button_width // 2, button_y + button_height // 2)
+    # クリックした位置にボールを落とす（別スレッドで進めるときはシミュレーションのスレッドから呼ばれる）
+    def apply_drop(x, y):
+        nonlocal undo_blob
+        if game.backend.name == "python":
+            undo_blob = snapshot.save(game)
+        if recorder is not None:
+            return recorder.drop(x, y=y)
+        return game.drop(x, y=y)
+
+    sim = None
+    if use_sim_thread and sys.platform != "emscripten":
+        sim = SimulationThread(game, apply_drop)
+
+    # フレームのフェーズごとの時間を測る
+    profiler = FrameProfiler(capacity=600)
+    if show_profiler:
+        profiler.toggle()
+    # 別スレッドで進めるときは、物理演算を待っていた時間を update に数える
+    if sim is None:
+        game.profiler = profiler
+    renderer.profiler = profiler
+
+    # 物理演算は固定ステップで進める（1フレームで進めるステップ数には上限がある）
+    physics_clock = FixedTimestep(
+        step=game.config.step, max_steps=game.config.max_steps_per_frame
     )
-    screen.blit(retry_text, text_rect)
-
-    return pygame.Rect(button_x, button_y, button_width, button_height)
 
+    # 処理落ちしたら描画の品質を下げ、余裕が戻ったら上げる
+    # （スプライトアトラスでは効かない段は飛ばす）
+    governor = None
+    if use_quality_governor:
+        governor = QualityGovernor(budget_ms=1000 / 60, levels=renderer.quality_levels)
 
-async def main():  # これが必須の奴
-    global game_over, start_ticks, score, next_ball_type, balls
-
-    # ゲームを初期化
-    initialize_game()
+    # 起動時に作ったもの（スプライト・フォント・画像など）はずっと使うので GC の対象から外し、
+    # ゲーム中に走る GC が調べる量を減らす
+    gc.collect()
+    gc.freeze()
 
     running = True
+    frames = 0
+    first_frame_ms = None
     last_time = pygame.time.get_ticks()
 
-    # 次のボール表示用の色
-    next_ball_colors = [
-        (255, 100, 100),
-        (100, 255, 100),
-        (100, 100, 255),
-        (255, 255, 100),
-        (255, 100, 255),
-    ]
-
-    while running:
-        current_time = pygame.time.get_ticks()
-        dt = (current_time - last_time) / 1000.0
-        last_time = current_time
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if game_over:
-                    # ゲームオーバー時の再挑戦ボタンクリック判定
-                    retry_button_rect = pygame.Rect(
-                        width // 2 - 100, height // 2 + 100, 200, 60
+    try:
+        while running:
+            frame_start = time.perf_counter()
+            current_time = pygame.time.get_ticks()
+            frame_dt = (current_time - last_time) / 1000.0
+            last_time = current_time
+            profiler.begin_frame()
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_F3:
+                        profiler.toggle()
+                    elif event.key == pygame.K_F4 and profiler.count:
+                        # リングバッファの中身を書き出す
+                        stamp = time.strftime("%Y%m%d-%H%M%S")
+                        profiler.export_csv(f"profile-{stamp}.csv")
+                        profiler.export_json(f"profile-{stamp}.json")
+                    elif (
+                        event.key == pygame.K_h
+                        and not game.game_over
+                        and hints is not None
+                    ):
+                        # 次にボールを落とすまで表示する
+                        renderer.hint_x = hints.best(game, count=hint_candidates, y=hint_y)
+                        print(f"hint: {hints.evaluated} candidates in {hints.last_ms:.0f} ms")
+                    elif event.key == pygame.K_F5 and recorder is not None:
+                        save_replay(recorder)
+                    elif (
+                        event.key == pygame.K_u
+                        or (event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL)
+                    ) and undo_blob is not None and not game.game_over:
+                        snapshot.restore(game, undo_blob)
+                        undo_blob = None
+                        renderer.hint_x = None
+                        physics_clock.reset()
+                        if sim is not None:
+                            sim.publish()
+                        if recorder is not None:
+                            # 戻したあとはリプレイと食い違うので記録をやめる
+                            recorder = None
+                            print("undo: replay recording stopped")
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if game.game_over:
+                        # ゲームオーバー時の再挑戦ボタンクリック判定
+                        if renderer.retry_button_rect.collidepoint(event.pos):
+                            game.reset(new_seed())  # ゲームをリセット
+                            recorder = ReplayRecorder(game)
+                            undo_blob = None
+                            renderer.hint_x = None
+                            physics_clock.reset()
+                            if autosaver is not None:
+                                autosaver.discard()
+                            if sim is not None:
+                                sim.publish()
+                    else:
+                        # 通常のゲームプレイ時のボール配置（クリックした位置をワールドの座標にする）
+                        x, y = renderer.camera.to_world(*event.pos)
+                        if y < game.arena.drop_zone:  # 元の箱では画面の上部120px内の場合
+                            renderer.hint_x = None
+                            if sim is not None:
+                                # 次のステップの前にシミュレーションのスレッドが落とす
+                                sim.drop(x, y)
+                            elif apply_drop(x, y) is not None and sounds is not None:
+                                sounds.request("spawn")
+
+            profiler.mark(EVENTS)
+
+            stepping = not game.game_over
+            if sim is not None:
+                # 次のステップを別スレッドで計算しているあいだに、できあがっている前のフレームを描く
+                if stepping:
+                    sim.start(physics_clock.advance(frame_dt), physics_clock.alpha)
+                if governor is None or governor.should_render():
+                    renderer.draw(sim.front, sim.front.alpha)
+                sim.wait()
+                profiler.mark(UPDATE)
+                if sounds is not None and stepping:
+                    sounds.request("spawn", sim.front.drops)
+            elif stepping:
+                # 経過時間に応じて固定ステップで物理演算を進める
+                game.step(physics_clock.advance(frame_dt))
+
+            if stepping:
+                if autosaver is not None:
+                    if game.game_over:
+                        autosaver.discard()
+                    elif game.backend.name == "python":
+                        autosaver.update(game)
+                if game.game_over and save_replays and recorder is not None:
+                    save_replay(recorder)
+                if game.game_over and governor is not None:
+                    # このゲームのあいだ、どの段でどれだけ過ごしたか
+                    print(f"quality {governor.summary()}")
+
+            if sounds is not None:
+                # 連鎖で何回マージしても、1フレームに鳴らすのは1回（回数が多いほど大きな音）
+                sounds.request("merge", game.merges - last_merges)
+                sounds.flush()
+            last_merges = game.merges
+
+            if sim is None and (governor is None or governor.should_render()):
+                renderer.draw(game, physics_clock.alpha)
+            profiler.end_frame(len(game.balls), game.pairs_tested, game.merges)
+            if governor is not None:
+                old_level = governor.level
+                level = governor.add((time.perf_counter() - frame_start) * 1000)
+                if level is not None:
+                    renderer.quality = level
+                    print(
+                        f"quality {LEVELS[old_level]} -> {LEVELS[level]}"
+                        f" (avg {governor.changes[-1][3]:.1f} ms/frame)"
                     )
-                    if retry_button_rect.collidepoint(event.pos):
-                        initialize_game()  # ゲームをリセット
-                else:
-                    # 通常のゲームプレイ時のボール配置
-                    if event.pos[1] < 120:  # 画面の上部120px内の場合
-                        if not is_overlapping_with_existing_balls(
-                            event.pos[0], event.pos[1], next_ball_type * 10
-                        ):
-                            create_ball(event.pos[0], event.pos[1], True)
-
-        screen.blit(background_image, (0, 0))
-
-        if not game_over:
-            # ボールの更新
-            for ball in balls:
-                ball.update(dt)
-
-            # ボール同士の衝突判定
-            balls_to_merge = []
-            for i in range(len(balls)):
-                for j in range(i + 1, len(balls)):
-                    ball1, ball2 = balls[i], balls[j]
-                    if check_collision(ball1, ball2):
-                        if ball1.size_label == ball2.size_label:
-                            balls_to_merge.append((ball1, ball2))
-                        else:
-                            resolve_collision(ball1, ball2)
-
-            # マージ処理
-            for ball1, ball2 in balls_to_merge:
-                if ball1 in balls and ball2 in balls:
-                    merge_balls(ball1, ball2)
-
-            # ボールの描画
-            for ball in balls:
-                ball.draw(screen)
-
-            # ゲームオーバー判定
-            for ball in balls:
-                if ball.y - ball.radius < 97:  # 上部の境界線
-                    game_over = True
-
-            # 壁と床の描画
-            pygame.draw.line(
-                screen, (100, 20, 0), (195, 97), (195, height - 50), 20
-            )  # 左の壁
-            pygame.draw.line(
-                screen, (100, 20, 0), (width - 195, 97), (width - 195, height - 50), 20
-            )  # 右の壁
-            pygame.draw.line(
-                screen, (100, 20, 0), (195, height - 50), (width - 195, height - 50), 20
-            )  # 床
-
-            # 角の丸み
-            pygame.draw.circle(screen, (100, 20, 0), (195, height - 50), 10)
-            pygame.draw.circle(screen, (100, 20, 0), (width - 195, height - 50), 10)
-            pygame.draw.circle(screen, (95, 5, 0), (195, 97), 10)
-            pygame.draw.circle(screen, (95, 5, 0), (width - 195, 97), 10)
-
-            # 経過時間の計算（秒）
-            seconds = (pygame.time.get_ticks() - start_ticks) // 1000
-
-            # 画面の上部に暗い矩形を描画
-            dark_surface = pygame.Surface((width, 75), pygame.SRCALPHA)
-            dark_surface.fill((0, 0, 0, 128))
-            screen.blit(dark_surface, (0, 0))
-
-            # 次のボールを表示
-            next_ball_radius = next_ball_type * 10
-            next_ball_color = next_ball_colors[
-                (next_ball_type - 1) % len(next_ball_colors)
-            ]
-            pygame.draw.circle(
-                screen, next_ball_color, (width - 90, 37), next_ball_radius
-            )
-            pygame.draw.circle(
-                screen, (255, 255, 255), (width - 90, 37), next_ball_radius, 2
-            )
-
-            # 画面の指定された位置にスコアを表示
-            font = pygame.font.SysFont("Arial", 36)
-            score_text = font.render(f"SCORE: {score}", True, (255, 255, 255))
-            screen.blit(score_text, (50, 25))
-
-            screen.blit(font.render("NEXT: ", True, (255, 255, 255)), (width - 168, 10))
-
-            text = font.render(f"Time: {time_limit - seconds}", True, (255, 255, 255))
-            screen.blit(text, (width - 200, 50))
-
-            if seconds >= 1000:
-                game_over = True
-
-        if game_over:
-            # 半透明の黒で画面を暗くします
-            overlay = pygame.Surface((width, height))
-            overlay.set_alpha(180)
-            overlay.fill((0, 0, 0))
-            screen.blit(overlay, (0, 0))
-
-            font = pygame.font.SysFont("Arial", 54)
-            gameover_text = font.render("Game Over", True, (255, 255, 255))
-            gameover_pos = gameover_text.get_rect(center=(width / 2, height / 2 - 40))
-            screen.blit(gameover_text, gameover_pos)
-
-            score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-            score_pos = score_text.get_rect(center=(width / 2, height / 2 + 40))
-            screen.blit(score_text, score_pos)
-
-            # 再挑戦ボタンを描画
-            draw_retry_button()
-
-        pygame.display.flip()
-        clock.tick(60)
-        await asyncio.sleep(0)  # これが必須の奴
-
-
-asyncio.run(main())  # これが必須の奴
+            frames += 1
+            if first_frame_ms is None:
+                first_frame_ms = (time.perf_counter() - started) * 1000
+                report = assets.report()
+                loads = ", ".join(f"{source} {ms:.0f} ms" for source, ms in report["ms"].items())
+                print(
+                    f"first frame {first_frame_ms:.0f} ms"
+                    f" ({report['assets']} assets: {loads or 'none'})"
+                )
+                if sounds is not None:
+                    sounds.preload()
+                if game.backend.name == "python":
+                    hints = create_hint_evaluator(game.config)
+            if max_frames is not None and frames >= max_frames:
+                running = False
+
+            clock.tick(60)
+            await asyncio.sleep(0)  # これが必須の奴
+    finally:
+        # ウィンドウを閉じたときも max_frames で終わるときも、ワーカーのスレッドとプロセスを止める
+        if hints is not None:
+            hints.close()
+        if sim is not None:
+            sim.close()
+    return first_frame_ms
+
+
+if __name__ == "__main__":
+    asyncio.run(main())  # これが必須の奴
@@ -0,0 +1,37 @@
+# 1ステップ分のマージをまとめて決める
+#
+# 衝突判定で見つかった同じサイズのペアには、1つのボールが2つ以上のペアに
+# 出てくることがある。重なりの深い順に、どちらのボールもまだ使われていない
+# ペアを取っていく（貪欲マッチング）。深さが同じときは id の小さい順にするので、
+# ペアが見つかった順番に関係なく結果は毎回同じになる。
+import math
+
+
+# ペアのリストから、ボールが重複しないペアを選んで返す
+def pick_merges(pairs):
+    if len(pairs) < 2:
+        return list(pairs)
+
+    candidates = []
+    for ball1, ball2 in pairs:
+        if ball1.id > ball2.id:
+            ball1, ball2 = ball2, ball1
+        dx = ball1.x - ball2.x
+        dy = ball1.y - ball2.y
+        depth = ball1.radius + ball2.radius - math.sqrt(dx * dx + dy * dy)
+        candidates.append((-depth, ball1.id, ball2.id, ball1, ball2))
+    candidates.sort(key=_candidate_key)
+
+    used = set()
+    picked = []
+    for _, id1, id2, ball1, ball2 in candidates:
+        if id1 in used or id2 in used:
+            continue
+        used.add(id1)
+        used.add(id2)
+        picked.append((ball1, ball2))
+    return picked
+
+
+def _candidate_key(candidate):
+    return candidate[:3]
@@ -0,0 +1,174 @@
+# ボールの物理演算（重力・壁と床の反射・ボール同士の衝突）
+import math
+
+# 画面とコンテナの寸法
+WIDTH, HEIGHT = 900, 600
+WALL_LEFT = 195  # 左の壁
+WALL_RIGHT = WIDTH - 195  # 右の壁
+FLOOR_Y = HEIGHT - 50  # 床
+GAME_OVER_LINE = 97  # ボールの上端がこれより上に出るとゲームオーバー
+
+GRAVITY = 1600  # 重力加速度
+RESTITUTION = 0.8  # 反発係数
+FRICTION = 0.9  # 床の摩擦
+REST_VY = 20  # 床の上でこれより遅ければ止める（1ステップ分の重力 × 反発係数より大きくする）
+REST_VX = 5
+
+# 眠らせる条件：SLEEP_STEPS ステップのあいだ、基準の位置から SLEEP_DRIFT px 以内に留まる
+# （積み重なったボールは毎ステップ小さく揺れるので、速度ではなく位置のずれで見る）
+SLEEP_STEPS = 60
+SLEEP_DRIFT = 2.0
+# 眠っているボールにこれより速くぶつかると起こす
+WAKE_SPEED = 100
+
+BALL_COLORS = [
+    (255, 100, 100),
+    (100, 255, 100),
+    (100, 100, 255),
+    (255, 255, 100),
+    (255, 100, 255),
+    (100, 255, 255),
+    (255, 200, 100),
+    (200, 100, 255),
+    (100, 200, 255),
+    (255, 150, 150),
+]
+
+
+# 物理演算用のクラス
+# 属性は __slots__ に固定して、1個あたりのメモリと属性の参照を軽くする。
+# マージで消えたボールは PythonBackend が reset して使い回す
+class Ball:
+    __slots__ = (
+        "x",
+        "y",
+        "vx",
+        "vy",
+        "radius",
+        "size_label",
+        "color",
+        "angle",
+        "angular_velocity",
+        "prev_x",
+        "prev_y",
+        "prev_angle",
+        "id",
+        "slot",
+        "alive",
+        "sleeping",
+        "still_steps",
+        "anchor_x",
+        "anchor_y",
+    )
+
+    def __init__(self, x, y, radius, size_label):
+        self.reset(x, y, radius, size_label)
+
+    # 新しく作ったときと同じ状態にする
+    def reset(self, x, y, radius, size_label):
+        self.x = x
+        self.y = y
+        self.vx = 0
+        self.vy = 0
+        self.radius = radius
+        self.size_label = size_label
+        self.color = self.get_color(size_label)
+        self.angle = 0
+        self.angular_velocity = 0
+        # 描画の補間用に1ステップ前の状態を覚えておく
+        self.prev_x = x
+        self.prev_y = y
+        self.prev_angle = 0
+        # BallStore に入れると通し番号と位置が振られる
+        self.id = -1
+        self.slot = -1
+        self.alive = False
+        # 眠っている間は動かさず、眠っているボール同士の判定もしない
+        self.sleeping = False
+        self.still_steps = 0
+        self.anchor_x = x
+        self.anchor_y = y
+
+    def get_color(self, size_label):
+        return BALL_COLORS[(size_label - 1) % len(BALL_COLORS)]
+
+    # 基準の位置からのずれを見て、止まっているステップ数を数える
+    def count_still(self):
+        dx = self.x - self.anchor_x
+        dy = self.y - self.anchor_y
+        if dx * dx + dy * dy > SLEEP_DRIFT * SLEEP_DRIFT:
+            self.anchor_x = self.x
+            self.anchor_y = self.y
+            self.still_steps = 0
+        else:
+            self.still_steps += 1
+
+    def sleep(self):
+        self.sleeping = True
+        self.vx = 0
+        self.vy = 0
+        self.angular_velocity = 0
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.prev_angle = self.angle
+
+    def wake(self):
+        self.sleeping = False
+        self.still_steps = 0
+        self.anchor_x = self.x
+        self.anchor_y = self.y
+
+    def save_previous(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.prev_angle = self.angle
+
+    # left・right・floor はアリーナの壁と床（省略すると元の箱）
+    def update(self, dt, left=WALL_LEFT, right=WALL_RIGHT, floor=FLOOR_Y):
+        # 重力を適用
+        self.vy += GRAVITY * dt  # 重力加速度
+
+        # 位置を更新
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+
+        # 角度を更新
+        self.angle += self.angular_velocity * dt
+
+        # 壁との衝突判定
+        if self.x - self.radius <= left:
+            self.x = left + self.radius
+            self.vx = -self.vx * RESTITUTION
+            self.angular_velocity = -self.vx / self.radius
+        elif self.x + self.radius >= right:
+            self.x = right - self.radius
+            self.vx = -self.vx * RESTITUTION
+            self.angular_velocity = -self.vx / self.radius
+
+        # 床との衝突判定
+        if self.y + self.radius >= floor:
+            self.y = floor - self.radius
+            self.vy = -self.vy * RESTITUTION
+            self.vx *= FRICTION  # 摩擦
+            if abs(self.vy) < REST_VY:
+                self.vy = 0
+            if abs(self.vx) < REST_VX:
+                self.vx = 0
+                self.angular_velocity = 0
+
+
+# 2つのボールの間のすき間（重なっているときは負）
+def contact_gap(ball1, ball2):
+    dx = ball1.x - ball2.x
+    dy = ball1.y - ball2.y
+    return math.sqrt(dx * dx + dy * dy) - ball1.radius - ball2.radius
+
+
+# ball が fixed に近づく速さ（離れているときは 0 以下）
+def approach_speed(ball, fixed):
+    dx = ball.x - fixed.x
+    dy = ball.y - fixed.y
+    distance = math.sqrt(dx * dx + dy * dy)
+    if distance == 0:
+        return 0
+    return -(ball.vx * dx + ball.vy * dy) / distance
@@ -0,0 +1,565 @@
+# 物理演算のバックエンド
+#
+# Game はボールの追加・削除とマージの結果（スコアや新しいボール）だけを決め、
+# ボールの動き・衝突・眠らせる処理はバックエンドに任せる。どのバックエンドも
+# 次のメソッドを持つ。
+#
+#   balls                       ボールの入れ物（len・for・in が使える）
+#   add_ball(x, y, radius, size_label) -> ball
+#   remove_ball(ball)
+#   overlaps(x, y, radius)      円 (x, y, radius) に重なるボールがあるか
+#   save_previous()             描画の補間用に今の位置を覚える
+#   integrate(dt)               重力と壁・床（とアリーナの線分・ピン）
+#   collide(dt) -> pairs        ボール同士の接触を解決し、重なった同じサイズのペアを返す
+#   merged(removed, spawned)    Game がマージを終えたあとに呼ばれる
+#   update_sleep()              1ステップの最後に呼ばれる
+#   clear()
+#
+# config.backend で選ぶ。
+#   "python"  BallStore + 空間ハッシュ + ContactSolver（既定。pygbag でも動く）
+#   "numpy"   NumPy の BallWorld（ボールを眠らせない）
+#   "pymunk"  pymunk（Chipmunk2D）の Space。重い接触の計算を C で行う
+# 使えないバックエンドを選んだときは "python" になる。
+# アリーナ（arena.py）の壁と床はどのバックエンドでも使う。線分とピンは "python" と "pymunk" だけが
+# 扱えるので、線分やピンのあるアリーナで "numpy" を選んだときも "python" になる。
+import math
+
+from arena import DEFAULT_ARENA, TOUCH_MARGIN, collide_static
+from ball_store import BallStore
+from ccd import FAST_RATIO, sweep_circle, sweep_planes, sweep_static
+from contact_solver import CONTACT_MARGIN, ContactSolver
+from physics import (
+    GRAVITY,
+    SLEEP_DRIFT,
+    SLEEP_STEPS,
+    WAKE_SPEED,
+    Ball,
+    approach_speed,
+    contact_gap,
+)
+from spatial_hash import SpatialHash
+
+BACKENDS = ("python", "numpy", "pymunk")
+# 線分やピンに挟まれたボールを押し出し直す回数の上限
+STATIC_PASSES = 3
+
+
+# NumPy と pymunk は import だけで 100ms 近くかかるので、選ばれたときに初めて読み込む
+def create_backend(config, arena=None):
+    if arena is None:
+        arena = DEFAULT_ARENA
+    if config.backend == "pymunk":
+        try:
+            from pymunk_backend import PymunkBackend
+        except ImportError:  # pymunk がない環境（pygbag など）
+            pass
+        else:
+            return PymunkBackend(config, arena)
+    if config.backend == "numpy" and not arena.colliders:
+        try:
+            import ball_world  # noqa: F401
+        except ImportError:  # NumPy がない環境
+            pass
+        else:
+            return NumpyBackend(config, arena)
+    if config.backend not in BACKENDS:
+        raise ValueError(f"unknown physics backend {config.backend!r}")
+    return PythonBackend(config, arena)
+
+
+class PythonBackend:
+    name = "python"
+
+    def __init__(self, config, arena=DEFAULT_ARENA):
+        self.config = config
+        self.arena = arena
+        self.balls = BallStore()
+        # 起きているボールは毎ステップ作り直し、眠っているボールは眠ったときに登録する
+        self.broadphase = SpatialHash(cell_size=config.cell_size)
+        self.sleep_hash = SpatialHash(cell_size=config.cell_size)
+        self.solver = ContactSolver(
+            velocity_iterations=config.velocity_iterations,
+            position_iterations=config.position_iterations,
+            tolerance=config.solver_tolerance,
+            warm_start=config.warm_start,
+            arena=arena,
+        )
+        # このステップで接触した起きているボール同士のペア（島を作るのに使う）
+        self.contacts = []
+        self.pairs_tested = 0
+        # 消えたボールは使い回す。このステップの contacts などにまだ残っているかもしれないので、
+        # released に入れておいて、ステップの最後（update_sleep）で free に移す
+        self.free = []
+        self.released = []
+        # collide で毎回作り直さずに使い回すリスト
+        self.awake = []
+        self.balls_to_merge = []
+        # integrate で連続衝突判定をするボールと動かす前の状態
+        self.fast = []
+        # 連続衝突判定でボールを手前に止めた回数
+        self.ccd_hits = 0
+        # アリーナの線分とピンを BVH から探すときに使い回すリスト
+        self.found = []
+
+    def clear(self):
+        # id も 0 から振り直す。入っていたボールは使い回す
+        self.free.extend(self.balls)
+        self.free.extend(self.released)
+        self.released.clear()
+        self.balls.clear()
+        self.balls = BallStore()
+        self.broadphase.clear()
+        self.sleep_hash.clear()
+        self.solver.clear()
+        self.contacts = []
+        self.pairs_tested = 0
+
+    def new_ball(self, x, y, radius, size_label):
+        free = self.free
+        if free:
+            ball = free.pop()
+            ball.reset(x, y, radius, size_label)
+            return ball
+        return Ball(x, y, radius, size_label)
+
+    def add_ball(self, x, y, radius, size_label):
+        ball = self.new_ball(x, y, radius, size_label)
+        self.balls.append(ball)
+        self.broadphase.insert(ball)
+        return ball
+
+    def remove_ball(self, ball):
+        self.balls.remove(ball)
+        self.broadphase.remove(ball)
+        self.sleep_hash.remove(ball)
+        self.released.append(ball)
+
+    def overlaps(self, x, y, radius):
+        for broadphase in (self.broadphase, self.sleep_hash):
+            for ball in broadphase.query(x, y, radius):
+                reach = radius + ball.radius
+                if (x - ball.x) ** 2 + (y - ball.y) ** 2 < reach * reach:
+                    return True
+        return False
+
+    def save_previous(self):
+        for ball in self.balls:
+            if not ball.sleeping:
+                ball.save_previous()
+
+    def integrate(self, dt):
+        arena = self.arena
+        left = arena.left
+        right = arena.right
+        floor = arena.floor
+        if not self.config.continuous_collision:
+            for ball in self.balls:
+                if not ball.sleeping:
+                    ball.update(dt, left, right, floor)
+            if arena.bvh is not None:
+                self.collide_static()
+            return
+
+        # 速いボールは動かす前の状態を覚えておく（Ball.update は重力を足してから動かすので、
+        # このステップの移動は (vx, vy + GRAVITY * dt) * dt の線分になる）
+        fast = self.fast
+        fast.clear()
+        gravity_dt = GRAVITY * dt
+        dt_sq = dt * dt
+        for ball in self.balls:
+            if ball.sleeping:
+                continue
+            vx = ball.vx
+            vy = ball.vy + gravity_dt
+            reach = ball.radius * FAST_RATIO
+            if (vx * vx + vy * vy) * dt_sq > reach * reach:
+                fast.append((ball, ball.x, ball.y, vx, vy, ball.angle, ball.angular_velocity))
+            ball.update(dt, left, right, floor)
+        if fast:
+            self.sweep(fast, dt)
+        if arena.bvh is not None:
+            self.collide_static()
+
+    # 起きているボールを、近くの線分とピンから押し出す（BVH で外接矩形が重なるものだけを調べる）。
+    # 2つ以上に挟まれたボールは、1つから押し出すと別の方にめり込むので、めり込まなくなるまで
+    # STATIC_PASSES 回まで繰り返す
+    def collide_static(self):
+        query = self.arena.bvh.query
+        found = self.found
+        for ball in self.balls:
+            if ball.sleeping:
+                continue
+            x = ball.x
+            y = ball.y
+            r = ball.radius + TOUCH_MARGIN
+            for collider in query(x - r, y - r, x + r, y + r, found):
+                collide_static(ball, collider)
+            if len(found) > 1:
+                for _ in range(STATIC_PASSES):
+                    pushed = False
+                    for collider in found:
+                        if collide_static(ball, collider):
+                            pushed = True
+                    if not pushed:
+                        break
+
+    # 速いボールが、壁や床より先にほかのボールか線分・ピンに触れていたら、触れた位置まで戻す
+    def sweep(self, fast, dt):
+        # 起きているボールを動かしたあとの位置で空間ハッシュに入れ直す（collide でもう一度作り直す）
+        awake = self.awake
+        awake.clear()
+        for ball in self.balls:
+            if not ball.sleeping:
+                awake.append(ball)
+        broadphase = self.broadphase
+        broadphase.rebuild(awake)
+        sleep_hash = self.sleep_hash
+        planes = self.arena.planes
+        bvh = self.arena.bvh
+        found = self.found
+        for ball, x0, y0, vx, vy, angle, angular_velocity in fast:
+            dx = vx * dt
+            dy = vy * dt
+            radius = ball.radius
+            first = sweep_planes(x0, y0, dx, dy, radius, planes)
+            hit = False
+            if bvh is not None:
+                # 動く範囲の外接矩形に重なる線分とピン
+                for collider in bvh.query(
+                    min(x0, x0 + dx) - radius,
+                    min(y0, y0 + dy) - radius,
+                    max(x0, x0 + dx) + radius,
+                    max(y0, y0 + dy) + radius,
+                    found,
+                ):
+                    t = sweep_static(x0, y0, dx, dy, radius, collider)
+                    if t is not None and t < first:
+                        first = t
+                        hit = True
+            # 線分を囲む円の中だけを調べる
+            mid_x = x0 + dx / 2
+            mid_y = y0 + dy / 2
+            reach = math.sqrt(dx * dx + dy * dy) / 2 + radius
+            for other in broadphase.query(mid_x, mid_y, reach):
+                if other is ball:
+                    continue
+                t = sweep_circle(x0, y0, dx, dy, other.x, other.y, radius + other.radius)
+                if t is not None and t < first:
+                    first = t
+                    hit = True
+            if sleep_hash.index:
+                for other in sleep_hash.query(mid_x, mid_y, reach):
+                    t = sweep_circle(x0, y0, dx, dy, other.x, other.y, radius + other.radius)
+                    if t is not None and t < first:
+                        first = t
+                        hit = True
+            if not hit:
+                continue
+            # 壁や床での跳ね返りは起きなかったことにする
+            ball.x = x0 + dx * first
+            ball.y = y0 + dy * first
+            ball.vx = vx
+            ball.vy = vy
+            ball.angle = angle + angular_velocity * dt * first
+            ball.angular_velocity = angular_velocity
+            self.ccd_hits += 1
+            # 戻した位置で入れ直して、あとの速いボールから見えるようにする
+            broadphase.remove(ball)
+            broadphase.insert(ball)
+
+    # ボール同士の衝突判定（空間ハッシュで候補ペアを絞り込む）
+    # 返すリストは次の collide で書き換えるので、呼んだ側は持ち続けないこと
+    def collide(self, dt):
+        awake = self.awake
+        awake.clear()
+        for ball in self.balls:
+            if not ball.sleeping:
+                awake.append(ball)
+        self.broadphase.rebuild(awake)
+        balls_to_merge = self.balls_to_merge
+        balls_to_merge.clear()
+        contacts = []
+        tested = 0
+        for ball1, ball2 in self.broadphase.candidate_pairs():
+            tested += 1
+            gap = contact_gap(ball1, ball2)
+            if gap < 0 and ball1.size_label == ball2.size_label:
+                balls_to_merge.append((ball1, ball2))
+            elif gap < CONTACT_MARGIN:
+                contacts.append((ball1, ball2))
+
+        # 起きているボールと眠っているボール（眠っているボール同士は判定しない）
+        sleep_hash = self.sleep_hash
+        if sleep_hash.index:
+            to_wake = []
+            for ball in awake:
+                # 基準の位置から SLEEP_DRIFT より動いたボール（このステップで動いたものも含む）は、
+                # 動いた分だけ離れた眠ったボールも起こす（接触が切れてから離れていくこともある）
+                dx = ball.x - ball.anchor_x
+                dy = ball.y - ball.anchor_y
+                drift = dx * dx + dy * dy
+                moved = ball.still_steps == 0 or drift > SLEEP_DRIFT * SLEEP_DRIFT
+                reach = CONTACT_MARGIN
+                if moved:
+                    reach += SLEEP_DRIFT + math.sqrt(drift)
+                for other in sleep_hash.query(ball.x, ball.y, ball.radius + reach):
+                    tested += 1
+                    gap = contact_gap(ball, other)
+                    if gap >= reach:
+                        continue
+                    if gap < 0 and ball.size_label == other.size_label:
+                        balls_to_merge.append((ball, other))
+                        continue
+                    # 眠ったままのボールは、ソルバーが動かないものとして扱う。速くぶつかったときと、
+                    # 近くのボールが動いたとき（支えや押さえが離れていくかもしれない）は起こす
+                    if other.sleeping and (moved or approach_speed(ball, other) > WAKE_SPEED):
+                        other.wake()
+                        to_wake.append(other)
+                    if gap < CONTACT_MARGIN:
+                        contacts.append((ball, other))
+            if to_wake:
+                for ball in to_wake:
+                    sleep_hash.remove(ball)
+                self.wake_resting_on(to_wake)
+        self.pairs_tested += tested
+
+        self.solver.solve(contacts, dt)
+        self.contacts.extend(contacts)
+        return balls_to_merge
+
+    # 消えたボールに乗っていたボールと、新しいボールに重なるボールを起こす
+    def merged(self, removed, spawned):
+        for ball in removed:
+            self.wake_around(ball.x, ball.y, ball.radius)
+        for ball in spawned:
+            self.wake_around(ball.x, ball.y, ball.radius)
+
+    # 円 (x, y, radius) に触れている眠ったボールを起こす。起きているボールも止まっていたステップ数を
+    # 数え直す（支えが消えたステップに、残ったボールだけの島として眠ってしまわないように）
+    def wake_around(self, x, y, radius, margin=2):
+        for ball in self.broadphase.query(x, y, radius + margin):
+            reach = radius + ball.radius + margin
+            if (ball.x - x) ** 2 + (ball.y - y) ** 2 < reach * reach:
+                ball.wake()
+        sleep_hash = self.sleep_hash
+        if not sleep_hash.index:
+            return
+        touching = []
+        for ball in sleep_hash.query(x, y, radius + margin):
+            reach = radius + ball.radius + margin
+            if (ball.x - x) ** 2 + (ball.y - y) ** 2 < reach * reach:
+                touching.append(ball)
+        for ball in touching:
+            ball.wake()
+            sleep_hash.remove(ball)
+        self.wake_resting_on(touching)
+
+    # 起こしたボールの上に乗っている眠ったボールも、上へたどって起こす
+    # （下のボールが動いたり消えたりしたあとに、支えのないまま宙に浮いて眠り続けないように）
+    def wake_resting_on(self, woken, margin=2):
+        sleep_hash = self.sleep_hash
+        stack = list(woken)
+        above = []
+        while stack and sleep_hash.index:
+            below = stack.pop()
+            x = below.x
+            y = below.y
+            radius = below.radius
+            above.clear()
+            for ball in sleep_hash.query(x, y, radius + margin):
+                if ball.y >= y:
+                    continue
+                reach = radius + ball.radius + margin
+                if (ball.x - x) ** 2 + (ball.y - y) ** 2 < reach * reach:
+                    above.append(ball)
+            for ball in above:
+                ball.wake()
+                sleep_hash.remove(ball)
+                stack.append(ball)
+
+    # 止まったボールを、接触でつながった島ごとに眠らせる
+    def update_sleep(self):
+        contacts = self.contacts
+        self.contacts = []
+        if self.released:
+            # このステップで消えたボールは、もうどこからも使われない
+            self.free.extend(self.released)
+            self.released.clear()
+        if not self.config.allow_sleep:
+            return
+
+        balls = self.balls
+        ready = False
+        for ball in balls:
+            if not ball.sleeping:
+                ball.count_still()
+                if ball.still_steps >= SLEEP_STEPS:
+                    ready = True
+        if not ready:
+            return
+
+        # 接触しているボールを union-find で島にまとめる
+        parent = {}
+
+        def find(ball_id):
+            root = ball_id
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while ball_id != root:
+                parent[ball_id], ball_id = root, parent[ball_id]
+            return root
+
+        for ball1, ball2 in contacts:
+            # 眠っているボールを通して島をつなげない
+            if ball1.sleeping or ball2.sleeping:
+                continue
+            if ball1.alive and ball2.alive:
+                root1 = find(ball1.id)
+                root2 = find(ball2.id)
+                if root1 != root2:
+                    parent[root2] = root1
+
+        # 島の全員が止まっていたら島ごと眠らせる
+        islands = {}
+        for ball in balls:
+            if not ball.sleeping:
+                islands.setdefault(find(ball.id), []).append(ball)
+        for members in islands.values():
+            if all(ball.still_steps >= SLEEP_STEPS for ball in members):
+                for ball in members:
+                    ball.sleep()
+                    self.broadphase.remove(ball)
+                    self.sleep_hash.insert(ball)
+
+    # スナップショット用に (ボールのリスト, 眠った順の id, 力積, 次の id) を返す
+    def save_state(self):
+        sleep_order = [entry[0].id for entry in self.sleep_hash.entries if entry is not None]
+        return list(self.balls), sleep_order, self.solver.impulses, self.balls.next_id
+
+    # save_state で保存した状態に戻す。records は BALL_FIELDS の順の値のタプルで、ボールの並び順も復元する。
+    # 同じ id のボールがあればその Ball をそのまま書き換え、足りない分だけ新しく作る
+    def load_state(self, records, sleep_order, impulses, next_id):
+        balls = self.balls
+        existing = dict(balls.by_id)
+        restored = []
+        for (
+            ball_id,
+            radius,
+            size_label,
+            sleeping,
+            still_steps,
+            x,
+            y,
+            vx,
+            vy,
+            angle,
+            angular_velocity,
+            prev_x,
+            prev_y,
+            prev_angle,
+            anchor_x,
+            anchor_y,
+        ) in records:
+            ball = existing.pop(ball_id, None)
+            if ball is None or ball.radius != radius:
+                if ball is not None:
+                    self.free.append(ball)
+                ball = self.new_ball(x, y, radius, size_label)
+                ball.id = ball_id
+            elif ball.size_label != size_label:
+                ball.size_label = size_label
+                ball.color = ball.get_color(size_label)
+            ball.sleeping = sleeping
+            ball.still_steps = still_steps
+            ball.x = x
+            ball.y = y
+            ball.vx = vx
+            ball.vy = vy
+            ball.angle = angle
+            ball.angular_velocity = angular_velocity
+            ball.prev_x = prev_x
+            ball.prev_y = prev_y
+            ball.prev_angle = prev_angle
+            ball.anchor_x = anchor_x
+            ball.anchor_y = anchor_y
+            restored.append(ball)
+        balls.replace(restored, next_id)
+        # 復元しなかったボールと、このステップで消えたボールは使い回す
+        self.free.extend(existing.values())
+        self.free.extend(self.released)
+        self.released.clear()
+
+        # 空間ハッシュも作り直す。眠っているボールは眠った順に入れると、判定の順番まで元と同じになる
+        self.broadphase.rebuild([ball for ball in restored if not ball.sleeping])
+        self.sleep_hash.clear()
+        by_id = balls.by_id
+        for ball_id in sleep_order:
+            self.sleep_hash.insert(by_id[ball_id])
+        self.solver.impulses = dict(impulses)
+        self.contacts = []
+
+
+# スナップショットに保存するボールの属性（この順番で保存する）
+BALL_FIELDS = (
+    "id",
+    "radius",
+    "size_label",
+    "sleeping",
+    "still_steps",
+    "x",
+    "y",
+    "vx",
+    "vy",
+    "angle",
+    "angular_velocity",
+    "prev_x",
+    "prev_y",
+    "prev_angle",
+    "anchor_x",
+    "anchor_y",
+)
+
+
+# NumPy の配列でまとめて更新する BallWorld をバックエンドとして使う
+class NumpyBackend:
+    name = "numpy"
+
+    def __init__(self, config, arena=DEFAULT_ARENA):
+        self.config = config
+        self.arena = arena
+        self.balls = None
+        self.clear()
+
+    @property
+    def pairs_tested(self):
+        return self.balls.pairs_tested
+
+    def clear(self):
+        from ball_world import BallWorld
+
+        arena = self.arena
+        self.balls = BallWorld(left=arena.left, right=arena.right, floor=arena.floor)
+
+    def add_ball(self, x, y, radius, size_label):
+        return self.balls.add(x, y, radius, size_label)
+
+    def remove_ball(self, ball):
+        self.balls.remove(ball)
+
+    def overlaps(self, x, y, radius):
+        return self.balls.overlaps(x, y, radius)
+
+    def save_previous(self):
+        self.balls.save_previous()
+
+    def integrate(self, dt):
+        self.balls.integrate(dt)
+
+    def collide(self, dt):
+        return self.balls.collide()
+
+    def merged(self, removed, spawned):
+        pass
+
+    def update_sleep(self):
+        pass
@@ -0,0 +1,136 @@
+# フレームのフェーズごとの時間を測るプロファイラ
+#
+# ループの区切りごとに mark(フェーズ) を呼ぶと、前の区切りからの時間がそのフェーズに足される。
+# 1フレーム分の結果は固定長のリングバッファ（array）に入るので、測っている間もメモリは増えない。
+# enabled が False のあいだは、どのメソッドも属性を1つ見てすぐ戻る。
+import csv
+import json
+import time
+from array import array
+
+PHASES = ("events", "update", "collide", "merge", "draw", "hud", "flip")
+EVENTS, UPDATE, COLLIDE, MERGE, DRAW, HUD, FLIP = range(len(PHASES))
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600):
+        self.enabled = False
+        self.visible = False
+        self.capacity = capacity
+        n = len(PHASES)
+        self.phase_times = array("d", bytes(8 * capacity * n))
+        self.frame_times = array("d", bytes(8 * capacity))
+        self.frame_starts = array("d", bytes(8 * capacity))
+        self.ball_counts = array("q", bytes(8 * capacity))
+        self.pair_counts = array("q", bytes(8 * capacity))
+        self.merge_counts = array("q", bytes(8 * capacity))
+        self.index = 0
+        self.count = 0
+        self.current = [0.0] * n
+        self.frame_start = 0.0
+        self.last = 0.0
+        # ゲームの累計カウンタ（前のフレームとの差を記録する）
+        self.last_pairs = 0
+        self.last_merges = 0
+
+    def toggle(self):
+        self.enabled = self.visible = not self.visible
+        if self.enabled:
+            self.count = 0
+            self.index = 0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame_start = self.last = now
+        current = self.current
+        for i in range(len(current)):
+            current[i] = 0.0
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self, balls, pairs_tested, merges):
+        if not self.enabled:
+            self.last_pairs = pairs_tested
+            self.last_merges = merges
+            return
+        i = self.index
+        n = len(PHASES)
+        base = i * n
+        current = self.current
+        for p in range(n):
+            self.phase_times[base + p] = current[p]
+        self.frame_times[i] = time.perf_counter() - self.frame_start
+        self.frame_starts[i] = self.frame_start
+        self.ball_counts[i] = balls
+        # リセットで累計が戻ったときは 0 とみなす
+        self.pair_counts[i] = max(0, pairs_tested - self.last_pairs)
+        self.merge_counts[i] = max(0, merges - self.last_merges)
+        self.last_pairs = pairs_tested
+        self.last_merges = merges
+        self.index = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    # 古い順にリングバッファの添字を返す
+    def _order(self):
+        start = (self.index - self.count) % self.capacity
+        return [(start + k) % self.capacity for k in range(self.count)]
+
+    def summary(self):
+        order = self._order()
+        if not order:
+            return None
+        frames = sorted(self.frame_times[i] for i in order)
+
+        def percentile(q):
+            return frames[min(len(frames) - 1, int(len(frames) * q))] * 1000
+
+        n = len(PHASES)
+        phases = {}
+        for p, name in enumerate(PHASES):
+            total = sum(self.phase_times[i * n + p] for i in order)
+            phases[name] = total / len(order) * 1000
+        # マージ数は処理時間ではなく実際の経過時間で割る
+        first, last = order[0], order[-1]
+        wall = self.frame_starts[last] + self.frame_times[last] - self.frame_starts[first]
+        return {
+            "frames": len(order),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "phases_ms": phases,
+            "balls": self.ball_counts[last],
+            "pairs": self.pair_counts[last],
+            "merges_per_sec": (
+                sum(self.merge_counts[i] for i in order) / wall if wall > 0 else 0
+            ),
+        }
+
+    def rows(self):
+        n = len(PHASES)
+        for i in self._order():
+            row = {"frame_ms": self.frame_times[i] * 1000}
+            for p, name in enumerate(PHASES):
+                row[name + "_ms"] = self.phase_times[i * n + p] * 1000
+            row["balls"] = self.ball_counts[i]
+            row["pairs"] = self.pair_counts[i]
+            row["merges"] = self.merge_counts[i]
+            yield row
+
+    def export_csv(self, path):
+        fields = ["frame_ms"] + [name + "_ms" for name in PHASES] + ["balls", "pairs", "merges"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "frames": list(self.rows())}, f, indent=1)
@@ -0,0 +1,200 @@
+# pymunk（Chipmunk2D）で物理演算を行うバックエンド
+#
+# ボールの積み重なりや眠らせる処理は Chipmunk の C のソルバーに任せ、Python では
+# マージするペアを集めるだけにする。衝突の種類（collision_type）をサイズラベルに
+# しておき、同じサイズ同士のハンドラだけを登録するので、Python のコールバックが
+# 呼ばれるのは同じサイズのボールが重なったときだけ。
+#
+# 重力・壁と床・反発係数・ボールの質量（半径に比例）は PythonBackend と同じにしてある。
+# アリーナの線分とピンは、Chipmunk の動かない Segment と Circle にする。
+# 積み重なり方や止まるまでの時間は少し違うが、落とせる場所・マージ・スコア・
+# ゲームオーバーの決まりは同じ。
+import math
+
+import pymunk
+
+from arena import DEFAULT_ARENA, Segment
+from ball_store import BallStore
+from physics import BALL_COLORS, GRAVITY, RESTITUTION, SLEEP_STEPS
+
+# 反発係数と摩擦は2つの図形の値の積になるので、どちらにも平方根を与える
+ELASTICITY = math.sqrt(RESTITUTION)
+SURFACE_FRICTION = math.sqrt(0.5)
+# 一番大きいサイズラベル
+MAX_SIZE = 10
+
+
+# Ball と同じ属性で pymunk の Body を見せる
+class PymunkBall:
+    def __init__(self, x, y, radius, size_label):
+        mass = radius / 10
+        self.body = pymunk.Body(mass, pymunk.moment_for_circle(mass, 0, radius))
+        self.body.position = x, y
+        self.shape = pymunk.Circle(self.body, radius)
+        self.shape.elasticity = ELASTICITY
+        self.shape.friction = SURFACE_FRICTION
+        self.shape.ball = self
+        self.radius = radius
+        self.size_label = size_label
+        # 描画の補間用に1ステップ前の状態を覚えておく
+        self.prev_x = x
+        self.prev_y = y
+        self.prev_angle = 0
+        # BallStore に入れると通し番号と位置が振られる
+        self.id = -1
+        self.slot = -1
+        self.alive = False
+
+    @property
+    def x(self):
+        return self.body.position.x
+
+    @property
+    def y(self):
+        return self.body.position.y
+
+    @property
+    def vx(self):
+        return self.body.velocity.x
+
+    @property
+    def vy(self):
+        return self.body.velocity.y
+
+    @property
+    def angle(self):
+        return self.body.angle
+
+    # 同じサイズ同士だけがマージのハンドラを呼ぶように、衝突の種類もそろえる
+    @property
+    def size_label(self):
+        return self.shape.collision_type
+
+    @size_label.setter
+    def size_label(self, value):
+        self.shape.collision_type = value
+
+    @property
+    def color(self):
+        return BALL_COLORS[(self.size_label - 1) % len(BALL_COLORS)]
+
+    @property
+    def sleeping(self):
+        return self.body.is_sleeping
+
+    def save_previous(self):
+        x, y = self.body.position
+        self.prev_x = x
+        self.prev_y = y
+        self.prev_angle = self.body.angle
+
+
+class PymunkBackend:
+    name = "pymunk"
+
+    def __init__(self, config, arena=DEFAULT_ARENA):
+        self.config = config
+        self.arena = arena
+        self.balls = BallStore()
+        # pymunk は候補ペアの数を教えてくれないので数えない
+        self.pairs_tested = 0
+        self.balls_to_merge = []
+        self.space = None
+        self.clear()
+
+    def clear(self):
+        # id も 0 から振り直す
+        self.balls.clear()
+        self.balls = BallStore()
+        self.balls_to_merge = []
+        space = pymunk.Space()
+        space.gravity = 0, GRAVITY
+        space.iterations = max(self.config.velocity_iterations, 10)
+        if self.config.allow_sleep:
+            space.sleep_time_threshold = SLEEP_STEPS * self.config.step
+        # 壁は十分高くまで伸ばしておく（PythonBackend の壁には高さの制限がない）
+        arena = self.arena
+        left, right, floor = arena.left, arena.right, arena.floor
+        top = -100 * arena.height
+        shapes = [
+            pymunk.Segment(space.static_body, a, b, 0)
+            for a, b in (
+                ((left, top), (left, floor)),
+                ((left, floor), (right, floor)),
+                ((right, floor), (right, top)),
+            )
+        ]
+        for collider in arena.colliders:
+            if isinstance(collider, Segment):
+                shapes.append(
+                    pymunk.Segment(
+                        space.static_body,
+                        (collider.x1, collider.y1),
+                        (collider.x2, collider.y2),
+                        collider.radius,
+                    )
+                )
+            else:
+                shapes.append(
+                    pymunk.Circle(
+                        space.static_body, collider.radius, (collider.x, collider.y)
+                    )
+                )
+        for shape in shapes:
+            shape.elasticity = ELASTICITY
+            shape.friction = SURFACE_FRICTION
+            space.add(shape)
+        for size_label in range(1, MAX_SIZE + 1):
+            space.on_collision(size_label, size_label, pre_solve=self._touch_same_size)
+        self.space = space
+
+    # 同じサイズのボールが重なっている間、毎ステップ呼ばれる
+    def _touch_same_size(self, arbiter, space, data):
+        shape1, shape2 = arbiter.shapes
+        self.balls_to_merge.append((shape1.ball, shape2.ball))
+
+    def add_ball(self, x, y, radius, size_label):
+        ball = PymunkBall(x, y, radius, size_label)
+        self.balls.append(ball)
+        self.space.add(ball.body, ball.shape)
+        return ball
+
+    # 取り除いたボールに乗っていたボールは Chipmunk が起こす
+    def remove_ball(self, ball):
+        self.balls.remove(ball)
+        self.space.remove(ball.body, ball.shape)
+
+    def overlaps(self, x, y, radius):
+        box = pymunk.BB(x - radius, y - radius, x + radius, y + radius)
+        for shape in self.space.bb_query(box, pymunk.ShapeFilter()):
+            ball = getattr(shape, "ball", None)
+            if ball is None:
+                continue
+            reach = radius + ball.radius
+            if (x - ball.x) ** 2 + (y - ball.y) ** 2 < reach * reach:
+                return True
+        return False
+
+    def save_previous(self):
+        for ball in self.balls:
+            if not ball.sleeping:
+                ball.save_previous()
+
+    # 重力・壁と床・ボール同士の接触をまとめて1ステップ進める
+    def integrate(self, dt):
+        self.balls_to_merge = []
+        self.space.step(dt)
+
+    # 接触は integrate で解決済みなので、集めたペアを返すだけ
+    def collide(self, dt):
+        balls_to_merge = self.balls_to_merge
+        self.balls_to_merge = []
+        return balls_to_merge
+
+    # 新しいボールに重なった眠っているボールは、次の step で Chipmunk が起こす
+    def merged(self, removed, spawned):
+        pass
+
+    # 眠らせるのは Chipmunk が行う
+    def update_sleep(self):
+        pass
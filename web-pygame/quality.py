@@ -0,0 +1,113 @@
+# 描画の品質を自動で下げ上げするガバナー
+#
+# 直近 window フレームの処理時間（clock.tick で待つ時間は含めない）の平均を見て、
+# 予算を超え続けていたら品質を1段下げ、十分に余裕がある状態が続いたら1段上げる。
+# 段を変えたあとは cooldown フレームのあいだ平均を取り直してから次を判断する
+# （上げるときは下げるときの2倍待つので、境目で行ったり来たりしない）。
+#
+#   FULL         すべて描く
+#   NO_LABELS    ボールのサイズの数字を描かない
+#   NO_OUTLINES  ボールの白い縁取りも描かない
+#   SLOW_HUD     ヘッダー（スコア・時間・次のボール）を hud_interval フレームごとに描き直す
+#   SKIP_FRAMES  物理演算は毎フレーム進めるが、描画は skip_interval フレームに1回にする
+# スプライトアトラスでは数字と縁取りが焼き込み済みで blit の手間は変わらないので、
+# NO_LABELS と NO_OUTLINES が効くのは図形で描くとき（use_sprite_atlas = False）だけ。
+# levels に効く段だけを渡すと（Renderer.quality_levels）、ほかの段は飛ばして上げ下げする。
+#
+# 段を変えるたびに changes に記録し、段ごとに過ごしたフレーム数を frames_at に数える。
+import time
+from collections import deque
+
+LEVELS = ("full", "no_labels", "no_outlines", "slow_hud", "skip_frames")
+FULL, NO_LABELS, NO_OUTLINES, SLOW_HUD, SKIP_FRAMES = range(len(LEVELS))
+ALL_LEVELS = tuple(range(len(LEVELS)))
+
+
+class QualityGovernor:
+    def __init__(
+        self,
+        budget_ms=1000 / 60,
+        window=30,
+        cooldown=60,
+        down_ratio=1.0,
+        up_ratio=0.6,
+        skip_interval=2,
+        levels=ALL_LEVELS,
+    ):
+        self.budget_ms = budget_ms
+        self.window = window
+        self.cooldown = cooldown
+        # 平均が予算 × down_ratio を超えたら下げ、予算 × up_ratio を下回ったら上げる
+        self.down_ratio = down_ratio
+        self.up_ratio = up_ratio
+        self.skip_interval = skip_interval
+        # 使う段（小さい順。最初の段から始める）
+        self.levels = tuple(sorted(levels))
+        self.index = 0
+        self.level = self.levels[0]
+        self.samples = deque(maxlen=window)
+        self.total = 0.0
+        self.since_change = 0
+        self.frame = 0
+        self.frames_at = [0] * len(LEVELS)
+        # (時刻, 前の段, 新しい段, そのときの平均 ms)
+        self.changes = []
+
+    @property
+    def average_ms(self):
+        if not self.samples:
+            return 0.0
+        return self.total / len(self.samples)
+
+    # このフレームを描くか（SKIP_FRAMES のときだけ間引く）
+    def should_render(self):
+        return self.level < SKIP_FRAMES or self.frame % self.skip_interval == 0
+
+    # 1フレームの処理時間を記録し、段が変わったら新しい段を返す（変わらなければ None）
+    def add(self, frame_ms):
+        self.frame += 1
+        self.frames_at[self.level] += 1
+        samples = self.samples
+        if len(samples) == samples.maxlen:
+            self.total -= samples[0]
+        samples.append(frame_ms)
+        self.total += frame_ms
+        self.since_change += 1
+        if len(samples) < self.window:
+            return None
+
+        average = self.total / len(samples)
+        if (
+            average > self.budget_ms * self.down_ratio
+            and self.index < len(self.levels) - 1
+            and self.since_change >= self.cooldown
+        ):
+            return self._change(self.index + 1, average)
+        if (
+            average < self.budget_ms * self.up_ratio
+            and self.index > 0
+            and self.since_change >= self.cooldown * 2
+        ):
+            return self._change(self.index - 1, average)
+        return None
+
+    def _change(self, index, average):
+        level = self.levels[index]
+        self.changes.append((time.time(), self.level, level, average))
+        self.index = index
+        self.level = level
+        self.samples.clear()
+        self.total = 0.0
+        self.since_change = 0
+        return level
+
+    def summary(self):
+        total = sum(self.frames_at) or 1
+        return {
+            "level": LEVELS[self.level],
+            "changes": len(self.changes),
+            # 段ごとに過ごしたフレームの割合
+            "time_at": {
+                name: frames / total for name, frames in zip(LEVELS, self.frames_at)
+            },
+        }
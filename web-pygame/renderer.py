@@ -0,0 +1,460 @@
+# ゲームの描画
+#
+# Game の状態を読んで画面に描くだけで、ゲームの状態は変更しない。
+# ディスプレイやフォントに触るのはこのモジュール（と text_cache / sprite_atlas）だけ。
+# アリーナ（ワールド）の座標は Camera で画面の座標にする。ヘッダーなどの UI は画面の座標のまま描く。
+import time
+
+import pygame
+
+from arena import DEFAULT_ARENA
+from camera import Camera
+from dirty_rects import DirtyRectRenderer
+from game import TIME_LIMIT
+from profiler import DRAW, FLIP, HUD, PHASES
+from quality import ALL_LEVELS, FULL, NO_LABELS, NO_OUTLINES, SKIP_FRAMES, SLOW_HUD
+from sprite_atlas import COLORKEY, MIN_LABEL_RADIUS, BallSpriteAtlas
+from text_cache import CachedText, texts
+
+# 次のボール表示用の色
+NEXT_BALL_COLORS = [
+    (255, 100, 100),
+    (100, 255, 100),
+    (100, 100, 255),
+    (255, 255, 100),
+    (255, 100, 255),
+]
+
+
+# 背景画像を作成（グラデーション）
+# 1px 幅の列に行ごとの色を置き、横に引き伸ばす（1行ずつ draw.line するより数倍速く、結果は同じ）。
+# 作った背景は大きさごとに覚えておく
+def create_background(width, height):
+    background = _backgrounds.get((width, height))
+    if background is None:
+        column = pygame.Surface((1, height))
+        for y in range(height):
+            color_ratio = y / height
+            r = int(135 + (176 - 135) * color_ratio)
+            g = int(206 + (224 - 206) * color_ratio)
+            b = int(235 + (230 - 235) * color_ratio)
+            column.set_at((0, y), (r, g, b))
+        background = pygame.transform.scale(column, (width, height))
+        _backgrounds[(width, height)] = background
+    return background.copy()
+
+
+_backgrounds = {}
+
+
+# 壁・床・角と、アリーナの線分・ピンを描いて、描いた矩形のリストを返す
+def draw_walls(surface, arena=DEFAULT_ARENA, camera=None):
+    if camera is None:
+        camera = Camera()
+    to_screen = camera.to_screen
+    left_top = to_screen(arena.left, arena.game_over_line)
+    left_bottom = to_screen(arena.left, arena.floor)
+    right_top = to_screen(arena.right, arena.game_over_line)
+    right_bottom = to_screen(arena.right, arena.floor)
+    wall = camera.length(20)
+    corner = camera.length(10)
+    rects = []
+
+    # 壁と床の描画
+    rects.append(pygame.draw.line(surface, (100, 20, 0), left_top, left_bottom, wall))  # 左の壁
+    rects.append(pygame.draw.line(surface, (100, 20, 0), right_top, right_bottom, wall))  # 右の壁
+    rects.append(pygame.draw.line(surface, (100, 20, 0), left_bottom, right_bottom, wall))  # 床
+
+    # 角の丸み
+    rects.append(pygame.draw.circle(surface, (100, 20, 0), left_bottom, corner))
+    rects.append(pygame.draw.circle(surface, (100, 20, 0), right_bottom, corner))
+    rects.append(pygame.draw.circle(surface, (95, 5, 0), left_top, corner))
+    rects.append(pygame.draw.circle(surface, (95, 5, 0), right_top, corner))
+
+    # 線分は両端を丸めて描く
+    for segment in arena.segments:
+        start = to_screen(segment.x1, segment.y1)
+        end = to_screen(segment.x2, segment.y2)
+        radius = camera.length(segment.radius)
+        line = pygame.draw.line(surface, (100, 20, 0), start, end, radius * 2)
+        line.union_ip(pygame.draw.circle(surface, (100, 20, 0), start, radius))
+        line.union_ip(pygame.draw.circle(surface, (100, 20, 0), end, radius))
+        rects.append(line)
+    for peg in arena.pegs:
+        rects.append(
+            pygame.draw.circle(
+                surface, (95, 5, 0), to_screen(peg.x, peg.y), camera.length(peg.radius)
+            )
+        )
+    return rects
+
+
+# 背景・壁・床・角と、アリーナの線分・ピンをまとめて描いた静的レイヤー（ボールを消すのに使う）
+def create_static_layer(background, arena=DEFAULT_ARENA, camera=None):
+    layer = background.copy()
+    draw_walls(layer, arena, camera)
+    if pygame.display.get_surface() is not None:
+        layer = layer.convert()
+    return layer
+
+
+# 壁などだけを描いた、残りは透明（カラーキー）のレイヤーと、壁などのある矩形のリスト。
+# ボールを描いたあとに重ねて、ボールが壁の上に出ないようにする（元の描き方と同じ順番）
+def create_wall_layer(size, arena=DEFAULT_ARENA, camera=None):
+    layer = pygame.Surface(size)
+    layer.fill(COLORKEY)
+    rects = draw_walls(layer, arena, camera)
+    if pygame.display.get_surface() is not None:
+        layer = layer.convert()
+    layer.set_colorkey(COLORKEY, pygame.RLEACCEL)
+    return layer, rects
+
+
+# サイズラベルの文字（ボールごと・フレームごとに str を作らないように、サイズごとに覚えておく）
+_label_strings = {}
+
+
+def label_string(size_label):
+    text = _label_strings.get(size_label)
+    if text is None:
+        text = _label_strings[size_label] = str(size_label)
+    return text
+
+
+# スプライトアトラスを使わないときのボールの描画
+def draw_ball(screen, ball, alpha=1.0, outline=True, label=True):
+    # 前のステップと今のステップの間を補間した位置に描く
+    x = int(ball.prev_x + (ball.x - ball.prev_x) * alpha)
+    y = int(ball.prev_y + (ball.y - ball.prev_y) * alpha)
+
+    # ボールを描画
+    rect = pygame.draw.circle(screen, ball.color, (x, y), ball.radius)
+    if outline:
+        pygame.draw.circle(screen, (255, 255, 255), (x, y), ball.radius, 2)
+
+    # サイズラベルを描画
+    if label:
+        text = texts.render(label_string(ball.size_label), int(ball.radius // 2))
+        text_rect = text.get_rect(center=(x, y))
+        screen.blit(text, text_rect)
+    return rect
+
+
+# カメラで縮小・拡大して描く（スプライトアトラスを使わないとき）
+def draw_ball_scaled(screen, ball, camera, alpha=1.0, outline=True, label=True):
+    x, y = camera.to_screen(
+        ball.prev_x + (ball.x - ball.prev_x) * alpha,
+        ball.prev_y + (ball.y - ball.prev_y) * alpha,
+    )
+    x = int(x)
+    y = int(y)
+    radius = camera.length(ball.radius)
+    rect = pygame.draw.circle(screen, ball.color, (x, y), radius)
+    if outline:
+        pygame.draw.circle(screen, (255, 255, 255), (x, y), radius, 2)
+    if label and radius >= MIN_LABEL_RADIUS:
+        text = texts.render(label_string(ball.size_label), radius // 2)
+        screen.blit(text, text.get_rect(center=(x, y)))
+    return rect
+
+
+class Renderer:
+    def __init__(
+        self,
+        screen,
+        use_sprite_atlas=True,
+        assets=None,
+        use_dirty_rects=False,
+        arena=DEFAULT_ARENA,
+    ):
+        self.screen = screen
+        self.width, self.height = screen.get_size()
+        width, height = self.width, self.height
+
+        # ワールド全体が画面に収まるように縮小する（元の箱なら縮小しない）
+        self.arena = arena
+        self.camera = Camera.fit(arena, (width, height))
+
+        self.background_image = create_background(width, height)
+        self.static_layer = create_static_layer(self.background_image, arena, self.camera)
+        self.wall_layer, self.wall_rects = create_wall_layer((width, height), arena, self.camera)
+
+        # 画面の上部の暗い矩形
+        self.header_band = pygame.Surface((width, 75), pygame.SRCALPHA)
+        self.header_band.fill((0, 0, 0, 128))
+        # 次のボールが少しはみ出すので 75px より広めに取る
+        self.header_rect = pygame.Rect(0, 0, width, 90)
+
+        # ゲームオーバー時に画面を暗くする半透明の黒
+        self.game_over_overlay = pygame.Surface((width, height))
+        self.game_over_overlay.set_alpha(180)
+        self.game_over_overlay.fill((0, 0, 0))
+
+        self.retry_button_rect = pygame.Rect(width // 2 - 100, height // 2 + 100, 200, 60)
+
+        # 描画の品質（quality.py の段）。SLOW_HUD 以上ではヘッダーを hud_surface に描いておき、
+        # hud_interval フレームごとに描き直す
+        self.quality = FULL
+        self.hud_interval = 6
+        self.hud_surface = pygame.Surface((width, self.header_rect.height), pygame.SRCALPHA)
+        self.hud_age = None
+
+        # HUD のテキストは値が変わったときだけ描き直す
+        self.score_label = CachedText(texts, "SCORE: {}", 36)
+        self.time_label = CachedText(texts, "Time: {}", 36, shared=False)
+        self.final_score_label = CachedText(texts, "Score: {}", 54)
+
+        # ボールのサイズラベル（1〜10）は先に描いておく
+        for size_label in range(1, 11):
+            texts.render(label_string(size_label), size_label * 10 // 2)
+
+        self.atlas = None
+        self.dirty_renderer = None
+        # QualityGovernor に渡す、この描き方で効く品質の段
+        self.quality_levels = ALL_LEVELS
+        if use_sprite_atlas:
+            self.atlas = BallSpriteAtlas(
+                rotation_steps=64, assets=assets, scale=self.camera.scale
+            )
+            self.atlas.build()
+            # スプライトには数字と縁取りが焼き込んであるので、NO_LABELS と NO_OUTLINES は効かない
+            self.quality_levels = (FULL, SLOW_HUD, SKIP_FRAMES)
+            # ダーティ矩形はワールドの座標のまま描くので、縮小しないときだけ使う
+            if use_dirty_rects and self.camera.identity:
+                self.dirty_renderer = DirtyRectRenderer(
+                    self.static_layer, self.atlas, self.header_rect, self.wall_layer
+                )
+
+        # ヒントエンジンが勧める x（None なら描かない）
+        self.hint_x = None
+
+        # ダーティ矩形モードで画面全体を描き直す必要があるか
+        self.full_redraw = True
+        self.last_hud = None
+        # ダーティ矩形モードでヘッダーを描き直すコールバック（毎フレーム作らないように1回だけ作る）。
+        # 描くゲームは header_game に入れておく
+        self.header_game = None
+        self.header_callback = self.draw_current_header
+
+        # FrameProfiler を入れると描画のフェーズを記録し、visible ならオーバーレイを出す
+        self.profiler = None
+        self.profiler_panel = pygame.Surface((185, 215), pygame.SRCALPHA)
+        self.profiler_panel.fill((0, 0, 0, 160))
+        self.profiler_lines = []
+        self.profiler_refreshed = 0.0
+
+    # ヘッダー（スコア・次のボール・時間）の描画
+    def draw_header(self, game, screen=None):
+        if screen is None:
+            screen = self.screen
+        width = self.width
+        screen.blit(self.header_band, (0, 0))
+
+        # 次のボールを表示
+        next_ball_type = game.next_ball_type
+        next_ball_radius = next_ball_type * 10
+        next_ball_color = NEXT_BALL_COLORS[
+            (next_ball_type - 1) % len(NEXT_BALL_COLORS)
+        ]
+        pygame.draw.circle(screen, next_ball_color, (width - 90, 37), next_ball_radius)
+        pygame.draw.circle(
+            screen, (255, 255, 255), (width - 90, 37), next_ball_radius, 2
+        )
+
+        # 画面の指定された位置にスコアを表示
+        screen.blit(self.score_label.render(game.score), (50, 25))
+
+        screen.blit(texts.render("NEXT: ", 36), (width - 168, 10))
+
+        seconds = int(game.elapsed)
+        screen.blit(self.time_label.render(TIME_LIMIT - seconds), (width - 200, 50))
+
+    def draw_current_header(self):
+        self.draw_header(self.header_game)
+
+    # SLOW_HUD 以上では、描いておいたヘッダーをそのまま使う
+    def draw_slow_header(self, game):
+        if self.hud_age is None or self.hud_age >= self.hud_interval:
+            self.hud_surface.fill((0, 0, 0, 0))
+            self.draw_header(game, self.hud_surface)
+            self.hud_age = 0
+        self.hud_age += 1
+        self.screen.blit(self.hud_surface, (0, 0))
+
+    # 再挑戦ボタンの描画
+    def draw_retry_button(self):
+        screen = self.screen
+        rect = self.retry_button_rect
+
+        # ボタンの背景
+        pygame.draw.rect(screen, (80, 80, 80), rect)
+        pygame.draw.rect(screen, (255, 255, 255), rect, 3)
+
+        # ボタンのテキスト
+        retry_text = texts.render("RETRY", 36)
+        screen.blit(retry_text, retry_text.get_rect(center=rect.center))
+
+    def draw_game_over(self, game):
+        screen = self.screen
+        width, height = self.width, self.height
+        screen.blit(self.background_image, (0, 0))
+
+        # 半透明の黒で画面を暗くします
+        screen.blit(self.game_over_overlay, (0, 0))
+
+        gameover_text = texts.render("Game Over", 54)
+        gameover_pos = gameover_text.get_rect(center=(width / 2, height / 2 - 40))
+        screen.blit(gameover_text, gameover_pos)
+
+        score_text = self.final_score_label.render(game.score)
+        score_pos = score_text.get_rect(center=(width / 2, height / 2 + 40))
+        screen.blit(score_text, score_pos)
+
+        # 再挑戦ボタンを描画
+        self.draw_retry_button()
+
+    # プロファイラの結果を左側の余白に表示する（文字の描き直しは 0.25 秒ごと）
+    def draw_profiler_overlay(self):
+        profiler = self.profiler
+        now = time.perf_counter()
+        if now - self.profiler_refreshed > 0.25:
+            self.profiler_refreshed = now
+            summary = profiler.summary()
+            if summary is None:
+                lines = ["profiling..."]
+            else:
+                lines = [
+                    f"frame p50 {summary['p50_ms']:.2f} ms",
+                    f"p95 {summary['p95_ms']:.2f}  p99 {summary['p99_ms']:.2f}",
+                    f"balls {summary['balls']}  pairs {summary['pairs']}",
+                    f"merges/s {summary['merges_per_sec']:.1f}",
+                ]
+                for name in PHASES:
+                    lines.append(f"{name:8s} {summary['phases_ms'][name]:.3f} ms")
+            self.profiler_lines = [texts.render(line, 16) for line in lines]
+
+        screen = self.screen
+        screen.blit(self.profiler_panel, (5, 100))
+        y = 105
+        for line in self.profiler_lines:
+            screen.blit(line, (10, y))
+            y += line.get_height()
+
+    # 勧める位置に、落とす高さから床までの縦線を引く
+    def draw_hint(self):
+        arena = self.arena
+        x = int(self.hint_x)
+        top = self.camera.to_screen(x, arena.game_over_line)
+        bottom = self.camera.to_screen(x, arena.floor)
+        pygame.draw.line(self.screen, (255, 255, 255), top, bottom, 2)
+
+    def draw_walls(self):
+        screen = self.screen
+        wall_layer = self.wall_layer
+        for rect in self.wall_rects:
+            screen.blit(wall_layer, rect, rect)
+
+    def draw_balls(self, balls, alpha):
+        screen = self.screen
+        atlas = self.atlas
+        if not self.camera.identity:
+            self.draw_balls_scaled(balls, alpha)
+        elif atlas is not None:
+            for ball in balls:
+                atlas.draw(screen, ball, alpha)
+        else:
+            quality = self.quality
+            outline = quality < NO_OUTLINES
+            label = quality < NO_LABELS
+            for ball in balls:
+                draw_ball(screen, ball, alpha, outline, label)
+
+    # カメラで縮小・拡大した位置に描く（スプライトは縮小した大きさで焼き込んである）
+    def draw_balls_scaled(self, balls, alpha):
+        screen = self.screen
+        camera = self.camera
+        atlas = self.atlas
+        if atlas is None:
+            quality = self.quality
+            outline = quality < NO_OUTLINES
+            label = quality < NO_LABELS
+            for ball in balls:
+                draw_ball_scaled(screen, ball, camera, alpha, outline, label)
+            return
+        scale = camera.scale
+        offset_x = camera.offset_x
+        offset_y = camera.offset_y
+        dest = atlas.dest
+        for ball in balls:
+            prev_x = ball.prev_x
+            prev_y = ball.prev_y
+            prev_angle = ball.prev_angle
+            sprite = atlas.get(ball.size_label, prev_angle + (ball.angle - prev_angle) * alpha)
+            half = sprite.get_width() // 2
+            dest.x = int((prev_x + (ball.x - prev_x) * alpha) * scale + offset_x) - half
+            dest.y = int((prev_y + (ball.y - prev_y) * alpha) * scale + offset_y) - half
+            screen.blit(sprite, dest)
+
+    # 1フレーム分を描いて画面に反映する
+    def draw(self, game, alpha=1.0):
+        screen = self.screen
+        dirty_renderer = self.dirty_renderer
+        profiler = self.profiler
+        overlay = profiler is not None and profiler.visible
+        # プロファイラが無効なときに mark を呼ばないためのダミー
+        mark = profiler.mark if profiler is not None else _no_mark
+
+        if game.game_over:
+            self.draw_game_over(game)
+            mark(DRAW)
+            if overlay:
+                self.draw_profiler_overlay()
+                mark(HUD)
+            pygame.display.flip()
+            mark(FLIP)
+            self.full_redraw = True
+        elif (
+            dirty_renderer is not None
+            and not self.full_redraw
+            and not overlay
+            and self.hint_x is None
+        ):
+            # 動いたボールと変化したヘッダーの部分だけを更新する
+            hud = (game.score, int(game.elapsed), game.next_ball_type)
+            self.header_game = game
+            rects = dirty_renderer.draw(
+                screen, game.balls, alpha, hud != self.last_hud, self.header_callback
+            )
+            self.last_hud = hud
+            mark(DRAW)
+            pygame.display.update(rects)
+            mark(FLIP)
+        else:
+            screen.blit(self.static_layer, (0, 0))
+
+            # ボールの描画（ステップ間を補間する）。壁はボールの上に重ねる
+            self.draw_balls(game.balls, alpha)
+            self.draw_walls()
+            if self.hint_x is not None:
+                self.draw_hint()
+            mark(DRAW)
+
+            if self.quality >= SLOW_HUD:
+                self.draw_slow_header(game)
+            else:
+                self.draw_header(game)
+            if overlay:
+                self.draw_profiler_overlay()
+            mark(HUD)
+
+            pygame.display.flip()
+            mark(FLIP)
+            if dirty_renderer is not None:
+                # 次のフレームからは差分だけを描く（オーバーレイやヒントを消すために1回は全体を描く）
+                dirty_renderer.remember(game.balls, alpha)
+                self.last_hud = (game.score, int(game.elapsed), game.next_ball_type)
+                self.full_redraw = overlay or self.hint_x is not None
+
+
+def _no_mark(phase):
+    pass
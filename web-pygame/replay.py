@@ -0,0 +1,225 @@
+# 入力だけを記録するリプレイ
+#
+# ゲームの結果を決めるのは、シード（次のボールの種類を選ぶ乱数）と設定と
+# 「何ステップ目にどこへ落としたか」だけなので、それだけを保存しておけば
+# 画面なしで同じゲームを最後まで再現できる。最後の状態のチェックサムも
+# 保存しておくので、スコアが本物かどうかを確かめるのにも使える。
+#
+#   python replay.py verify replay.jgr    # 再現して、スコアとチェックサムを確かめる
+#   python replay.py info replay.jgr
+#
+# ファイルの中身（リトルエンディアン）
+#   "JGRP"、バージョン (B)、シード (Q)、設定の JSON の長さ (H)、設定の JSON
+#   落とした回数 (I)、1回ごとに (ステップ I, x d, y d)
+#   最後のステップ (I)、スコア (I)、ゲームオーバーか (B)、チェックサム (32 バイト)
+# 位置は Game.drop に渡したままの float64 で保存する（記録してもしなくても同じゲームになる）。
+# バージョン 1 のファイルは float32 で保存していた（記録するときも float32 に丸めて落としていた）ので、
+# 読むときはそのまま float32 として読む。
+import argparse
+import dataclasses
+import hashlib
+import json
+import struct
+import sys
+import time
+
+from game import Game, GameConfig
+
+MAGIC = b"JGRP"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sBQH")
+_COUNT = struct.Struct("<I")
+_DROP = struct.Struct("<Idd")
+# バージョン -> 落とした1回分の形式
+_DROPS = {1: struct.Struct("<Iff"), 2: _DROP}
+_FOOTER = struct.Struct("<IIB32s")
+
+
+class ReplayError(Exception):
+    pass
+
+
+# スコア・ステップ数と、全ボールの id・サイズ・位置・速度から作るハッシュ
+def state_checksum(game):
+    h = hashlib.sha256()
+    h.update(struct.pack("<IIB", game.steps, game.score, game.game_over))
+    for ball in sorted(game.balls, key=_ball_id):
+        h.update(
+            struct.pack(
+                "<qqdddd", ball.id, ball.size_label, ball.x, ball.y, ball.vx, ball.vy
+            )
+        )
+    return h.digest()
+
+
+def _ball_id(ball):
+    return ball.id
+
+
+class Replay:
+    def __init__(self, seed, config, drops=None):
+        self.seed = seed
+        self.config = config
+        # (ステップ, x, y) のリスト
+        self.drops = drops if drops is not None else []
+        self.final_step = 0
+        self.score = 0
+        self.game_over = False
+        self.checksum = bytes(32)
+
+    def to_bytes(self):
+        config = json.dumps(dataclasses.asdict(self.config), sort_keys=True).encode()
+        parts = [
+            _HEADER.pack(MAGIC, VERSION, self.seed, len(config)),
+            config,
+            _COUNT.pack(len(self.drops)),
+        ]
+        parts.extend(_DROP.pack(step, x, y) for step, x, y in self.drops)
+        parts.append(
+            _FOOTER.pack(self.final_step, self.score, self.game_over, self.checksum)
+        )
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        try:
+            magic, version, seed, config_size = _HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                raise ReplayError("not a replay file")
+            if version not in _DROPS:
+                raise ReplayError(f"unsupported replay version {version}")
+            drop_format = _DROPS[version]
+            offset = _HEADER.size
+            values = json.loads(data[offset : offset + config_size])
+            offset += config_size
+            # 以前は use_numpy_world で NumPy の BallWorld を選んでいた
+            if values.pop("use_numpy_world", False):
+                values.setdefault("backend", "numpy")
+            # continuous_collision より前のリプレイは、連続衝突判定なしで記録されている
+            values.setdefault("continuous_collision", False)
+            # 知らない設定の項目は無視する
+            fields = {field.name for field in dataclasses.fields(GameConfig)}
+            config = GameConfig(**{k: v for k, v in values.items() if k in fields})
+
+            (count,) = _COUNT.unpack_from(data, offset)
+            offset += _COUNT.size
+            size = count * drop_format.size
+            drops = list(drop_format.iter_unpack(data[offset : offset + size]))
+            offset += size
+            final_step, score, game_over, checksum = _FOOTER.unpack_from(data, offset)
+        except (struct.error, ValueError) as e:
+            raise ReplayError(f"broken replay: {e}") from e
+
+        replay = cls(seed, config, drops)
+        replay.final_step = final_step
+        replay.score = score
+        replay.game_over = bool(game_over)
+        replay.checksum = checksum
+        return replay
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+# Game の drop を横取りして、落とせたものだけを記録する
+class ReplayRecorder:
+    def __init__(self, game):
+        if game.seed is None:
+            raise ValueError("a replay needs a game with an explicit seed")
+        self.game = game
+        self.replay = Replay(game.seed, dataclasses.replace(game.config))
+
+    def drop(self, x, y=None):
+        game = self.game
+        if y is None:
+            y = game.drop_y
+        step = game.steps
+        ball = game.drop(x, y=y)
+        if ball is not None:
+            self.replay.drops.append((step, x, y))
+        return ball
+
+    # 今の状態を最後の状態として書き込んだリプレイを返す
+    def finish(self):
+        game = self.game
+        replay = self.replay
+        replay.final_step = game.steps
+        replay.score = game.score
+        replay.game_over = game.game_over
+        replay.checksum = state_checksum(game)
+        return replay
+
+
+# 画面なしで最初から再現した Game を返す
+def play(replay):
+    game = Game(replay.seed, dataclasses.replace(replay.config))
+    for step, x, y in replay.drops:
+        if step < game.steps:
+            raise ReplayError(f"drop at step {step} is out of order")
+        game.step(step - game.steps)
+        if game.drop(x, y=y) is None:
+            raise ReplayError(f"drop at step {step} could not be placed")
+    game.step(replay.final_step - game.steps)
+    return game
+
+
+# 再現した結果が記録と一致するか確かめて、(一致したか, 再現した Game) を返す
+def verify(replay):
+    game = play(replay)
+    ok = (
+        game.steps == replay.final_step
+        and game.score == replay.score
+        and game.game_over == replay.game_over
+        and state_checksum(game) == replay.checksum
+    )
+    return ok, game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="リプレイの再現と確認")
+    parser.add_argument("command", choices=["verify", "info"])
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.paths:
+        try:
+            replay = Replay.load(path)
+        except (OSError, ReplayError) as e:
+            print(f"{path}: {e}")
+            failed = True
+            continue
+        if args.command == "info":
+            print(
+                f"{path}: seed {replay.seed}, {len(replay.drops)} drops,"
+                f" {replay.final_step} steps, score {replay.score},"
+                f" game over {replay.game_over}"
+            )
+            continue
+
+        t0 = time.perf_counter()
+        try:
+            ok, game = verify(replay)
+        except ReplayError as e:
+            print(f"{path}: FAILED ({e})")
+            failed = True
+            continue
+        elapsed = time.perf_counter() - t0
+        status = "ok" if ok else "MISMATCH"
+        print(
+            f"{path}: {status} score {game.score} (recorded {replay.score}),"
+            f" {game.steps} steps in {elapsed * 1000:.0f} ms"
+        )
+        failed = failed or not ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# 物理演算を別スレッドで進めて、描画と重ねるパイプライン（デスクトップ向け）
+#
+#   sim = SimulationThread(game, apply_drop)
+#   sim.drop(x, y)              # クリックした位置はキューに入れる（落とすのはシミュレーションのスレッド）
+#   sim.start(steps, alpha)     # 次のステップを計算し始める
+#   renderer.draw(sim.front, sim.front.alpha)   # そのあいだに、できあがっている前のフレームを描く
+#   sim.wait()                  # 計算が終わるのを待って、前と後ろのバッファを入れ替える
+#
+# start から wait までのあいだ Game（とバックエンドのボール）を触るのはシミュレーションのスレッドだけで、
+# それ以外のときはメインスレッドだけが触る（リトライ・一手戻す・ヒント・自動保存はそのときに行う）。
+# 描画には FrameState（Renderer が読むゲームの値とボールの位置の写し）を渡す。FrameState は2つを
+# 交互に使い、ボールの写しも使い回すので、フレームごとにオブジェクトを作らない。
+# 画面に出るのは1フレーム前の状態になる。
+# 入力のキューは collections.deque（append と popleft はそれだけでスレッドセーフ）なのでロックを取らない。
+# スレッドが使えない環境（pygbag）では使わない。
+import threading
+from collections import deque
+
+
+# 描画に使うボールの値の写し
+class BallState:
+    __slots__ = (
+        "id",
+        "x",
+        "y",
+        "prev_x",
+        "prev_y",
+        "angle",
+        "prev_angle",
+        "radius",
+        "size_label",
+        "color",
+    )
+
+
+# Renderer が読むゲームの値（Game と同じ名前）とボールの写し
+class FrameState:
+    def __init__(self):
+        self.score = 0
+        self.elapsed = 0.0
+        self.next_ball_type = 1
+        self.game_over = False
+        self.balls = []
+        # 描くときの補間の割合と、このフレームで落とせたボールの数
+        self.alpha = 1.0
+        self.drops = 0
+        # 使い回す BallState（足りなくなったときだけ増やす）
+        self.pool = []
+
+    def capture(self, game, alpha=1.0, drops=0):
+        self.score = game.score
+        self.elapsed = game.elapsed
+        self.next_ball_type = game.next_ball_type
+        self.game_over = game.game_over
+        self.alpha = alpha
+        self.drops = drops
+        balls = self.balls
+        balls.clear()
+        pool = self.pool
+        n = 0
+        for ball in game.balls:
+            if n == len(pool):
+                pool.append(BallState())
+            state = pool[n]
+            n += 1
+            state.id = ball.id
+            state.x = ball.x
+            state.y = ball.y
+            state.prev_x = ball.prev_x
+            state.prev_y = ball.prev_y
+            state.angle = ball.angle
+            state.prev_angle = ball.prev_angle
+            state.radius = ball.radius
+            state.size_label = ball.size_label
+            state.color = ball.color
+            balls.append(state)
+
+
+class SimulationThread:
+    # apply_drop(x, y) はシミュレーションのスレッドから呼ばれ、落としたボール（落とせなければ None）を返す
+    def __init__(self, game, apply_drop):
+        self.game = game
+        self.apply_drop = apply_drop
+        self.drops = deque()
+        self.front = FrameState()
+        self.back = FrameState()
+        self.front.capture(game)
+        self.steps = 0
+        self.alpha = 1.0
+        self.running = False
+        self.closed = False
+        self.error = None
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def drop(self, x, y):
+        self.drops.append((x, y))
+
+    # キューにたまった分を落としてから steps ステップ進める
+    def start(self, steps, alpha):
+        self.steps = steps
+        self.alpha = alpha
+        self.running = True
+        self.started.set()
+
+    def wait(self):
+        if not self.running:
+            return
+        self.done.wait()
+        self.done.clear()
+        self.running = False
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+        self.front, self.back = self.back, self.front
+
+    # メインスレッドがゲームを変えたとき（リトライ・一手戻す）に、描くものをすぐに差し替える
+    def publish(self):
+        self.wait()
+        self.drops.clear()
+        self.front.capture(self.game)
+
+    def close(self):
+        self.wait()
+        self.closed = True
+        self.started.set()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            self.started.wait()
+            self.started.clear()
+            if self.closed:
+                return
+            try:
+                self._advance()
+            except BaseException as e:
+                self.error = e
+            self.done.set()
+
+    def _advance(self):
+        game = self.game
+        drops = self.drops
+        dropped = 0
+        while drops:
+            x, y = drops.popleft()
+            if self.apply_drop(x, y) is not None:
+                dropped += 1
+        game.step(self.steps)
+        self.back.capture(game, self.alpha, dropped)
@@ -0,0 +1,252 @@
+# ゲームの状態のスナップショット（保存と復元）
+#
+# スコアなどのゲームの値・乱数の状態・ボール・接触ソルバーの力積をまとめて1つの
+# バイト列にする。ボールは1個あたり固定長のレコードで、ストアに入っている順に並べる。
+# 眠っているボールは眠った順も保存するので、復元したあとに step を続けると
+# 保存しなかった場合とまったく同じ結果になる。
+# 復元するときは、同じ id のボールがあればその Ball を書き換えて使う（一手戻すときはほとんどが使い回せる）。
+# アリーナのレベル（GameConfig.level）も保存し、違うアリーナのゲームには復元しない。
+# 今のところ "python" バックエンドだけに対応している。
+#
+# ファイルの中身（リトルエンディアン）
+#   "JGSN"、バージョン (B)、フラグ (B)、シード (Q)、ステップ (I)、スコア (I)、マージ数 (I)、
+#   一番大きいサイズ (B)、次のボール (B)、次の id (I)、ボールの数 (I)、眠っているボールの数 (I)、
+#   力積の数 (I)、gauss_next (d)、レベルの長さ (H)
+#   レベル（UTF-8）
+#   乱数の状態 (I × 625)
+#   ボール (_BALL × ボールの数)、眠った順の id (i × 眠っているボールの数)、力積 (_IMPULSE × 力積の数)
+import os
+import struct
+import threading
+from array import array
+from operator import attrgetter
+
+from physics_backend import BALL_FIELDS, PythonBackend
+
+MAGIC = b"JGSN"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sBBQIIIBBIIIIdH")
+# id, 半径, サイズ, 眠っているか, 止まっているステップ数, 位置・速度・角度など11個
+_BALL = struct.Struct("<iHB?I11d")
+# (小さい id, 大きい id または壁と床の番号, 力積)
+_IMPULSE = struct.Struct("<iid")
+_RNG_WORDS = 625
+
+HAS_SEED = 1
+GAME_OVER = 2
+HAS_GAUSS = 4
+
+_ball_fields = attrgetter(*BALL_FIELDS)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def save(game):
+    backend = game.backend
+    if not isinstance(backend, PythonBackend):
+        raise SnapshotError(f"snapshots are not supported by the {backend.name} backend")
+    balls, sleep_order, impulses, next_id = backend.save_state()
+
+    _, rng_state, gauss_next = game.rng.getstate()
+    flags = 0
+    if game.seed is not None:
+        flags |= HAS_SEED
+    if game.game_over:
+        flags |= GAME_OVER
+    if gauss_next is not None:
+        flags |= HAS_GAUSS
+
+    level = game.config.level.encode()
+    size = (
+        _HEADER.size
+        + len(level)
+        + _RNG_WORDS * 4
+        + len(balls) * _BALL.size
+        + len(sleep_order) * 4
+        + len(impulses) * _IMPULSE.size
+    )
+    data = bytearray(size)
+    _HEADER.pack_into(
+        data,
+        0,
+        MAGIC,
+        VERSION,
+        flags,
+        game.seed or 0,
+        game.steps,
+        game.score,
+        game.merges,
+        game.max_size,
+        game.next_ball_type,
+        next_id,
+        len(balls),
+        len(sleep_order),
+        len(impulses),
+        gauss_next or 0.0,
+        len(level),
+    )
+    offset = _HEADER.size
+    data[offset : offset + len(level)] = level
+    offset += len(level)
+    data[offset : offset + _RNG_WORDS * 4] = array("I", rng_state).tobytes()
+    offset += _RNG_WORDS * 4
+
+    pack_ball = _BALL.pack_into
+    for ball in balls:
+        pack_ball(data, offset, *_ball_fields(ball))
+        offset += _BALL.size
+    data[offset : offset + len(sleep_order) * 4] = array("i", sleep_order).tobytes()
+    offset += len(sleep_order) * 4
+    pack_impulse = _IMPULSE.pack_into
+    for (id1, id2), impulse in impulses.items():
+        pack_impulse(data, offset, id1, id2, impulse)
+        offset += _IMPULSE.size
+    return bytes(data)
+
+
+def restore(game, data):
+    backend = game.backend
+    if not isinstance(backend, PythonBackend):
+        raise SnapshotError(f"snapshots are not supported by the {backend.name} backend")
+    try:
+        (
+            magic,
+            version,
+            flags,
+            seed,
+            steps,
+            score,
+            merges,
+            max_size,
+            next_ball_type,
+            next_id,
+            ball_count,
+            sleeping_count,
+            impulse_count,
+            gauss_next,
+            level_size,
+        ) = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise SnapshotError("not a snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"unsupported snapshot version {version}")
+        offset = _HEADER.size
+        level = bytes(data[offset : offset + level_size]).decode()
+        offset += level_size
+        if level != game.config.level:
+            raise SnapshotError(
+                f"snapshot is for level {level or 'box'!r}, not {game.config.level or 'box'!r}"
+            )
+        rng_state = array("I", data[offset : offset + _RNG_WORDS * 4])
+        offset += _RNG_WORDS * 4
+        end = offset + ball_count * _BALL.size
+        records = _BALL.iter_unpack(data[offset:end])
+        offset = end
+        end = offset + sleeping_count * 4
+        sleep_order = array("i", data[offset:end])
+        offset = end
+        end = offset + impulse_count * _IMPULSE.size
+        impulses = {
+            (id1, id2): impulse for id1, id2, impulse in _IMPULSE.iter_unpack(data[offset:end])
+        }
+        if len(rng_state) != _RNG_WORDS or end > len(data):
+            raise SnapshotError("truncated snapshot")
+    except (struct.error, ValueError) as e:
+        raise SnapshotError(f"broken snapshot: {e}") from e
+
+    game.rng.setstate((3, tuple(rng_state), gauss_next if flags & HAS_GAUSS else None))
+    game.seed = seed if flags & HAS_SEED else None
+    game.steps = steps
+    game.score = score
+    game.merges = merges
+    game.max_size = max_size
+    game.next_ball_type = next_ball_type
+    game.game_over = bool(flags & GAME_OVER)
+    backend.load_state(records, sleep_order, impulses, next_id)
+    game.balls = backend.balls
+
+
+# 一定のステップごとにスナップショットを取り、ファイルへの書き込みは別スレッドで行う
+# （スナップショットを取るのはメインスレッドなので、ゲームの状態を同時に触ることはない）。
+# 書き込みが追いつかないときは、まだ書いていない古いものを捨てて新しいものだけを書く。
+# スレッドが使えない環境（pygbag）ではその場で書く。
+class Autosaver:
+    def __init__(self, path, interval_steps=120, use_thread=True):
+        self.path = path
+        self.interval_steps = interval_steps
+        self.last_step = None
+        self.pending = None
+        self.saves = 0
+        self.condition = threading.Condition()
+        # 書き込みと削除を同時に行わない
+        self.write_lock = threading.Lock()
+        self.thread = None
+        if use_thread:
+            try:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            except RuntimeError:
+                self.thread = None
+
+    # 前回から interval_steps 以上進んでいたらスナップショットを取る
+    def update(self, game):
+        if game.game_over:
+            return False
+        if self.last_step is not None and game.steps - self.last_step < self.interval_steps:
+            return False
+        self.last_step = game.steps
+        data = save(game)
+        if self.thread is None:
+            self._write(data)
+            return True
+        with self.condition:
+            self.pending = data
+            self.condition.notify()
+        return True
+
+    # ゲームオーバーやリトライのあとは、古いゲームから再開しないように消す
+    def discard(self):
+        with self.condition:
+            self.pending = None
+        self.last_step = None
+        with self.write_lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+            with self.write_lock:
+                # discard で取り消されていたら書かない
+                with self.condition:
+                    data = self.pending
+                    self.pending = None
+                if data is not None:
+                    self._write(data)
+
+    def _write(self, data):
+        # 書きかけのファイルを残さないように、別名で書いてから置き換える
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+            self.saves += 1
+        except OSError:
+            pass
+
+
+# 保存してあれば中身を返す（なければ None）
+def load_file(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
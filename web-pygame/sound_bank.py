@@ -0,0 +1,103 @@
+# 効果音をまとめて鳴らすサウンドバンク
+#
+#   bank = SoundBank(assets)
+#   bank.request("merge", 3)   # このフレームでマージが3回あった
+#   bank.flush()               # フレームの最後に1回呼ぶ
+#
+# 連鎖でマージが一度にたくさん起きても Sound.play を何十回も呼ばないように、
+#   - 同じフレームに頼まれた同じ音は1回にまとめ、回数が多いほど音量を上げる
+#   - 音ごとに最短の間隔（min_interval_ms）を決め、それより短い間隔では鳴らさない
+#     （鳴らせなかった回数は次に鳴らすときの音量に足す）
+#   - 決まった数のチャンネルだけを使い、空きがなければ一番前に鳴らしたチャンネルを止めて使う
+# ので、同時に鳴る音の数（ミキサーの負荷）は連鎖の大きさに関係なく channels 個までになる。
+# 音のファイルは AssetManager.sound で読む（デコードした PCM はディスクにキャッシュされる）。
+# ミキサーが使えない環境では何もしない。
+import math
+
+import pygame
+
+# 名前 -> (sounds/ のファイル名, 最短の間隔 ms, 1回のときの音量)
+SOUNDS = {
+    "spawn": ("motion-pop08-1", 50, 0.5),
+    "merge": ("motion-pop03-1", 80, 0.6),
+}
+# 回数が2倍になるごとに音量をこれだけ（1回のときの音量に対する割合で）上げる
+VOLUME_STEP = 0.25
+
+
+class SoundBank:
+    def __init__(self, assets, sounds=SOUNDS, channels=4):
+        self.assets = assets
+        self.sounds = sounds
+        self.enabled = bool(pygame.mixer.get_init())
+        self.channels = []
+        if self.enabled:
+            # 使うチャンネルは先頭の channels 個だけにして、ほかの音とは取り合わない
+            if pygame.mixer.get_num_channels() < channels:
+                pygame.mixer.set_num_channels(channels)
+            pygame.mixer.set_reserved(channels)
+            self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        # チャンネルごとに鳴らし始めた時刻（ms）
+        self.started = [0] * len(self.channels)
+        # 名前 -> まだ鳴らしていない回数
+        self.pending = dict.fromkeys(sounds, 0)
+        # 名前 -> 最後に鳴らした時刻（ms）
+        self.last_played = dict.fromkeys(sounds, -1e9)
+        self.requested = 0
+        self.played = 0
+
+    # 使う音を先に読み込んでおく（最初に鳴らすときに読み込みで止まらないように）
+    def preload(self):
+        if not self.enabled:
+            return
+        for file_name, _, _ in self.sounds.values():
+            self.assets.sound(file_name)
+
+    def request(self, name, count=1):
+        if count <= 0 or not self.enabled:
+            return
+        self.pending[name] += count
+        self.requested += count
+
+    # 頼まれた音を鳴らす。now は ms（省略すると pygame.time.get_ticks()）
+    def flush(self, now=None):
+        if not self.enabled:
+            return
+        if now is None:
+            now = pygame.time.get_ticks()
+        pending = self.pending
+        for name, count in pending.items():
+            if count == 0:
+                continue
+            file_name, min_interval, volume = self.sounds[name]
+            if now - self.last_played[name] < min_interval:
+                continue
+            sound = self.assets.sound(file_name)
+            pending[name] = 0
+            if sound is None:
+                continue
+            self.last_played[name] = now
+            volume *= 1 + VOLUME_STEP * math.log2(count)
+            self._play(sound, min(1.0, volume), now)
+
+    def _play(self, sound, volume, now):
+        channels = self.channels
+        started = self.started
+        index = None
+        for i, channel in enumerate(channels):
+            if not channel.get_busy():
+                index = i
+                break
+        if index is None:
+            # 全部鳴っていたら、一番前に鳴らし始めたものを止めて使う
+            index = started.index(min(started))
+        channel = channels[index]
+        started[index] = now
+        channel.set_volume(volume)
+        channel.play(sound)
+        self.played += 1
+
+    # 何回頼まれて、何回鳴らしたか
+    def stats(self):
+        busy = sum(channel.get_busy() for channel in self.channels)
+        return {"requested": self.requested, "played": self.played, "busy": busy}
@@ -0,0 +1,104 @@
+# 衝突判定のブロードフェーズ（一様グリッドによる空間ハッシュ）
+#
+# ボールの外接矩形が重なるセルすべてにボールを登録し、同じセルに入っている
+# ボール同士だけを衝突候補として返す。大きなボールは複数セルにまたがるが、
+# 2つの外接矩形の重なり領域の左上セルでのみペアを出力するので重複はない。
+import math
+
+
+class SpatialHash:
+    def __init__(self, cell_size=40):
+        self.cell_size = cell_size
+        self.inv_cell_size = 1.0 / cell_size
+        self.cells = {}
+        # 登録順の (ball, x0, y0, x1, y1)。削除されたものは None
+        self.entries = []
+        self.index = {}
+        self.removed = 0
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.index.clear()
+        self.removed = 0
+
+    def _cell_range(self, x, y, radius):
+        inv = self.inv_cell_size
+        return (
+            math.floor((x - radius) * inv),
+            math.floor((y - radius) * inv),
+            math.floor((x + radius) * inv),
+            math.floor((y + radius) * inv),
+        )
+
+    def insert(self, ball):
+        x0, y0, x1, y1 = self._cell_range(ball.x, ball.y, ball.radius)
+        i = len(self.entries)
+        self.entries.append((ball, x0, y0, x1, y1))
+        self.index[id(ball)] = i
+
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [i]
+                else:
+                    bucket.append(i)
+
+    def remove(self, ball):
+        i = self.index.pop(id(ball), None)
+        if i is None:
+            return
+        _, x0, y0, x1, y1 = self.entries[i]
+        self.entries[i] = None
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells[(cx, cy)]
+                bucket.remove(i)
+                if not bucket:
+                    del self.cells[(cx, cy)]
+        # 作り直さずに使い続けるときは、削除した跡が半分を超えたら詰める
+        self.removed += 1
+        if self.removed > 64 and self.removed * 2 > len(self.entries):
+            self.rebuild([entry[0] for entry in self.entries if entry is not None])
+
+    # 1ステップに1回、全ボールの位置から作り直す
+    def rebuild(self, balls):
+        self.clear()
+        for ball in balls:
+            self.insert(ball)
+
+    # 衝突候補のペアを返す（ball1 は常に ball2 より先に登録されたボール）
+    def candidate_pairs(self):
+        entries = self.entries
+        for (cx, cy), bucket in self.cells.items():
+            n = len(bucket)
+            if n < 2:
+                continue
+            for a in range(n - 1):
+                ea = entries[bucket[a]]
+                for b in range(a + 1, n):
+                    eb = entries[bucket[b]]
+                    # 重なり領域の左上セル以外では出力しない
+                    if (ea[1] if ea[1] > eb[1] else eb[1]) != cx:
+                        continue
+                    if (ea[2] if ea[2] > eb[2] else eb[2]) != cy:
+                        continue
+                    yield ea[0], eb[0]
+
+    # 円 (x, y, radius) と外接矩形のセルが重なるボールを返す
+    def query(self, x, y, radius):
+        x0, y0, x1, y1 = self._cell_range(x, y, radius)
+        entries = self.entries
+        cells = self.cells
+        seen = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for i in bucket:
+                    if i not in seen:
+                        seen.add(i)
+                        yield entries[i][0]
@@ -0,0 +1,151 @@
+# ボールのスプライトアトラス
+#
+# サイズラベル（1〜10）ごとに、塗り・白い縁取り・ラベル（と任意で images/ball_N.png の絵）を
+# 1枚のサーフェスに焼き込んでおき、描画を blit 1回で済ませる。
+# 回転した絵は角度を rotation_steps 段階に丸めて、初めて使ったときにキャッシュする。
+# 大きいボールは1枚が大きいので、1サイズあたり ROTATION_BYTES_PER_SIZE に収まるまで段階を半分に
+# 減らす（最少 MIN_ROTATION_STEPS。全部で 64 段階を持つと 40MB 近くになる）。キャッシュは合計
+# max_rotated_bytes までで、超えたら一番長く使われていないものから捨てる。
+# 円の外側はピクセルごとのアルファではなくカラーキー + RLE にして blit を軽くする。
+# scale を渡すと、カメラで縮小・拡大した大きさで焼き込む（小さすぎるボールにはラベルを描かない）。
+import math
+from collections import OrderedDict
+
+import pygame
+
+from physics import BALL_COLORS
+from text_cache import texts
+
+# ボールには使われないカラーキー
+COLORKEY = (255, 0, 255)
+# これより小さく描くボールにはサイズラベルを描かない
+MIN_LABEL_RADIUS = 8
+# 1サイズぶんの回転したスプライトの目安と、キャッシュ全体の上限（バイト）。
+# 上限は等倍のときにすべての段階が入る大きさにしてある（入らないと毎フレーム回転し直すことになる）
+ROTATION_BYTES_PER_SIZE = 2 * 1024 * 1024
+MIN_ROTATION_STEPS = 16
+MAX_ROTATED_BYTES = 16 * 1024 * 1024
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class BallSpriteAtlas:
+    def __init__(
+        self, rotation_steps=64, assets=None, scale=1.0, max_rotated_bytes=MAX_ROTATED_BYTES
+    ):
+        self.rotation_steps = rotation_steps
+        self.scale = scale
+        # AssetManager を渡すと images/ball_N.png の絵を重ねる
+        self.assets = assets
+        self.sprites = {}
+        # サイズラベル -> 角度を丸める段階の数
+        self.steps = {}
+        # (サイズラベル, 段階) -> 回転したスプライト。古く使ったものほど前にある
+        self.rotated = OrderedDict()
+        self.rotated_bytes = 0
+        self.max_rotated_bytes = max_rotated_bytes
+        # draw で blit 先を渡すのに使い回す（ボールごとに座標のタプルを作らない）
+        self.dest = pygame.Rect(0, 0, 0, 0)
+
+    def build(self):
+        for size_label in range(1, 11):
+            sprite = self._bake(size_label)
+            self.sprites[size_label] = sprite
+            steps = self.rotation_steps
+            while (
+                steps > MIN_ROTATION_STEPS
+                and steps * surface_bytes(sprite) > ROTATION_BYTES_PER_SIZE
+            ):
+                steps //= 2
+            self.steps[size_label] = steps
+        self.rotated.clear()
+        self.rotated_bytes = 0
+        return self
+
+    def _bake(self, size_label):
+        radius = max(1, round(size_label * 10 * self.scale))
+        size = radius * 2
+        surface = pygame.Surface((size, size))
+        surface.fill(COLORKEY)
+        center = (radius, radius)
+        color = BALL_COLORS[(size_label - 1) % len(BALL_COLORS)]
+
+        pygame.draw.circle(surface, color, center, radius)
+
+        assets = self.assets
+        name = f"ball_{size_label}"
+        if assets is not None and assets.has_image(name):
+            # 縦横比を保ったまま円に収まるように縮小したもの（AssetManager がキャッシュする）
+            image = assets.fitted(name, size)
+            surface.blit(image, image.get_rect(center=center))
+
+        pygame.draw.circle(surface, (255, 255, 255), center, radius, 2)
+
+        if radius >= MIN_LABEL_RADIUS:
+            text = texts.render(str(size_label), radius // 2)
+            surface.blit(text, text.get_rect(center=center))
+
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        return surface
+
+    # 角度（ラジアン）を丸めた回転済みのスプライトを返す
+    def get(self, size_label, angle=0.0):
+        steps = self.steps[size_label]
+        step = round(angle * steps / (2 * math.pi)) % steps
+        if step == 0:
+            return self.sprites[size_label]
+        key = (size_label, step)
+        cache = self.rotated
+        sprite = cache.get(key)
+        if sprite is not None:
+            cache.move_to_end(key)
+        else:
+            # pygame の回転は反時計回りなので符号を反転する
+            base = self.sprites[size_label]
+            rotated = pygame.transform.rotate(base, -step * 360.0 / steps)
+            # 円は中心から半径の内側に収まるので、元の大きさに切り詰める
+            rect = base.get_rect(center=rotated.get_rect().center)
+            sprite = rotated.subsurface(rect).copy()
+            sprite.set_colorkey(COLORKEY, pygame.RLEACCEL)
+            cache[key] = sprite
+            self.rotated_bytes += surface_bytes(sprite)
+            while self.rotated_bytes > self.max_rotated_bytes:
+                _, old = cache.popitem(last=False)
+                self.rotated_bytes -= surface_bytes(old)
+        return sprite
+
+    # 描くスプライトと左上の座標を返す（ステップ間を補間する）
+    def placement(self, ball, alpha=1.0):
+        x = ball.prev_x + (ball.x - ball.prev_x) * alpha
+        y = ball.prev_y + (ball.y - ball.prev_y) * alpha
+        angle = ball.prev_angle + (ball.angle - ball.prev_angle) * alpha
+        sprite = self.get(ball.size_label, angle)
+        return sprite, (
+            int(x) - sprite.get_width() // 2,
+            int(y) - sprite.get_height() // 2,
+        )
+
+    def draw(self, screen, ball, alpha=1.0):
+        prev_x = ball.prev_x
+        prev_y = ball.prev_y
+        prev_angle = ball.prev_angle
+        sprite = self.get(ball.size_label, prev_angle + (ball.angle - prev_angle) * alpha)
+        half = sprite.get_width() // 2
+        dest = self.dest
+        dest.x = int(prev_x + (ball.x - prev_x) * alpha) - half
+        dest.y = int(prev_y + (ball.y - prev_y) * alpha) - half
+        return screen.blit(sprite, dest)
+
+    def memory_report(self):
+        base = sum(surface_bytes(s) for s in self.sprites.values())
+        return {
+            "sprites": len(self.sprites),
+            "sprite_bytes": base,
+            "rotated": len(self.rotated),
+            "rotated_bytes": self.rotated_bytes,
+            "total_bytes": base + self.rotated_bytes,
+        }
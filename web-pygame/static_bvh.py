@@ -0,0 +1,114 @@
+# 動かない当たり判定（線分とピン）のバウンディングボリューム階層（BVH）
+#
+#   bvh = StaticBVH(colliders)      # collider.bounds() -> (x0, y0, x1, y1)
+#   found = []
+#   bvh.query(x0, y0, x1, y1, found)  # 外接矩形が重なるものを found に入れる
+#
+# アリーナを読み込んだときに1回だけ作る。外接矩形の中心を長い方の軸で並べて
+# 半分ずつに分けていき、LEAF_SIZE 個以下になったら葉にする。
+# ノードは属性ごとのリストに平らに並べ（子は child[i] と child[i] + 1）、query は
+# 再帰せずにスタックで辿るので、ボール1個あたりに調べるのは近くのノードと葉だけになる。
+
+
+# 葉に入れる当たり判定の数
+LEAF_SIZE = 4
+
+
+class StaticBVH:
+    def __init__(self, items, leaf_size=LEAF_SIZE):
+        self.leaf_size = leaf_size
+        # 葉ごとに続けて並べた当たり判定と、その外接矩形
+        self.items = []
+        self.item_bounds = []
+        # ノードの外接矩形・最初の子（葉なら -1）・葉の items の範囲
+        self.min_x = []
+        self.min_y = []
+        self.max_x = []
+        self.max_y = []
+        self.child = []
+        self.start = []
+        self.count = []
+        # query で使い回すスタック
+        self.stack = []
+        # query で外接矩形を比べたノードと当たり判定の累計
+        self.tests = 0
+        entries = [(item, item.bounds()) for item in items]
+        if entries:
+            self._new_node()
+            self._build(0, entries)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _new_node(self):
+        self.min_x.append(0.0)
+        self.min_y.append(0.0)
+        self.max_x.append(0.0)
+        self.max_y.append(0.0)
+        self.child.append(-1)
+        self.start.append(0)
+        self.count.append(0)
+        return len(self.child) - 1
+
+    def _build(self, node, entries):
+        self.min_x[node] = min(bounds[0] for _, bounds in entries)
+        self.min_y[node] = min(bounds[1] for _, bounds in entries)
+        self.max_x[node] = max(bounds[2] for _, bounds in entries)
+        self.max_y[node] = max(bounds[3] for _, bounds in entries)
+        if len(entries) <= self.leaf_size:
+            self.start[node] = len(self.items)
+            self.count[node] = len(entries)
+            for item, bounds in entries:
+                self.items.append(item)
+                self.item_bounds.append(bounds)
+            return
+
+        # 中心の広がりが大きい方の軸で並べて、真ん中で分ける
+        xs = [bounds[0] + bounds[2] for _, bounds in entries]
+        ys = [bounds[1] + bounds[3] for _, bounds in entries]
+        if max(xs) - min(xs) >= max(ys) - min(ys):
+            entries.sort(key=lambda entry: entry[1][0] + entry[1][2])
+        else:
+            entries.sort(key=lambda entry: entry[1][1] + entry[1][3])
+        half = len(entries) // 2
+        left = self._new_node()
+        right = self._new_node()  # 右の子は必ず left + 1
+        self.child[node] = left
+        self._build(left, entries[:half])
+        self._build(right, entries[half:])
+
+    # 外接矩形が (x0, y0)-(x1, y1) に重なる当たり判定を out に入れる（out は先に空にする）
+    def query(self, x0, y0, x1, y1, out):
+        out.clear()
+        if not self.items:
+            return out
+        min_x = self.min_x
+        min_y = self.min_y
+        max_x = self.max_x
+        max_y = self.max_y
+        child = self.child
+        items = self.items
+        item_bounds = self.item_bounds
+        stack = self.stack
+        stack.append(0)
+        tests = 0
+        while stack:
+            node = stack.pop()
+            tests += 1
+            if max_x[node] < x0 or min_x[node] > x1 or max_y[node] < y0 or min_y[node] > y1:
+                continue
+            first = child[node]
+            if first >= 0:
+                # 左の子を先に見るので、見つかる順番はいつも items の並び順になる
+                stack.append(first + 1)
+                stack.append(first)
+                continue
+            start = self.start[node]
+            for k in range(start, start + self.count[node]):
+                tests += 1
+                bx0, by0, bx1, by1 = item_bounds[k]
+                if bx1 < x0 or bx0 > x1 or by1 < y0 or by0 > y1:
+                    continue
+                out.append(items[k])
+        self.tests += tests
+        return out
@@ -0,0 +1,103 @@
+# フォントと文字の描画結果のキャッシュ
+#
+# pygame.font.SysFont はフォントの検索とファイルの読み込みを毎回行うので、
+# (書体, サイズ) ごとに一度だけ作って使い回す。font.render の結果も
+# (文字列, サイズ, 色, 書体) をキーにした LRU キャッシュに入れておく。
+from collections import OrderedDict
+
+import pygame
+
+WHITE = (255, 255, 255)
+
+
+class FontRegistry:
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, face, size):
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(face, size)
+            self.fonts[key] = font
+        return font
+
+
+class TextCache:
+    def __init__(self, fonts, max_entries=512, max_bytes=4 * 1024 * 1024):
+        self.fonts = fonts
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, text, size, color=WHITE, face="Arial"):
+        key = (text, size, color, face)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.fonts.get(face, size).render(text, True, color)
+        self.surfaces[key] = surface
+        self.bytes += _surface_bytes(surface)
+        # 上限を超えたら古いものから捨てる
+        while self.surfaces and (
+            len(self.surfaces) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            _, old = self.surfaces.popitem(last=False)
+            self.bytes -= _surface_bytes(old)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.surfaces),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# 値が変わったときだけ描き直すテキスト（スコアや時間の表示用）
+# shared=False にすると TextCache に入れずに直接描く（時間のように同じ値に戻らないものは、
+# キャッシュに入れても使われないまま溜まっていくだけなので）
+class CachedText:
+    def __init__(self, cache, template, size, color=WHITE, face="Arial", shared=True):
+        self.cache = cache
+        self.template = template
+        self.size = size
+        self.color = color
+        self.face = face
+        self.shared = shared
+        self.value = None
+        self.surface = None
+
+    def render(self, value):
+        if self.surface is None or value != self.value:
+            self.value = value
+            text = self.template.format(value)
+            if self.shared:
+                self.surface = self.cache.render(text, self.size, self.color, self.face)
+            else:
+                font = self.cache.fonts.get(self.face, self.size)
+                self.surface = font.render(text, True, self.color)
+        return self.surface
+
+
+def _surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+fonts = FontRegistry()
+texts = TextCache(fonts)
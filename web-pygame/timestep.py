@@ -0,0 +1,32 @@
+# 固定タイムステップの物理時計
+#
+# 描画フレームの経過時間をためておき、決まった幅 (step) ずつ物理演算を進める。
+# 1フレームで進めるステップ数には上限があり、処理落ちやタブ切り替えで
+# 大きな時間が空いても、その分は捨ててシミュレーションが暴れないようにする。
+# 描画は alpha (0〜1) を使って前のステップと今のステップの間を補間する。
+
+
+class FixedTimestep:
+    def __init__(self, step=1 / 120, max_steps=8):
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    # このフレームで進めるステップ数を返す
+    def advance(self, frame_dt):
+        self.accumulator += frame_dt
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            # 追いつけない分は捨てる
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step
+        return steps